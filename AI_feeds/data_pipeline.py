@@ -0,0 +1,174 @@
+"""
+Streaming tf.data input pipeline for LSTM training.
+
+The history CSV is read in chunks and never held in memory as a whole:
+
+1. A cheap first pass over the borough/date columns fits the borough encoder
+   and finds the date range used for the train/validation split.
+2. A second pass featurizes each chunk and partially fits the MinMaxScaler.
+3. Each epoch streams the chunks again, windows every borough separately
+   (so a sequence never mixes boroughs) and hands raw windows to tf.data,
+   which shuffles, batches, scales in parallel and prefetches.
+
+Rolling features are computed per chunk with the previous rows of each borough
+carried over as context, so they match a whole-file computation except for the
+mean used to fill a borough's first few missing lags.
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+try:
+    from AI_feeds.features import (LAGS, ROLLING_WINDOWS, TARGET_COLUMN, add_calendar_features,
+                                   add_engineered_features, get_feature_columns)
+except ImportError:
+    from features import (LAGS, ROLLING_WINDOWS, TARGET_COLUMN, add_calendar_features,
+                          add_engineered_features, get_feature_columns)
+
+# Raw rows of each borough carried into the next chunk so rolling windows and lags continue
+CONTEXT_ROWS = max(max(ROLLING_WINDOWS), max(LAGS))
+
+
+def scan_history(csv_path, chunksize=100000):
+    """
+    First pass: fit the borough encoder and collect row count and date range
+
+    Returns:
+        tuple: (fitted LabelEncoder, number of rows, first date, last date)
+    """
+    boroughs = set()
+    n_rows = 0
+    first_date = None
+    last_date = None
+    for chunk in pd.read_csv(csv_path, usecols=['date', 'borough'], chunksize=chunksize):
+        dates = pd.to_datetime(chunk['date'])
+        boroughs.update(chunk['borough'].dropna().unique())
+        n_rows += len(chunk)
+        first_date = dates.min() if first_date is None else min(first_date, dates.min())
+        last_date = dates.max() if last_date is None else max(last_date, dates.max())
+
+    borough_encoder = LabelEncoder()
+    borough_encoder.fit(sorted(boroughs))
+    return borough_encoder, n_rows, first_date, last_date
+
+
+def iter_feature_chunks(csv_path, borough_encoder, chunksize=100000):
+    """Yield featurized chunks of the history CSV, in file order"""
+    feature_columns = get_feature_columns()
+    context = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        chunk['date'] = pd.to_datetime(chunk['date'])
+        chunk = chunk[chunk['borough'].isin(borough_encoder.classes_)]
+        n_context = 0 if context is None else len(context)
+        frame = chunk if context is None else pd.concat([context, chunk], ignore_index=True)
+
+        frame = add_calendar_features(frame.reset_index(drop=True))
+        frame['borough_encoded'] = borough_encoder.transform(frame['borough'])
+        frame = add_engineered_features(frame)
+
+        # Keep the last CONTEXT_ROWS raw rows of every borough for the next chunk
+        raw_columns = ['date', 'borough', TARGET_COLUMN]
+        context = frame[raw_columns].groupby('borough', sort=False).tail(CONTEXT_ROWS)
+
+        featurized = frame.iloc[n_context:]
+        yield featurized['borough'].to_numpy(), featurized['date'].to_numpy(), \
+            featurized[feature_columns].to_numpy(dtype=np.float32)
+
+
+def fit_streaming_scaler(csv_path, borough_encoder, chunksize=100000):
+    """Second pass: fit the MinMaxScaler one chunk at a time"""
+    scaler = MinMaxScaler()
+    for _, _, rows in iter_feature_chunks(csv_path, borough_encoder, chunksize):
+        if len(rows):
+            scaler.partial_fit(rows)
+    return scaler
+
+
+def iter_borough_windows(csv_path, borough_encoder, sequence_length=14, chunksize=100000,
+                         split_date=None, subset='train'):
+    """
+    Yield (raw window, raw target) pairs built separately for every borough
+
+    Windows whose target date is before split_date belong to the 'train'
+    subset, the rest to 'validation'.
+    """
+    buffers = {}
+    split_date = np.datetime64(split_date) if split_date is not None else None
+    for boroughs, dates, rows in iter_feature_chunks(csv_path, borough_encoder, chunksize):
+        for borough, date, row in zip(boroughs, dates, rows):
+            buffer = buffers.get(borough)
+            if buffer is None:
+                buffer = buffers[borough] = deque(maxlen=sequence_length + 1)
+            buffer.append(row)
+            if len(buffer) <= sequence_length:
+                continue
+            is_train = split_date is None or date < split_date
+            if (subset == 'train') != is_train:
+                continue
+            window = np.stack(buffer)
+            yield window[:-1], window[-1, -1]
+
+
+def make_dataset(csv_path, borough_encoder, scaler, sequence_length=14, batch_size=32,
+                 shuffle_buffer=10000, chunksize=100000, split_date=None, subset='train'):
+    """
+    Build a tf.data pipeline of scaled (X, y) batches streamed from the history CSV
+
+    Scaling runs inside the pipeline with num_parallel_calls, so the Python
+    generator only does windowing.
+    """
+    n_columns = len(scaler.scale_)
+    scale = tf.constant(scaler.scale_, dtype=tf.float32)
+    offset = tf.constant(scaler.min_, dtype=tf.float32)
+
+    dataset = tf.data.Dataset.from_generator(
+        lambda: iter_borough_windows(csv_path, borough_encoder, sequence_length, chunksize, split_date, subset),
+        output_signature=(
+            tf.TensorSpec(shape=(sequence_length, n_columns), dtype=tf.float32),
+            tf.TensorSpec(shape=(), dtype=tf.float32)
+        )
+    )
+    if subset == 'train' and shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, reshuffle_each_iteration=True)
+
+    def scale_batch(windows, targets):
+        scaled_windows = windows * scale + offset
+        scaled_targets = targets * scale[-1] + offset[-1]
+        return scaled_windows[:, :, :-1], scaled_targets
+
+    return (dataset
+            .batch(batch_size)
+            .map(scale_batch, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Report training throughput in samples/sec for every epoch"""
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.epoch_start = None
+        self.steps = 0
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        self.steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.steps += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self.epoch_start
+        # The final batch of an epoch may be partial, so this is a close upper bound
+        samples_per_sec = self.steps * self.batch_size / elapsed if elapsed > 0 else 0
+        self.history.append(samples_per_sec)
+        if logs is not None:
+            logs['samples_per_sec'] = samples_per_sec
+        print(f"\nEpoch {epoch + 1} throughput: {samples_per_sec:,.0f} samples/sec")
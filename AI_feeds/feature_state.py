@@ -0,0 +1,393 @@
+"""
+Incremental per-borough feature state for append-only consumption feeds.
+
+Each borough keeps a ring buffer of its last 30 readings, running sums and
+sums of squares for every rolling window, monotonic deques for rolling
+max/min, and the last 14 model input rows. A new reading updates all of it
+in O(1), so the model input window is available without recomputing
+features over the full history.
+
+Rolling features match AI_feeds/features.py. The only difference is during a
+borough's first 14 readings: the batch engine fills missing lags and the
+first reading's std with whole-column means, while the incremental state
+uses the borough's running mean and 0.
+"""
+
+import hashlib
+import io
+import math
+import os
+import tempfile
+import threading
+from collections import deque
+
+import joblib
+import numpy as np
+import pandas as pd
+
+try:
+    from AI_feeds.features import LAGS, ROLLING_WINDOWS, TARGET_COLUMN
+except ImportError:
+    from features import LAGS, ROLLING_WINDOWS, TARGET_COLUMN
+
+DEFAULT_STATE_PATH = 'AI_feeds/models/feature_state.joblib'
+
+# Recompute running sums from the buffer this often to stop float drift accumulating
+RESUM_INTERVAL = 10000
+
+
+class RollingWindow:
+    """Running mean/std plus monotonic-deque max/min over the last `size` readings"""
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.max_deque = deque()
+        self.min_deque = deque()
+
+    def push(self, position, value, shifted_value, leaving_shifted_value):
+        # Sums are kept on values shifted by the borough's first reading to limit cancellation
+        self.sum += shifted_value
+        self.sumsq += shifted_value * shifted_value
+        if leaving_shifted_value is None:
+            self.count += 1
+        else:
+            self.sum -= leaving_shifted_value
+            self.sumsq -= leaving_shifted_value * leaving_shifted_value
+
+        while self.max_deque and self.max_deque[-1][1] <= value:
+            self.max_deque.pop()
+        self.max_deque.append((position, value))
+        if self.max_deque[0][0] <= position - self.size:
+            self.max_deque.popleft()
+
+        while self.min_deque and self.min_deque[-1][1] >= value:
+            self.min_deque.pop()
+        self.min_deque.append((position, value))
+        if self.min_deque[0][0] <= position - self.size:
+            self.min_deque.popleft()
+
+    def resum(self, shifted_values):
+        recent = list(shifted_values)[-self.size:]
+        self.sum = math.fsum(recent)
+        self.sumsq = math.fsum(value * value for value in recent)
+
+    def mean(self, shift):
+        return shift + self.sum / self.count
+
+    def std(self):
+        if self.count < 2:
+            return np.nan
+        variance = (self.sumsq - self.sum * self.sum / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def max(self):
+        return self.max_deque[0][1]
+
+    def min(self):
+        return self.min_deque[0][1]
+
+
+class BoroughFeatureState:
+    """Feature state for one borough, updated one reading at a time"""
+
+    def __init__(self, borough, borough_encoded, sequence_length=14):
+        self.borough = borough
+        self.borough_encoded = borough_encoded
+        self.sequence_length = sequence_length
+        self.shift = None
+        self.position = 0
+        self.total = 0.0
+        self.last_date = None
+        self.history = deque(maxlen=max(ROLLING_WINDOWS))
+        self.windows = {window: RollingWindow(window) for window in ROLLING_WINDOWS}
+        self.rows = deque(maxlen=sequence_length)
+
+    def update(self, date, consumption):
+        """Add one reading and append its model input row"""
+        date = pd.Timestamp(date)
+        consumption = float(consumption)
+        if self.last_date is not None and date < self.last_date:
+            raise ValueError(f"Out-of-order reading for {self.borough}: {date} is before {self.last_date}")
+        if self.shift is None:
+            self.shift = consumption
+
+        # Lags come from the ring buffer before this reading is added
+        running_mean = self.total / self.position if self.position else consumption
+        lags = [self.history[-lag] + self.shift if len(self.history) >= lag else running_mean for lag in LAGS]
+
+        shifted_value = consumption - self.shift
+        for window, stats in self.windows.items():
+            leaving = self.history[-window] if len(self.history) >= window else None
+            stats.push(self.position, consumption, shifted_value, leaving)
+        self.history.append(shifted_value)
+        self.position += 1
+        self.total += consumption
+        self.last_date = date
+
+        if self.position % RESUM_INTERVAL == 0:
+            for stats in self.windows.values():
+                stats.resum(self.history)
+
+        rolling = []
+        for window, stats in self.windows.items():
+            std = stats.std()
+            rolling.extend([stats.mean(self.shift), 0.0 if np.isnan(std) else std, stats.max(), stats.min()])
+
+        iso_week = date.isocalendar()[1]
+        day_of_year = date.dayofyear
+        calendar = [
+            date.year, date.month, date.day, date.dayofweek, day_of_year, iso_week,
+            self.borough_encoded, date.hour,
+            np.sin(2 * np.pi * day_of_year/365), np.cos(2 * np.pi * day_of_year/365),
+            np.sin(2 * np.pi * date.month/12), np.cos(2 * np.pi * date.month/12),
+            np.sin(2 * np.pi * iso_week/52), np.cos(2 * np.pi * iso_week/52)
+        ]
+        self.rows.append(np.array(calendar + rolling + lags + [consumption], dtype=np.float64))
+
+    def window(self):
+        """Return the last sequence_length model input rows (target column last)"""
+        if len(self.rows) < self.sequence_length:
+            raise ValueError(f"Not enough history for borough {self.borough}: "
+                             f"{len(self.rows)} of {self.sequence_length} days")
+        return np.stack(self.rows)
+
+
+def _digest(line):
+    return hashlib.sha1(line).hexdigest()
+
+
+class FeatureStateStore:
+    """Per-borough feature state kept in sync with an append-only history CSV"""
+
+    def __init__(self, borough_classes, sequence_length=14):
+        self.borough_codes = {borough: code for code, borough in enumerate(borough_classes)}
+        self.sequence_length = sequence_length
+        # Readings needed to rebuild the last window exactly: a full rolling
+        # window behind the oldest row of the model input sequence
+        self.replay_rows = max(ROLLING_WINDOWS) + sequence_length
+        self.boroughs = {}
+        self.source_path = None
+        self.source_offset = 0
+        self.source_header = None
+        # What the file looked like at the last sync, to tell an append from a rewrite
+        self.source_mtime = 0
+        self.source_size = -1
+        self.source_first_line = None
+        self.source_last_line = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        # States persisted before the rewrite checks existed can't be verified and are rebuilt
+        self.__dict__.update({'source_mtime': 0, 'source_size': -1,
+                              'source_first_line': None, 'source_last_line': None}, **state)
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.boroughs = {}
+        self.source_path = None
+        self.source_offset = 0
+        self.source_first_line = None
+        self.source_last_line = None
+
+    def _borough_state(self, borough):
+        state = self.boroughs.get(borough)
+        if state is None:
+            if borough not in self.borough_codes:
+                raise ValueError(f"Unknown borough: {borough}")
+            state = BoroughFeatureState(borough, self.borough_codes[borough], self.sequence_length)
+            self.boroughs[borough] = state
+        return state
+
+    def update(self, borough, date, consumption):
+        """Add a single reading for a borough in O(1)"""
+        with self._lock:
+            self._borough_state(borough).update(date, consumption)
+
+    def ingest_frame(self, df):
+        """Add new readings (date-ordered within each borough) from a DataFrame"""
+        with self._lock:
+            self._ingest_frame(df)
+
+    def _ingest_frame(self, df):
+        for borough, group in df.groupby('borough', sort=False):
+            if borough not in self.borough_codes:
+                # The model can't score boroughs it wasn't trained on
+                continue
+            state = self._borough_state(borough)
+            if len(group) > self.replay_rows:
+                # Older rows would fall out of every window before the last sequence
+                # is built, so only their count and sum carry over
+                skipped = group.iloc[:-self.replay_rows]
+                if state.last_date is not None and skipped['date'].iloc[0] < state.last_date:
+                    raise ValueError(f"Out-of-order reading for {borough}")
+                first_kept = group.iloc[-self.replay_rows]
+                fresh = BoroughFeatureState(borough, state.borough_encoded, self.sequence_length)
+                fresh.position = state.position + len(skipped)
+                fresh.total = state.total + float(skipped[TARGET_COLUMN].sum())
+                fresh.shift = float(first_kept[TARGET_COLUMN])
+                fresh.last_date = skipped['date'].iloc[-1]
+                state = fresh
+                self.boroughs[borough] = state
+                group = group.iloc[-self.replay_rows:]
+            for date, consumption in zip(group['date'], group[TARGET_COLUMN]):
+                state.update(date, consumption)
+
+    def sync_csv(self, csv_path):
+        """
+        Bring the state up to date with a history CSV, reading only bytes appended since the last sync
+
+        The first and the last ingested line are read back and compared with
+        hashes taken when they were ingested, so a file rewritten in place
+        (even with the same header, and grown past the old offset) is rebuilt
+        from the start instead of being read from the middle of a line. So is
+        one whose new rows don't parse or go back in time.
+
+        Returns:
+            int: Number of new rows ingested
+
+        Raises:
+            ValueError, KeyError: If the whole file can't be parsed either; the state is
+                left empty and the next sync starts over
+        """
+        with self._lock:
+            try:
+                return self._sync_csv(csv_path)
+            except (ValueError, KeyError) as e:
+                print(f"⚠️ Rebuilding feature state from {csv_path}: {e}")
+                self._reset()
+                try:
+                    return self._sync_csv(csv_path)
+                except (ValueError, KeyError):
+                    self._reset()
+                    raise
+
+    def _sync_csv(self, csv_path):
+        stat = os.stat(csv_path)
+        if (csv_path == self.source_path and stat.st_mtime_ns == self.source_mtime
+                and stat.st_size == self.source_size):
+            return 0
+
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            data_start = f.tell()
+            rebuild = (csv_path != self.source_path or header != self.source_header
+                       or stat.st_size < self.source_offset or stat.st_mtime_ns < self.source_mtime
+                       or not self._ingested_lines_unchanged(f, data_start))
+            if rebuild:
+                self._reset()
+                self.source_offset = data_start
+            f.seek(self.source_offset)
+            appended = f.read(stat.st_size - self.source_offset)
+
+        # Only parse complete lines; a partially written last line waits for the next sync
+        complete = appended[:appended.rfind(b'\n') + 1]
+        self.source_path = csv_path
+        self.source_header = header
+        new_rows = 0
+        if complete.strip():
+            frame = pd.read_csv(io.BytesIO(header + complete))
+            frame['date'] = pd.to_datetime(frame['date'])
+            # Rows inserted out of order raise ValueError: the file is not append-only anymore
+            self._ingest_frame(frame.sort_values('date', kind='stable'))
+            new_rows = len(frame)
+
+            if self.source_first_line is None:
+                self.source_first_line = _digest(complete[:complete.find(b'\n') + 1])
+            last_line = complete[complete.rfind(b'\n', 0, len(complete) - 1) + 1:]
+            self.source_last_line = (len(last_line), _digest(last_line))
+            self.source_offset += len(complete)
+        self.source_mtime = stat.st_mtime_ns
+        self.source_size = stat.st_size
+        return new_rows
+
+    def _ingested_lines_unchanged(self, f, data_start):
+        """Whether the first and last ingested lines are still where they were read from"""
+        if self.source_offset <= data_start:
+            return True
+        f.seek(data_start)
+        if self.source_first_line is None or _digest(f.readline()) != self.source_first_line:
+            return False
+        length, digest = self.source_last_line
+        f.seek(self.source_offset - length)
+        return _digest(f.read(length)) == digest
+
+    def save(self, state_path):
+        """
+        Persist the state to state_path
+
+        Pickled under the store's lock so a concurrent sync can't change it mid-write,
+        to a uniquely named temp file that is then renamed over state_path, so concurrent
+        readers never load a partial file and concurrent savers never share a temp file.
+        """
+        with self._lock:
+            fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(state_path) + '.', suffix='.tmp',
+                                             dir=os.path.dirname(state_path) or '.')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    joblib.dump(self, f)
+                os.replace(temp_path, state_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+    def windows(self, boroughs):
+        """
+        Stack the current model input windows for several boroughs
+
+        Returns:
+            tuple: (array of shape (n_boroughs, sequence_length, n_columns), last date per borough)
+        """
+        with self._lock:
+            windows = []
+            last_dates = []
+            for borough in boroughs:
+                state = self.boroughs.get(borough)
+                if state is None:
+                    raise ValueError(f"No data found for borough: {borough}")
+                windows.append(state.window())
+                last_dates.append(state.last_date)
+            return np.stack(windows), last_dates
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_feature_state(csv_path, borough_encoder, state_path=DEFAULT_STATE_PATH):
+    """
+    Return the shared feature state for a history CSV, synced with any appended rows
+
+    The state is persisted to state_path so a restarted process only reads new rows.
+    """
+    borough_classes = tuple(borough_encoder.classes_)
+    with _stores_lock:
+        store = _stores.get(csv_path)
+        if store is None or tuple(store.borough_codes) != borough_classes:
+            store = None
+            if os.path.exists(state_path):
+                try:
+                    persisted = joblib.load(state_path)
+                    if persisted.source_path == csv_path and tuple(persisted.borough_codes) == borough_classes:
+                        store = persisted
+                except Exception as e:
+                    print(f"⚠️ Ignoring unreadable feature state {state_path}: {e}")
+            if store is None:
+                store = FeatureStateStore(borough_classes)
+            _stores[csv_path] = store
+
+    # A rewritten history is detected by the store and rebuilt from the full file
+    new_rows = store.sync_csv(csv_path)
+    if new_rows:
+        try:
+            store.save(state_path)
+        except OSError as e:
+            print(f"⚠️ Could not persist feature state: {e}")
+    return store
@@ -0,0 +1,209 @@
+"""
+Columnar on-disk feature store for the consumption history CSV.
+
+The CSV is converted once into a typed Parquet file (categorical borough,
+int16 calendar columns, float32 consumption and precomputed engineered
+features) so training and prediction skip CSV parsing and datetime
+conversion. Rows are written sorted by borough and date, which lets borough
+and date-range filters skip whole row groups.
+
+A manifest beside the Parquet file records the source CSV's mtime, size and
+SHA-256; the store is rebuilt automatically when the CSV changes. Without
+pyarrow, loading falls back to parsing the CSV.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    from AI_feeds.features import add_calendar_features, add_engineered_features, get_feature_columns
+except ImportError:
+    from features import add_calendar_features, add_engineered_features, get_feature_columns
+
+# Bump when the stored columns or dtypes change so old stores are rebuilt
+STORE_VERSION = 1
+ROW_GROUP_SIZE = 4096
+CALENDAR_COLUMNS = [
+    'year', 'month', 'day_of_month', 'day_of_week', 'day_of_year', 'week_of_year', 'hour',
+    'is_weekend', 'is_holiday', 'season', 'is_summer', 'is_winter'
+]
+
+_build_lock = threading.Lock()
+
+
+def get_store_paths(csv_path):
+    """Parquet and manifest paths stored beside the source CSV"""
+    base = os.path.splitext(csv_path)[0]
+    return f"{base}.features.parquet", f"{base}.features.json"
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_history_csv(csv_path):
+    """Parse the history CSV and add calendar and engineered features"""
+    df = pd.read_csv(csv_path)
+    df['date'] = pd.to_datetime(df['date'])
+    df = add_calendar_features(df)
+    return add_engineered_features(df)
+
+
+def to_store_types(df):
+    """Downcast a featurized history frame to the compact store schema"""
+    df = df.sort_values(['borough', 'date'], kind='stable').reset_index(drop=True)
+    df['borough'] = df['borough'].astype('category')
+    for col in CALENDAR_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(np.int16)
+    float_columns = [col for col in df.columns if pd.api.types.is_float_dtype(df[col])]
+    df[float_columns] = df[float_columns].astype(np.float32)
+    return df
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    # Write then rename so concurrent readers never see a partial file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def _write_manifest(manifest_path, manifest):
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    _write_atomic(manifest_path, write)
+
+
+def ensure_feature_store(csv_path):
+    """
+    Build or refresh the feature store for a history CSV
+
+    Returns:
+        str: Path of the up-to-date Parquet file
+    """
+    store_path, manifest_path = get_store_paths(csv_path)
+    with _build_lock:
+        stat = os.stat(csv_path)
+        manifest = _read_manifest(manifest_path)
+        if manifest and manifest.get('version') == STORE_VERSION and os.path.exists(store_path):
+            if manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+                return store_path
+            # Touched but possibly unchanged: the content hash decides
+            sha256 = file_sha256(csv_path)
+            if manifest['size'] == stat.st_size and manifest['sha256'] == sha256:
+                manifest['mtime_ns'] = stat.st_mtime_ns
+                _write_manifest(manifest_path, manifest)
+                return store_path
+        else:
+            sha256 = file_sha256(csv_path)
+
+        print(f"🔄 Building feature store for {csv_path}...")
+        df = to_store_types(read_history_csv(csv_path))
+        _write_atomic(store_path, lambda path: df.to_parquet(
+            path, engine='pyarrow', index=False, row_group_size=ROW_GROUP_SIZE
+        ))
+        manifest = {
+            'version': STORE_VERSION,
+            'source': os.path.abspath(csv_path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': sha256,
+            'rows': len(df)
+        }
+        _write_manifest(manifest_path, manifest)
+        print(f"✅ Feature store ready: {store_path} ({len(df)} rows)")
+        return store_path
+
+
+def load_feature_frame(csv_path, boroughs=None, start_date=None, end_date=None, columns=None):
+    """
+    Load the featurized history, optionally filtered by borough and date range
+
+    Filters are pushed down into the Parquet reader, and the file is memory-mapped.
+
+    Args:
+        csv_path: Source history CSV
+        boroughs: Only return these boroughs
+        start_date: Only return rows on or after this date
+        end_date: Only return rows on or before this date
+        columns: Only return these columns
+
+    Returns:
+        pd.DataFrame: History rows sorted by borough and date, with engineered features
+    """
+    if not PYARROW_AVAILABLE:
+        df = read_history_csv(csv_path)
+        if boroughs is not None:
+            df = df[df['borough'].isin(list(boroughs))]
+        if start_date is not None:
+            df = df[df['date'] >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            df = df[df['date'] <= pd.Timestamp(end_date)]
+        df = df.sort_values(['borough', 'date'], kind='stable').reset_index(drop=True)
+        return df[columns] if columns is not None else df
+
+    filters = []
+    if boroughs is not None:
+        filters.append(('borough', 'in', list(boroughs)))
+    if start_date is not None:
+        filters.append(('date', '>=', pd.Timestamp(start_date)))
+    if end_date is not None:
+        filters.append(('date', '<=', pd.Timestamp(end_date)))
+
+    store_path = ensure_feature_store(csv_path)
+    df = pd.read_parquet(store_path, engine='pyarrow', columns=columns,
+                         filters=filters or None, memory_map=True)
+    if 'borough' in df.columns and isinstance(df['borough'].dtype, pd.CategoricalDtype):
+        df['borough'] = df['borough'].cat.remove_unused_categories()
+    return df
+
+
+def load_borough_windows(csv_path, boroughs, borough_encoder, sequence_length=14):
+    """
+    Build model input windows from the precomputed features in the store
+
+    Returns:
+        tuple: (windows array of shape (n_boroughs, sequence_length, n_columns), last date per borough)
+    """
+    feature_columns = get_feature_columns()
+    stored_columns = ['date', 'borough'] + [col for col in feature_columns if col != 'borough_encoded']
+    df = load_feature_frame(csv_path, boroughs=boroughs, columns=stored_columns)
+    borough_frames = {borough: frame for borough, frame in df.groupby('borough', sort=False, observed=True)}
+
+    windows = []
+    last_dates = []
+    for borough in boroughs:
+        borough_df = borough_frames.get(borough)
+        if borough_df is None or len(borough_df) == 0:
+            raise ValueError(f"No data found for borough: {borough}")
+        borough_df = borough_df.iloc[-sequence_length:].copy()
+        borough_df['borough_encoded'] = borough_encoder.transform([borough])[0]
+        windows.append(borough_df[feature_columns].to_numpy(dtype=np.float64))
+        last_dates.append(borough_df['date'].iloc[-1])
+
+    return np.stack(windows), last_dates
@@ -0,0 +1,131 @@
+"""
+Feature engineering shared by model training and prediction serving.
+
+All rolling windows and lags are computed in one pass over the consumption
+series with boroughs laid out contiguously, using pandas' native rolling
+aggregations with borough-aware window bounds instead of one
+groupby/transform(lambda) pass per statistic.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+TARGET_COLUMN = 'consumption_(hcf)'
+ROLLING_WINDOWS = [7, 14, 30]
+ROLLING_STATS = ['mean', 'std', 'max', 'min']
+LAGS = [1, 7, 14]
+
+
+def get_feature_columns():
+    """Model input columns in training order, with the target variable last"""
+    feature_columns = [
+        'year', 'month', 'day_of_month', 'day_of_week', 'day_of_year', 'week_of_year',
+        'borough_encoded', 'hour', 'day_sin', 'day_cos', 'month_sin', 'month_cos',
+        'week_sin', 'week_cos'
+    ]
+
+    # Add rolling statistics and lag features
+    for window in ROLLING_WINDOWS:
+        feature_columns.extend([f'rolling_{stat}_{window}d' for stat in ROLLING_STATS])
+
+    for lag in LAGS:
+        feature_columns.append(f'consumption_lag_{lag}')
+
+    # Add target variable as the last column
+    feature_columns.append(TARGET_COLUMN)
+    return feature_columns
+
+
+def add_calendar_features(df):
+    """Add the calendar columns the model expects, derived from the date column"""
+    df['year'] = df['date'].dt.year
+    df['month'] = df['date'].dt.month
+    df['day_of_month'] = df['date'].dt.day
+    df['day_of_week'] = df['date'].dt.dayofweek
+    df['day_of_year'] = df['date'].dt.dayofyear
+    df['week_of_year'] = df['date'].dt.isocalendar().week
+    return df
+
+
+class BoroughWindowIndexer(BaseIndexer):
+    """Trailing windows over rows sorted by borough that never reach back into the previous borough"""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.group_starts).astype(np.int64)
+        return start, end
+
+
+def compute_borough_window_features(boroughs, consumption):
+    """
+    Compute rolling statistics and lags of consumption within each borough
+
+    Args:
+        boroughs: Borough label for each row
+        consumption: Consumption value for each row, in chronological order per borough
+
+    Returns:
+        dict: Feature name -> float64 array aligned with the input rows
+    """
+    consumption = np.asarray(consumption, dtype=np.float64)
+    codes, _ = pd.factorize(np.asarray(boroughs))
+
+    # Make each borough contiguous (keeping row order within it) so one rolling
+    # pass over the whole array covers every borough
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    sorted_values = pd.Series(consumption[order])
+    rows = np.arange(len(consumption))
+    is_group_start = np.ones(len(rows), dtype=bool)
+    is_group_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    group_starts = np.maximum.accumulate(np.where(is_group_start, rows, 0))
+    ungrouped_rows = codes == -1
+
+    def restore_order(values):
+        restored = np.empty(len(consumption))
+        restored[order] = values
+        # Rows without a borough belong to no group, matching groupby's handling of missing keys
+        restored[ungrouped_rows] = np.nan
+        return restored
+
+    features = {}
+    for window in ROLLING_WINDOWS:
+        indexer = BoroughWindowIndexer(window_size=window, group_starts=group_starts)
+        stats = sorted_values.rolling(indexer, min_periods=1).agg(ROLLING_STATS)
+        for stat in ROLLING_STATS:
+            features[f'rolling_{stat}_{window}d'] = restore_order(stats[stat].to_numpy())
+
+    for lag in LAGS:
+        lagged = np.full(len(consumption), np.nan)
+        source_rows = rows - lag
+        in_group = source_rows >= group_starts
+        lagged[in_group] = sorted_values.to_numpy()[source_rows[in_group]]
+        features[f'consumption_lag_{lag}'] = restore_order(lagged)
+
+    return features
+
+
+def add_engineered_features(df):
+    """Add engineered features to improve model performance"""
+    # Time-based features
+    df['hour'] = df['date'].dt.hour
+    df['day_sin'] = np.sin(2 * np.pi * df['day_of_year']/365)
+    df['day_cos'] = np.cos(2 * np.pi * df['day_of_year']/365)
+    df['month_sin'] = np.sin(2 * np.pi * df['month']/12)
+    df['month_cos'] = np.cos(2 * np.pi * df['month']/12)
+    df['week_sin'] = np.sin(2 * np.pi * df['week_of_year']/52)
+    df['week_cos'] = np.cos(2 * np.pi * df['week_of_year']/52)
+
+    # Rolling statistics and lag features by borough
+    window_features = compute_borough_window_features(df['borough'].to_numpy(), df[TARGET_COLUMN].to_numpy())
+    for name, values in window_features.items():
+        df[name] = values
+
+    # Fill NaN values in rolling and lag columns with each column's mean
+    fill_columns = [col for col in df.columns if 'lag' in col or 'rolling' in col]
+    fill_columns = [col for col in fill_columns if df[col].isnull().any()]
+    if fill_columns:
+        df[fill_columns] = df[fill_columns].fillna(df[fill_columns].mean())
+
+    return df
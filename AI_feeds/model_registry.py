@@ -0,0 +1,161 @@
+"""
+Process-wide registry for the trained LSTM model and its preprocessing artifacts.
+
+The Keras model, feature scaler and borough encoder are loaded once and shared
+by every request in the process. The registry watches the files on disk and,
+when any of them changes, loads a complete new bundle before swapping it in,
+so a caller never sees a model from one version paired with a scaler from another.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+DEFAULT_MODEL_PATH = 'AI_feeds/models/best_model.h5'
+DEFAULT_SCALER_PATH = 'AI_feeds/models/feature_scaler.joblib'
+DEFAULT_ENCODER_PATH = 'AI_feeds/models/borough_encoder.joblib'
+
+
+def load_keras_model(model_path):
+    """Load a Keras model (TensorFlow is imported lazily to keep registry imports cheap)"""
+    import tensorflow as tf
+    return tf.keras.models.load_model(model_path)
+
+
+class ModelBundle:
+    """A consistent snapshot of the model, scaler and encoder loaded together"""
+
+    def __init__(self, model, scaler, borough_encoder, version, fingerprint, loaded_at, load_time_s):
+        self.model = model
+        self.scaler = scaler
+        self.borough_encoder = borough_encoder
+        self.version = version
+        self.fingerprint = fingerprint
+        self.loaded_at = loaded_at
+        self.load_time_s = load_time_s
+
+
+class ModelRegistry:
+    """Loads the model artifacts once and hot-swaps them when the files on disk change"""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, scaler_path=DEFAULT_SCALER_PATH,
+                 encoder_path=DEFAULT_ENCODER_PATH, check_interval=2.0,
+                 model_loader=load_keras_model, artifact_loader=joblib.load):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.encoder_path = encoder_path
+        self.check_interval = check_interval
+        self._model_loader = model_loader
+        self._artifact_loader = artifact_loader
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._version = 0
+        self._last_check = 0.0
+        self._reload_failures = 0
+        self._last_error = None
+
+    def _paths(self):
+        return (self.model_path, self.scaler_path, self.encoder_path)
+
+    def _fingerprint(self):
+        """Identify the current on-disk artifacts by size and modification time"""
+        missing = [path for path in self._paths() if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError("Required model files not found. Please ensure the model is trained first.")
+        fingerprint = []
+        for path in self._paths():
+            stat = os.stat(path)
+            fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def _load(self, fingerprint):
+        start_time = time.perf_counter()
+        model = self._model_loader(self.model_path)
+        scaler = self._artifact_loader(self.scaler_path)
+        borough_encoder = self._artifact_loader(self.encoder_path)
+        load_time_s = time.perf_counter() - start_time
+        return ModelBundle(
+            model=model,
+            scaler=scaler,
+            borough_encoder=borough_encoder,
+            version=self._version + 1,
+            fingerprint=fingerprint,
+            loaded_at=datetime.now().isoformat(),
+            load_time_s=load_time_s
+        )
+
+    def get(self):
+        """Return the current bundle, loading or hot-swapping it if the files changed"""
+        bundle = self._bundle
+        now = time.monotonic()
+        if bundle is not None and now - self._last_check < self.check_interval:
+            return bundle
+
+        try:
+            fingerprint = self._fingerprint()
+        except FileNotFoundError:
+            if bundle is not None:
+                # Artifacts are being replaced; keep serving the loaded version
+                return bundle
+            raise
+
+        if bundle is not None and bundle.fingerprint == fingerprint:
+            self._last_check = now
+            return bundle
+
+        with self._lock:
+            # Another thread may have finished the reload while we waited
+            bundle = self._bundle
+            if bundle is not None and bundle.fingerprint == fingerprint:
+                return bundle
+            try:
+                new_bundle = self._load(fingerprint)
+            except Exception as e:
+                self._reload_failures += 1
+                self._last_error = str(e)
+                if bundle is None:
+                    raise
+                print(f"⚠️ Model reload failed, keeping version {bundle.version}: {e}")
+                self._last_check = now
+                return bundle
+            self._version = new_bundle.version
+            self._bundle = new_bundle
+            self._last_check = now
+            self._last_error = None
+
+        print(f"🧠 Loaded model artifacts version {new_bundle.version} in {new_bundle.load_time_s:.2f}s")
+        return new_bundle
+
+    def stats(self):
+        """Describe the loaded bundle for health and monitoring endpoints"""
+        bundle = self._bundle
+        return {
+            "loaded": bundle is not None,
+            "version": bundle.version if bundle else None,
+            "loaded_at": bundle.loaded_at if bundle else None,
+            "load_time_s": round(bundle.load_time_s, 4) if bundle else None,
+            "model_path": self.model_path,
+            "reload_failures": self._reload_failures,
+            "last_error": self._last_error
+        }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(model_path=DEFAULT_MODEL_PATH, scaler_path=DEFAULT_SCALER_PATH,
+                       encoder_path=DEFAULT_ENCODER_PATH):
+    """Return the shared registry for a set of artifact paths"""
+    key = (model_path, scaler_path, encoder_path)
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = ModelRegistry(model_path, scaler_path, encoder_path)
+                _registries[key] = registry
+    return registry
@@ -1,47 +1,21 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-import tensorflow as tf
-import joblib
 from datetime import datetime, timedelta
 import os
 import json
 import uuid
 import statistics
 
-def add_engineered_features(df):
-    """Add engineered features to improve model performance"""
-    # Time-based features
-    df['hour'] = df['date'].dt.hour
-    df['day_sin'] = np.sin(2 * np.pi * df['day_of_year']/365)
-    df['day_cos'] = np.cos(2 * np.pi * df['day_of_year']/365)
-    df['month_sin'] = np.sin(2 * np.pi * df['month']/12)
-    df['month_cos'] = np.cos(2 * np.pi * df['month']/12)
-    df['week_sin'] = np.sin(2 * np.pi * df['week_of_year']/52)
-    df['week_cos'] = np.cos(2 * np.pi * df['week_of_year']/52)
-    
-    # Rolling statistics by borough
-    for window in [7, 14, 30]:
-        df[f'rolling_mean_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).mean())
-        df[f'rolling_std_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).std())
-        df[f'rolling_max_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).max())
-        df[f'rolling_min_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).min())
-
-    # Lag features
-    for lag in [1, 7, 14]:
-        df[f'consumption_lag_{lag}'] = df.groupby('borough')['consumption_(hcf)'].shift(lag)
-    
-    # Fill NaN values with appropriate statistics
-    for col in df.columns:
-        if df[col].isnull().any():
-            if 'lag' in col or 'rolling' in col:
-                df[col].fillna(df[col].mean(), inplace=True)
-    
-    return df
+try:
+    from AI_feeds.feature_state import get_feature_state
+    from AI_feeds.feature_store import load_borough_windows
+    from AI_feeds.features import add_calendar_features, add_engineered_features, get_feature_columns
+    from AI_feeds.model_registry import get_model_registry
+except ImportError:
+    from feature_state import get_feature_state
+    from feature_store import load_borough_windows
+    from features import add_calendar_features, add_engineered_features, get_feature_columns
+    from model_registry import get_model_registry
 
 def prepare_data_for_prediction(data, sequence_length=14):
     """Prepare the last sequence_length days of data for prediction"""
@@ -49,24 +23,7 @@ def prepare_data_for_prediction(data, sequence_length=14):
     prediction_data = data[-sequence_length:].copy()
     
     # Ensure all features are present and in the correct order
-    feature_columns = [
-        'year', 'month', 'day_of_month', 'day_of_week', 'day_of_year', 'week_of_year',
-        'borough_encoded', 'hour', 'day_sin', 'day_cos', 'month_sin', 'month_cos',
-        'week_sin', 'week_cos'
-    ]
-    
-    # Add rolling statistics and lag features
-    for window in [7, 14, 30]:
-        feature_columns.extend([
-            f'rolling_mean_{window}d', f'rolling_std_{window}d',
-            f'rolling_max_{window}d', f'rolling_min_{window}d'
-        ])
-    
-    for lag in [1, 7, 14]:
-        feature_columns.append(f'consumption_lag_{lag}')
-    
-    # Add target variable as the last column
-    feature_columns.append('consumption_(hcf)')
+    feature_columns = get_feature_columns()
     
     # Ensure all columns are present and in the right order
     missing_cols = set(feature_columns) - set(prediction_data.columns)
@@ -77,94 +34,98 @@ def prepare_data_for_prediction(data, sequence_length=14):
     # Return data with exact column order
     return prediction_data[feature_columns]
 
+def build_borough_windows(df, boroughs, borough_encoder, sequence_length=14):
+    """
+    Build the model input window for every borough from one pass over the data
+
+    Args:
+        df: Historical data with 'date', 'borough' and 'consumption_(hcf)' columns
+        boroughs: Borough names to build windows for, in output order
+        borough_encoder: Fitted LabelEncoder for the borough names
+        sequence_length: Number of trailing days in each window
+
+    Returns:
+        tuple: (windows array of shape (n_boroughs, sequence_length, n_columns), last date per borough)
+    """
+    # Add time-based features once for the whole frame
+    df = add_calendar_features(df.copy())
+
+    borough_frames = {borough: frame for borough, frame in df.groupby('borough', sort=False)}
+
+    feature_columns = get_feature_columns()
+    windows = []
+    last_dates = []
+    for borough in boroughs:
+        borough_df = borough_frames.get(borough)
+        if borough_df is None or len(borough_df) == 0:
+            raise ValueError(f"No data found for borough: {borough}")
+
+        # Features are engineered per borough so gap filling uses that borough's statistics
+        borough_df = borough_df.sort_values('date').copy()
+        borough_df['borough_encoded'] = borough_encoder.transform([borough])[0]
+        borough_df = add_engineered_features(borough_df)
+
+        windows.append(borough_df[feature_columns].to_numpy(dtype=np.float64)[-sequence_length:])
+        last_dates.append(borough_df['date'].iloc[-1])
+
+    return np.stack(windows), last_dates
+
+def predict_boroughs(boroughs, historical_data_path='high_quality_water_consumption.csv',
+                     model_path='AI_feeds/models/best_model.h5', scaler_path='AI_feeds/models/feature_scaler.joblib',
+                     encoder_path='AI_feeds/models/borough_encoder.joblib', use_feature_state=True):
+    """
+    Predict next-day consumption for several boroughs with a single model forward pass
+
+    With use_feature_state, windows come from the persisted incremental feature
+    state, which only reads rows appended to the history CSV since the last call.
+    Otherwise windows are read from the columnar feature store, which holds
+    precomputed features and is rebuilt when the history CSV changes.
+
+    Returns:
+        tuple: (predicted consumption array in borough order, list of prediction dates)
+    """
+    # Get the shared model and preprocessing objects (loaded once per process)
+    bundle = get_model_registry(model_path, scaler_path, encoder_path).get()
+    model = bundle.model
+    scaler = bundle.scaler
+    borough_encoder = bundle.borough_encoder
+
+    if use_feature_state:
+        feature_state = get_feature_state(historical_data_path, borough_encoder)
+        windows, last_dates = feature_state.windows(boroughs)
+    else:
+        windows, last_dates = load_borough_windows(historical_data_path, boroughs, borough_encoder)
+    n_boroughs, sequence_length, n_columns = windows.shape
+
+    # Scale all windows together, then drop the target column for the LSTM input
+    scaled_windows = scaler.transform(windows.reshape(-1, n_columns)).reshape(windows.shape)
+    X_pred = scaled_windows[:, :, :-1]
+
+    # One forward pass for the whole (n_boroughs, sequence_length, n_features) batch
+    scaled_predictions = model.predict(X_pred, verbose=0)
+
+    # Inverse transform the predictions
+    dummy_array = np.zeros((n_boroughs, n_columns))
+    dummy_array[:, -1] = scaled_predictions[:, 0]
+    predictions = scaler.inverse_transform(dummy_array)[:, -1]
+
+    next_dates = [last_date + timedelta(days=1) for last_date in last_dates]
+    return predictions, next_dates
+
 def make_prediction(borough_name, historical_data_path='high_quality_water_consumption.csv', 
                    model_path='AI_feeds/models/best_model.h5', scaler_path='AI_feeds/models/feature_scaler.joblib',
                    encoder_path='AI_feeds/models/borough_encoder.joblib'):
     """Make water consumption predictions for a specific borough"""
-    
-    # Load the model and preprocessing objects
-    if not all(os.path.exists(path) for path in [model_path, scaler_path, encoder_path]):
-        raise FileNotFoundError("Required model files not found. Please ensure the model is trained first.")
-    
-    model = tf.keras.models.load_model(model_path)
-    scaler = joblib.load(scaler_path)
-    borough_encoder = joblib.load(encoder_path)
-    
-    # Load and preprocess historical data
-    df = pd.read_csv(historical_data_path)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Filter for the specified borough
-    df = df[df['borough'] == borough_name].copy()
-    if len(df) == 0:
-        raise ValueError(f"No data found for borough: {borough_name}")
-    
-    # Sort by date
-    df = df.sort_values('date')
-    
-    # Add time-based features
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day_of_month'] = df['date'].dt.day
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['day_of_year'] = df['date'].dt.dayofyear
-    df['week_of_year'] = df['date'].dt.isocalendar().week
-    
-    # Encode borough
-    df['borough_encoded'] = borough_encoder.transform([borough_name])[0]
-    
-    # Add engineered features
-    df = add_engineered_features(df)
-    
-    # Prepare feature columns in the correct order
-    feature_columns = [
-        'year', 'month', 'day_of_month', 'day_of_week', 'day_of_year', 'week_of_year',
-        'borough_encoded', 'hour', 'day_sin', 'day_cos', 'month_sin', 'month_cos',
-        'week_sin', 'week_cos'
-    ]
-    
-    # Add rolling statistics and lag features
-    for window in [7, 14, 30]:
-        feature_columns.extend([
-            f'rolling_mean_{window}d', f'rolling_std_{window}d',
-            f'rolling_max_{window}d', f'rolling_min_{window}d'
-        ])
-    
-    for lag in [1, 7, 14]:
-        feature_columns.append(f'consumption_lag_{lag}')
-    
-    # Add target variable as the last column
-    feature_columns.append('consumption_(hcf)')
-    
-    # Get the last 14 days of data
-    sequence_length = 14
-    last_sequence = df[feature_columns].values[-sequence_length:]
-    
-    # Scale the features
-    scaled_sequence = scaler.transform(last_sequence)
-    
-    # Remove the target column and reshape for LSTM
-    X_pred = scaled_sequence[:, :-1].reshape(1, sequence_length, len(feature_columns)-1)
-    
-    # Make prediction
-    scaled_prediction = model.predict(X_pred, verbose=0)
-    
-    # Inverse transform the prediction
-    dummy_array = np.zeros((1, len(feature_columns)))
-    dummy_array[0, -1] = scaled_prediction[0, 0]
-    prediction = scaler.inverse_transform(dummy_array)[0, -1]
-    
-    # Get the date for the prediction
-    last_date = df['date'].iloc[-1]
-    next_date = last_date + timedelta(days=1)
-    
-    return prediction, next_date
+    predictions, next_dates = predict_boroughs(
+        [borough_name], historical_data_path, model_path, scaler_path, encoder_path
+    )
+    return predictions[0], next_dates[0]
 
 def generate_prediction_report():
     """Generate a JSON formatted prediction report for all boroughs"""
     try:
-        # Load borough encoder to get all borough names
-        borough_encoder = joblib.load('AI_feeds/models/borough_encoder.joblib')
+        # Get borough names from the shared borough encoder
+        borough_encoder = get_model_registry().get().borough_encoder
         all_boroughs = borough_encoder.classes_
         
         # Create prediction report
@@ -177,11 +138,12 @@ def generate_prediction_report():
         total_consumption = 0
         predictions = {}
         
-        # Get predictions for each borough
-        for borough in all_boroughs:
-            consumption, pred_date = make_prediction(borough)
+        # Get predictions for all boroughs in one batched forward pass
+        borough_predictions, pred_dates = predict_boroughs(all_boroughs)
+        for borough, consumption in zip(all_boroughs, borough_predictions):
             predictions[borough] = consumption
             total_consumption += consumption
+        pred_date = pred_dates[-1]
         
         percentages = []
         # Calculate percentages and format predictions
@@ -231,10 +193,11 @@ def run_prediction(input_file_path):
         if input_file_path.endswith('.csv'):
             try:
                 # Use the uploaded file as the data source
-                # Load the borough encoder to get borough names
-                borough_encoder = joblib.load('AI_feeds/models/borough_encoder.joblib')
-                model = tf.keras.models.load_model('AI_feeds/models/best_model.h5')
-                scaler = joblib.load('AI_feeds/models/feature_scaler.joblib')
+                # Get the shared model artifacts (loaded once per process)
+                bundle = get_model_registry().get()
+                borough_encoder = bundle.borough_encoder
+                model = bundle.model
+                scaler = bundle.scaler
                 
                 # Load the uploaded CSV
                 df = pd.read_csv(input_file_path)
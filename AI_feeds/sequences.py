@@ -0,0 +1,106 @@
+"""
+Sequence windowing for LSTM training.
+
+Windows are strided views into the scaled feature matrix rather than copies,
+so building them costs no memory. Batches are materialized one at a time by
+the training generator.
+
+With several boroughs in one frame, the rows are laid out borough by borough
+and a window index lists the sequences that stay inside a single borough,
+ordered by target date so train/validation/test splits stay chronological.
+"""
+
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def create_sequences(data, seq_length):
+    """
+    Create overlapping LSTM sequences as zero-copy views of data
+
+    Args:
+        data: 2D array of scaled features with the target variable as the last column
+        seq_length: Number of time steps in each input sequence
+
+    Returns:
+        tuple: (X view of shape (n, seq_length, n_features), y view of shape (n,))
+            where X[i] = data[i:i + seq_length, :-1] and y[i] = data[i + seq_length, -1]
+    """
+    data = np.asarray(data)
+    n_sequences = len(data) - seq_length
+    if n_sequences <= 0:
+        return np.empty((0, seq_length, data.shape[1] - 1), dtype=data.dtype), np.empty(0, dtype=data.dtype)
+
+    # sliding_window_view puts the window axis last: (n, n_features, seq_length)
+    windows = sliding_window_view(data[:-1, :-1], seq_length, axis=0)
+    X = windows.transpose(0, 2, 1)
+    y = data[seq_length:, -1]
+    return X, y
+
+
+def gather_batch(X, y, indices, dtype=np.float32):
+    """Copy only the requested sequences out of the strided views"""
+    return X[indices].astype(dtype, copy=False), y[indices].astype(dtype, copy=False)
+
+
+def build_window_index(groups, dates, seq_length):
+    """
+    Find the sequences that never cross a group (borough) boundary
+
+    Args:
+        groups: Group code for each row, with each group's rows contiguous and date-ordered
+        dates: Date of each row
+        seq_length: Number of time steps in each input sequence
+
+    Returns:
+        np.ndarray: int64 start offsets of valid sequences, ordered by target date
+    """
+    groups = np.asarray(groups)
+    n_sequences = len(groups) - seq_length
+    if n_sequences <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Rows are contiguous per group, so a window is valid when its first row
+    # and its target row belong to the same group
+    starts = np.flatnonzero(groups[:n_sequences] == groups[seq_length:]).astype(np.int64)
+    target_dates = np.asarray(dates)[starts + seq_length]
+    return starts[np.argsort(target_dates, kind='stable')]
+
+
+def is_valid_window_index(index, groups, dates, seq_length):
+    """Check that a cached window index still fits the rows it will be applied to"""
+    groups = np.asarray(groups)
+    if index.ndim != 1 or not np.issubdtype(index.dtype, np.integer):
+        return False
+    if len(index) == 0:
+        return len(groups) <= seq_length
+    if index.min() < 0 or index.max() + seq_length >= len(groups):
+        return False
+    if len(index) != np.count_nonzero(groups[:-seq_length] == groups[seq_length:]):
+        return False
+    if not np.all(groups[index] == groups[index + seq_length]):
+        return False
+    target_dates = np.asarray(dates)[index + seq_length]
+    return bool(np.all(target_dates[1:] >= target_dates[:-1]))
+
+
+def load_window_index(path, groups, dates, seq_length):
+    """
+    Load the window index cached at path, rebuilding and saving it when missing or stale
+
+    Returns:
+        np.ndarray: int64 start offsets of valid sequences, ordered by target date
+    """
+    if os.path.exists(path):
+        try:
+            index = np.load(path)
+            if is_valid_window_index(index, groups, dates, seq_length):
+                return index
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Rebuilding unreadable window index {path}: {e}")
+
+    index = build_window_index(groups, dates, seq_length)
+    np.save(path, index)
+    return index
@@ -10,9 +10,20 @@ from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCh
 import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
+import argparse
+import math
 import os
 from datetime import datetime
 
+try:
+    from AI_feeds.feature_store import load_feature_frame
+    from AI_feeds.features import get_feature_columns
+    from AI_feeds.sequences import create_sequences, gather_batch, load_window_index
+except ImportError:
+    from feature_store import load_feature_frame
+    from features import get_feature_columns
+    from sequences import create_sequences, gather_batch, load_window_index
+
 # Create models directory if it doesn't exist
 if not os.path.exists('models'):
     os.makedirs('models')
@@ -21,53 +32,19 @@ if not os.path.exists('models'):
 np.random.seed(42)
 tf.random.set_seed(42)
 
-def add_engineered_features(df):
-    """Add engineered features to improve model performance"""
-    # Time-based features
-    df['hour'] = df['date'].dt.hour
-    df['day_sin'] = np.sin(2 * np.pi * df['day_of_year']/365)
-    df['day_cos'] = np.cos(2 * np.pi * df['day_of_year']/365)
-    df['month_sin'] = np.sin(2 * np.pi * df['month']/12)
-    df['month_cos'] = np.cos(2 * np.pi * df['month']/12)
-    df['week_sin'] = np.sin(2 * np.pi * df['week_of_year']/52)
-    df['week_cos'] = np.cos(2 * np.pi * df['week_of_year']/52)
-    
-    # Rolling statistics by borough
-    for window in [7, 14, 30]:
-        df[f'rolling_mean_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).mean())
-        df[f'rolling_std_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).std())
-        df[f'rolling_max_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).max())
-        df[f'rolling_min_{window}d'] = df.groupby('borough')['consumption_(hcf)'].transform(
-            lambda x: x.rolling(window=window, min_periods=1).min())
-
-    # Lag features
-    for lag in [1, 7, 14]:
-        df[f'consumption_lag_{lag}'] = df.groupby('borough')['consumption_(hcf)'].shift(lag)
-    
-    # Fill NaN values with appropriate statistics
-    for col in df.columns:
-        if df[col].isnull().any():
-            if 'lag' in col or 'rolling' in col:
-                df[col].fillna(df[col].mean(), inplace=True)
-    
-    return df
-
 def load_and_preprocess_data(file_path):
     """Load and preprocess the data"""
     print("Loading and preprocessing data...")
-    df = pd.read_csv(file_path)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
+    # Typed history with engineered features precomputed by the feature store
+    df = load_feature_frame(file_path)
     
     # Encode borough
     le = LabelEncoder()
-    df['borough_encoded'] = le.fit_transform(df['borough'])
+    df['borough_encoded'] = le.fit_transform(df['borough'].astype(str))
     
-    # Add engineered features
-    df = add_engineered_features(df)
+    # Lay boroughs out contiguously, each in date order, so sequences can be
+    # windowed within a single borough
+    df = df.sort_values(['borough_encoded', 'date'], kind='stable').reset_index(drop=True)
     
     # Save the label encoder for future use
     joblib.dump(le, 'models/borough_encoder.joblib')
@@ -87,13 +64,29 @@ def load_and_preprocess_data(file_path):
     
     return df
 
-def create_sequences(data, seq_length):
-    """Create sequences for LSTM with overlap"""
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:(i + seq_length), :-1])
-        y.append(data[i + seq_length, -1])
-    return np.array(X), np.array(y)
+class SequenceBatches(tf.keras.utils.Sequence):
+    """Keras data generator that copies one batch of sequences at a time out of strided views"""
+
+    def __init__(self, X, y, indices, batch_size=32, shuffle=False):
+        super().__init__()
+        self.X = X
+        self.y = y
+        self.indices = np.array(indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        if self.shuffle:
+            np.random.shuffle(self.indices)
+
+    def __len__(self):
+        return math.ceil(len(self.indices) / self.batch_size)
+
+    def __getitem__(self, idx):
+        batch_indices = self.indices[idx * self.batch_size:(idx + 1) * self.batch_size]
+        return gather_batch(self.X, self.y, batch_indices)
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.indices)
 
 def build_model(sequence_length, n_features):
     """Build an optimized LSTM model"""
@@ -203,60 +196,45 @@ def evaluate_model(model, X_test, y_test, scaler, features):
 
 def train_model():
     """Train the LSTM model"""
-    # Load and preprocess data
+    # Load and preprocess data (calendar features come precomputed from the feature store)
     df = load_and_preprocess_data('high_quality_water_consumption.csv')
     
-    # Add time-based features
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day_of_month'] = df['date'].dt.day
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['day_of_year'] = df['date'].dt.dayofyear
-    df['week_of_year'] = df['date'].dt.isocalendar().week
-    
-    # Prepare feature columns in the correct order
-    feature_columns = [
-        'year', 'month', 'day_of_month', 'day_of_week', 'day_of_year', 'week_of_year',
-        'borough_encoded', 'hour', 'day_sin', 'day_cos', 'month_sin', 'month_cos',
-        'week_sin', 'week_cos'
-    ]
-    
-    # Add rolling statistics and lag features to columns list
-    for window in [7, 14, 30]:
-        feature_columns.extend([
-            f'rolling_mean_{window}d', f'rolling_std_{window}d',
-            f'rolling_max_{window}d', f'rolling_min_{window}d'
-        ])
-    
-    for lag in [1, 7, 14]:
-        feature_columns.append(f'consumption_lag_{lag}')
-    
-    # Add target variable as the last column
-    feature_columns.append('consumption_(hcf)')
+    # Prepare feature columns in the correct order, with the target variable last
+    feature_columns = get_feature_columns()
     
     # Select features and target
     data = df[feature_columns].values
     
-    # Scale the features
+    # Scale the features (float32 is what the model consumes)
     scaler = MinMaxScaler()
-    scaled_data = scaler.fit_transform(data)
+    scaled_data = scaler.fit_transform(data).astype(np.float32)
     
     # Save the scaler for future use
     joblib.dump(scaler, 'models/feature_scaler.joblib')
     
-    # Create sequences
+    # Create sequences (strided views, batches are copied on demand)
     sequence_length = 14
+    batch_size = 32
     X, y = create_sequences(scaled_data, sequence_length)
-    print(f"\nTotal sequences created: {len(X)}")
-    print(f"Sequence shape: {X.shape}")
-    
-    # Split into training and test sets (80-20 split)
-    train_size = int(len(X) * 0.8)
-    X_train, X_test = X[:train_size], X[train_size:]
-    y_train, y_test = y[:train_size], y[train_size:]
     
-    print(f"\nTraining set size: {len(X_train)}")
-    print(f"Test set size: {len(X_test)}")
+    # Only windows that stay within one borough are used; their start offsets
+    # are cached beside the scaler and ordered by target date
+    window_index = load_window_index('models/window_index.npy', df['borough_encoded'].to_numpy(),
+                                     df['date'].to_numpy(), sequence_length)
+    print(f"\nTotal sequences created: {len(window_index)}")
+    print(f"Sequence shape: {(len(window_index),) + X.shape[1:]}")
+    
+    # Split into training and test sets (80-20 split by target date), then hold
+    # out the last 20% of the training sequences for validation
+    train_size = int(len(window_index) * 0.8)
+    validation_start = int(math.ceil(train_size * 0.8))
+    train_batches = SequenceBatches(X, y, window_index[:validation_start], batch_size, shuffle=True)
+    validation_batches = SequenceBatches(X, y, window_index[validation_start:train_size], batch_size)
+    test_batches = SequenceBatches(X, y, window_index[train_size:], batch_size)
+    y_test = y[window_index[train_size:]]
+    
+    print(f"\nTraining set size: {train_size}")
+    print(f"Test set size: {len(window_index) - train_size}")
     
     # Build and compile the model
     n_features = X.shape[2]
@@ -283,10 +261,9 @@ def train_model():
     # Train the model
     print("\nTraining the model...")
     history = model.fit(
-        X_train, y_train,
+        train_batches,
         epochs=100,
-        batch_size=32,
-        validation_split=0.2,
+        validation_data=validation_batches,
         callbacks=callbacks,
         verbose=1
     )
@@ -305,11 +282,80 @@ def train_model():
     
     # Evaluate the model
     print("\nEvaluating model performance...")
-    evaluate_model(model, X_test, y_test, scaler, feature_columns)
+    evaluate_model(model, test_batches, y_test, scaler, feature_columns)
     
     # Save the final model
     model.save('models/water_consumption_model.h5')
     print("\nTraining completed. Model and artifacts saved in 'models' directory.")
 
+def train_model_streaming(csv_path='high_quality_water_consumption.csv', chunksize=100000,
+                          batch_size=32, shuffle_buffer=10000, epochs=100):
+    """
+    Train the LSTM model from a tf.data pipeline that streams the history CSV
+
+    The dataset is never loaded whole: it is read in chunks, windowed per
+    borough and scaled inside the pipeline, so histories larger than RAM can
+    be trained on. The last 20% of the date range is used for validation.
+    """
+    try:
+        from AI_feeds.data_pipeline import ThroughputCallback, fit_streaming_scaler, make_dataset, scan_history
+    except ImportError:
+        from data_pipeline import ThroughputCallback, fit_streaming_scaler, make_dataset, scan_history
+
+    print("Scanning history for streaming training...")
+    borough_encoder, n_rows, first_date, last_date = scan_history(csv_path, chunksize)
+    split_date = first_date + (last_date - first_date) * 0.8
+    print(f"Rows: {n_rows}, date range: {first_date} to {last_date}")
+    print(f"Boroughs: {len(borough_encoder.classes_)}, validation from {split_date}")
+    joblib.dump(borough_encoder, 'models/borough_encoder.joblib')
+
+    scaler = fit_streaming_scaler(csv_path, borough_encoder, chunksize)
+    joblib.dump(scaler, 'models/feature_scaler.joblib')
+
+    sequence_length = 14
+    n_features = len(get_feature_columns()) - 1
+    dataset_args = dict(sequence_length=sequence_length, batch_size=batch_size,
+                        shuffle_buffer=shuffle_buffer, chunksize=chunksize, split_date=split_date)
+    train_dataset = make_dataset(csv_path, borough_encoder, scaler, subset='train', **dataset_args)
+    validation_dataset = make_dataset(csv_path, borough_encoder, scaler, subset='validation', **dataset_args)
+
+    model = build_model(sequence_length, n_features)
+    model(np.zeros((1, sequence_length, n_features)))
+    model.summary()
+
+    throughput = ThroughputCallback(batch_size)
+    callbacks = [
+        throughput,
+        EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=5, min_lr=0.0001),
+        ModelCheckpoint('models/best_model.h5', monitor='val_loss', save_best_only=True)
+    ]
+
+    print("\nTraining the model from the streaming pipeline...")
+    history = model.fit(
+        train_dataset,
+        epochs=epochs,
+        validation_data=validation_dataset,
+        callbacks=callbacks,
+        verbose=1
+    )
+
+    if throughput.history:
+        print(f"\nMean throughput: {np.mean(throughput.history):,.0f} samples/sec")
+    model.save('models/water_consumption_model.h5')
+    print("\nTraining completed. Model and artifacts saved in 'models' directory.")
+    return history
+
 if __name__ == "__main__":
-    train_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the water consumption LSTM model')
+    parser.add_argument('--tf-data', action='store_true',
+                        help='Stream the history CSV through a tf.data pipeline instead of loading it into memory')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='CSV rows read per chunk with --tf-data')
+    parser.add_argument('--shuffle-buffer', type=int, default=10000, help='Shuffle buffer size with --tf-data')
+    parser.add_argument('--epochs', type=int, default=100, help='Training epochs with --tf-data')
+    args = parser.parse_args()
+
+    if args.tf_data:
+        train_model_streaming(chunksize=args.chunk_size, shuffle_buffer=args.shuffle_buffer, epochs=args.epochs)
+    else:
+        train_model() 
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Section-level persistence for the dashboard analytics data.
+
+The analytics dict used to be saved as one JSON blob (delete + re-insert on
+every update) and parsed back whole on every read. Now:
+
+- each top-level section is its own row in `analytics_sections`, written
+  only when its content changed, with a version that bumps on every write
+- the two lists that keep growing (`real_time_consumption` and
+  `operations.daily_processing_volume`) are written as an append-only log
+  in `analytics_log`: each save records just the new entries and how many
+  entries the list keeps, and every COMPACT_EVERY log rows the list is
+  folded back into a snapshot row
+- loading compares section versions and the last log row seen, and only
+  fetches sections that changed and log rows it hasn't replayed yet
+
+The legacy `analytics_data_persistent` blob is split into sections once,
+the first time the new tables are empty.
+"""
+
+import json
+import threading
+from collections import Counter
+
+# Lists stored as snapshot + append log, by storage name -> path in the analytics dict
+APPEND_LISTS = {
+    "real_time_consumption": ("real_time_consumption",),
+    "operations.daily_processing_volume": ("operations", "daily_processing_volume"),
+}
+COMPACT_EVERY = 50
+
+UPSERT_SECTION = '''
+    INSERT INTO analytics_sections (name, data_json, version, updated_at)
+    VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT(name) DO UPDATE SET
+        data_json = excluded.data_json, version = version + 1, updated_at = CURRENT_TIMESTAMP
+'''
+APPEND_LOG = 'INSERT INTO analytics_log (section, data_json) VALUES (?, ?)'
+
+
+def create_analytics_tables(conn):
+    """Create the section and log tables and migrate a legacy snapshot blob"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_sections (
+            name TEXT PRIMARY KEY,
+            data_json TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section TEXT NOT NULL,
+            data_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analytics_log_section ON analytics_log (section, id)')
+
+    if conn.execute('SELECT COUNT(*) FROM analytics_sections').fetchone()[0]:
+        return
+    legacy = conn.execute(
+        'SELECT data_json FROM analytics_data_persistent ORDER BY id DESC LIMIT 1'
+    ).fetchone()
+    if legacy:
+        conn.executemany(UPSERT_SECTION, [(name, data_json) for name, data_json in split_sections(json.loads(legacy[0]))])
+        conn.execute('DELETE FROM analytics_data_persistent')
+        print("📦 Migrated analytics snapshot blob to section-level storage")
+
+
+def _get_path(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def _set_path(data, path, value):
+    for key in path[:-1]:
+        data = data.setdefault(key, {})
+    data[path[-1]] = value
+
+
+def split_sections(data, include_lists=True):
+    """
+    Serialize analytics data into (name, json) rows: one per top-level key,
+    with the append lists stored as rows of their own
+    """
+    rows = []
+    nested = {path[0]: path[1] for path in APPEND_LISTS.values() if len(path) == 2}
+    for name, value in data.items():
+        if name in APPEND_LISTS:
+            continue
+        if name in nested and isinstance(value, dict):
+            value = {key: item for key, item in value.items() if key != nested[name]}
+        rows.append((name, json.dumps(value)))
+    for name, path in APPEND_LISTS.items():
+        value = _get_path(data, path) if include_lists else None
+        if value is not None:
+            rows.append((name, json.dumps(value)))
+    return rows
+
+
+def _replay(entries, delta):
+    entries = entries + delta["append"]
+    keep = delta["keep"]
+    return entries[-keep:] if keep else []
+
+
+class AnalyticsStore:
+    """Tracks what has been persisted so saves write only deltas and loads read only changes"""
+
+    def __init__(self, pool):
+        """
+        Args:
+            pool: ConnectionPool for the dashboard database
+        """
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.forget()
+
+    def forget(self):
+        """Drop all tracking state, e.g. after the tables were cleared"""
+        self._saved_json = {}  # section name -> last JSON written or loaded
+        self._last_entry = {}  # append list name -> last entry object persisted
+        self._lengths = {}  # append list name -> length persisted
+        self._log_rows = {}  # append list name -> log rows since its snapshot
+        self._versions = {}  # section name -> version last loaded
+        self._last_log_id = 0
+        self._own_writes = Counter()  # (list name, JSON) queued here, already reflected in memory
+
+    def save(self, data, write_buffer):
+        """
+        Queue writes for whatever changed in `data` since the last save or load
+
+        Sections are keyed replacements in the write buffer (only the latest
+        pending version is written); log appends and compactions are queued in
+        order.
+
+        Returns:
+            int: Number of sections or lists written
+        """
+        with self._lock:
+            changed = 0
+            for name, data_json in split_sections(data, include_lists=False):
+                if self._saved_json.get(name) == data_json:
+                    continue
+                self._saved_json[name] = data_json
+                write_buffer.replace(f"analytics_section:{name}", [(UPSERT_SECTION, (name, data_json))])
+                changed += 1
+
+            for name, path in APPEND_LISTS.items():
+                entries = _get_path(data, path)
+                if entries is None:
+                    continue
+                if self._queue_list_delta(name, entries, write_buffer):
+                    changed += 1
+            return changed
+
+    def _queue_list_delta(self, name, entries, write_buffer):
+        if name not in self._lengths:
+            return self._queue_snapshot(name, entries, write_buffer)
+
+        last = self._last_entry.get(name)
+        position = -1
+        if last is not None:
+            # Entries are appended and trimmed from the front, so find where the last persisted one is now
+            position = next((i for i in range(len(entries) - 1, -1, -1) if entries[i] is last), None)
+            if position is None:
+                # The list was replaced wholesale
+                return self._queue_snapshot(name, entries, write_buffer)
+
+        appended = entries[position + 1:]
+        if not appended and len(entries) == self._lengths[name]:
+            return False
+        if self._log_rows.get(name, 0) + 1 >= COMPACT_EVERY:
+            return self._queue_snapshot(name, entries, write_buffer)
+
+        delta_json = json.dumps({"append": appended, "keep": len(entries)})
+        write_buffer.add(APPEND_LOG, (name, delta_json))
+        self._own_writes[(name, delta_json)] += 1
+        self._log_rows[name] = self._log_rows.get(name, 0) + 1
+        self._track_list(name, entries)
+        return True
+
+    def _queue_snapshot(self, name, entries, write_buffer):
+        # Queued in order with the log appends, so the snapshot replaces exactly the rows before it
+        data_json = json.dumps(entries)
+        write_buffer.add(UPSERT_SECTION, (name, data_json))
+        write_buffer.add('DELETE FROM analytics_log WHERE section = ?', (name,))
+        # Earlier log rows for this list are deleted with the snapshot, so they will never be seen
+        for key in [key for key in self._own_writes if key[0] == name]:
+            del self._own_writes[key]
+        self._own_writes[(name, data_json)] += 1
+        self._log_rows[name] = 0
+        self._track_list(name, entries)
+        return True
+
+    def _track_list(self, name, entries):
+        self._last_entry[name] = entries[-1] if entries else None
+        self._lengths[name] = len(entries)
+
+    def _take_own_write(self, name, data_json):
+        key = (name, data_json)
+        if self._own_writes[key] > 0:
+            self._own_writes[key] -= 1
+            if not self._own_writes[key]:
+                del self._own_writes[key]
+            return True
+        return False
+
+    def load(self, data):
+        """
+        Bring `data` up to date with the database, reading only changed sections and new log rows
+
+        Returns:
+            bool: True if anything is persisted at all
+        """
+        with self._lock:
+            previous_log_id = self._last_log_id
+            with self.pool.connection() as conn:
+                versions = dict(conn.execute('SELECT name, version FROM analytics_sections').fetchall())
+                changed = [name for name, version in versions.items() if self._versions.get(name) != version]
+                sections = {}
+                if changed:
+                    placeholders = ", ".join("?" * len(changed))
+                    sections = dict(conn.execute(
+                        f'SELECT name, data_json FROM analytics_sections WHERE name IN ({placeholders})', changed
+                    ).fetchall())
+                # Lists whose snapshot changed replay their whole log, the rest only rows not seen yet
+                changed_lists = [name for name in sections if name in APPEND_LISTS]
+                log_rows = conn.execute(
+                    'SELECT id, section, data_json FROM analytics_log WHERE id > ? OR section IN ({}) ORDER BY id'.format(
+                        ", ".join("?" * len(changed_lists))
+                    ),
+                    [self._last_log_id, *changed_lists]
+                ).fetchall()
+
+            nested = {path[0]: path[1] for path in APPEND_LISTS.values() if len(path) == 2}
+            replaced = set()  # lists reset from another process's snapshot
+            touched = set()
+            for name, data_json in sections.items():
+                self._versions[name] = versions[name]
+                if name in APPEND_LISTS:
+                    if self._take_own_write(name, data_json):
+                        continue
+                    _set_path(data, APPEND_LISTS[name], json.loads(data_json))
+                    self._log_rows[name] = 0
+                    replaced.add(name)
+                    touched.add(name)
+                    continue
+                if self._saved_json.get(name) == data_json:
+                    continue  # written by this process, memory already matches
+                value = json.loads(data_json)
+                if name in nested and isinstance(data.get(name), dict) and nested[name] in data[name]:
+                    # Keep the list held in this section; it is loaded separately
+                    value[nested[name]] = data[name][nested[name]]
+                data[name] = value
+                self._saved_json[name] = data_json
+
+            for log_id, name, delta_json in log_rows:
+                self._last_log_id = max(self._last_log_id, log_id)
+                path = APPEND_LISTS.get(name)
+                if path is None or (log_id <= previous_log_id and name not in replaced):
+                    continue
+                if name not in replaced and self._take_own_write(name, delta_json):
+                    continue
+                _set_path(data, path, _replay(_get_path(data, path) or [], json.loads(delta_json)))
+                self._log_rows[name] = self._log_rows.get(name, 0) + 1
+                touched.add(name)
+
+            # Saves continue from what was just loaded
+            for name in touched:
+                self._track_list(name, _get_path(data, APPEND_LISTS[name]))
+            return bool(versions)
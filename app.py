@@ -1,23 +1,48 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Request, Response
 import uuid
 import os
 import json
-import subprocess
+import copy
 from datetime import datetime
 import shutil
 from typing import Optional
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import asyncio
-import sqlite3
+import threading
 from contextlib import asynccontextmanager
 
 # Import functions from other modules
 from AI_feeds.predict import run_prediction
+from analytics_store import AnalyticsStore, create_analytics_tables
+from executors import (ExecutorSaturatedError, get_executor_stats, get_io_executor, get_prediction_executor,
+                       prediction_worker_model_stats, shutdown_executors, warm_prediction_worker)
+from jobs import JobQueueFullError, PredictionJobQueue
+from migrations import migrate
+from oracle_batcher import create_submission_batcher
+from oracle_client import OracleError, OracleTimeoutError, close_oracle_client, get_oracle_client
 from pinata_uploader import upload_to_ipfs
+from prediction_catalog import PredictionCatalog, create_catalog_table
+from report_rollups import ReportEngine, clear_rollups, create_rollup_tables
+from retention import RetentionCompactor
+from sse_hub import BroadcastHub
+from storage import StateVersion, close_storage, create_write_buffer, get_storage, get_storage_stats
 
-# Global variables for real-time tracking
-connected_clients = set()
+# Serializes every change to prediction_stats and analytics_data, most of which run on I/O threads
+# (reentrant: writers call each other, e.g. record_prediction -> update_stats_in_db)
+state_lock = threading.RLock()
+# Pooled WAL-mode connections to the dashboard database
+DB_PATH = 'dashboard_stats.db'
+storage = get_storage(DB_PATH)
+# Events, activities, stats and the analytics snapshot are committed together in batches
+write_buffer = create_write_buffer(storage)
+# Tracks which analytics sections are persisted, so saves and loads only touch what changed
+analytics_store = AnalyticsStore(storage)
+# prediction_stats and analytics_data are authoritative in memory; this versions them
+# for ETags and notices when another process changes them
+state_version = StateVersion(storage, write_buffer)
+# Indexed summary of every prediction file in outputs/, so lookups don't scan the directory
+prediction_catalog = PredictionCatalog(storage)
+report_engine = ReportEngine(storage)
 prediction_stats = {
     "total_predictions": 0,
     "approved_predictions": 0,
@@ -55,7 +80,7 @@ analytics_data = {
     "infrastructure": {
         "system_uptime": 99.8,  # Percentage
         "data_processing_rate": 0,  # Files processed per hour
-        "database_size_mb": 0,
+        "database_size_mb": 0,  # Measured by each retention pass
         "api_response_time_ms": 0,
         "file_upload_success_rate": 100,
         "blockchain_connectivity": True,
@@ -116,132 +141,69 @@ analytics_data = {
 # Database initialization
 def init_db():
     """Initialize SQLite database for tracking predictions"""
-    conn = sqlite3.connect('dashboard_stats.db')
-    cursor = conn.cursor()
-    
-    # Create tables if they don't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS prediction_stats (
-            id INTEGER PRIMARY KEY,
-            total_predictions INTEGER DEFAULT 0,
-            approved_predictions INTEGER DEFAULT 0,
-            accuracy REAL DEFAULT 96,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create analytics data table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS analytics_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            event_type TEXT NOT NULL,
-            borough TEXT,
-            consumption_value REAL,
-            quality_metric TEXT,
-            quality_value REAL,
-            efficiency_score REAL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create real-time consumption tracking table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS real_time_consumption (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            borough TEXT NOT NULL,
-            consumption REAL NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    with storage.transaction() as conn:
+        cursor = conn.cursor()
     
-    # Create analytics persistence table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS analytics_data_persistent (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data_json TEXT NOT NULL,
-            source TEXT DEFAULT 'simulation',
-            has_real_data BOOLEAN DEFAULT FALSE,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        # Create and upgrade the core tables and their indexes
+        migrate(conn)
     
-    # Create recent activities table for real-time activity feed
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recent_activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            activity_type TEXT NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            metadata JSON,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            user_id TEXT DEFAULT 'system',
-            severity TEXT DEFAULT 'info'
-        )
-    ''')
-    
-    # Insert initial stats if table is empty
-    cursor.execute('SELECT COUNT(*) FROM prediction_stats')
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            INSERT INTO prediction_stats (total_predictions, approved_predictions, accuracy)
-            VALUES (0, 0, 96)
-        ''')
+        # Section-level analytics persistence (migrates a legacy analytics_data_persistent blob)
+        create_analytics_tables(conn)
+        StateVersion.create_table(conn)
+        create_catalog_table(conn)
+        create_rollup_tables(conn)
     
-    conn.commit()
-    conn.close()
-
-# Background task for keeping SSE connections alive (no data updates)
-async def keep_connections_alive():
-    """Background task to send heartbeat messages to keep SSE connections alive"""
-    while True:
-        try:
-            await asyncio.sleep(30)  # Send heartbeat every 30 seconds
-            # Only send heartbeat, no data updates
-            await broadcast_heartbeat()
-        except Exception as e:
-            print(f"Error in heartbeat task: {e}")
-
-async def broadcast_heartbeat():
-    """Send heartbeat to keep SSE connections alive without updating data"""
-    if connected_clients:
-        disconnected = []
-        heartbeat_data = {
-            "type": "heartbeat",
-            "timestamp": datetime.now().isoformat(),
-            "message": "Connection alive - waiting for prediction data"
-        }
-        
-        for client in connected_clients:
-            try:
-                await client.put(f"data: {json.dumps(heartbeat_data)}\n\n")
-            except Exception as e:
-                print(f"Error sending heartbeat: {e}")
-                disconnected.append(client)
-        
-        # Remove disconnected connections
-        for conn in disconnected:
-            connected_clients.remove(conn)
+        # Insert initial stats if table is empty
+        cursor.execute('SELECT COUNT(*) FROM prediction_stats')
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('''
+                INSERT INTO prediction_stats (total_predictions, approved_predictions, accuracy)
+                VALUES (0, 0, 96)
+            ''')
 
 # Lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    init_db()
-    load_stats_from_db()
+    await storage.run(init_db)
+    write_buffer.start()
+    await storage.run(load_stats_from_db)
     # Load persisted analytics data from previous sessions
-    has_persisted_data = load_analytics_from_db()
+    has_persisted_data = await storage.run(load_analytics_from_db)
     if not has_persisted_data:
         print("📊 No persisted analytics data found - using default values")
-    # Start background task for keeping connections alive (heartbeat only)
-    task = asyncio.create_task(keep_connections_alive())
+    # Index prediction files written before the catalog existed (only new files are parsed)
+    await storage.run(prediction_catalog.sync)
+    # From here on reads are served from memory; note where other processes' writes stand
+    await storage.run(state_version.changed_elsewhere)
+    # Start a prediction worker and load its model so the first upload doesn't pay for it
+    try:
+        await get_prediction_executor().run(warm_prediction_worker)
+    except Exception as e:
+        print(f"⚠️ Model warm-up failed, will retry on first prediction: {e}")
+    # Start the oracle worker so the first submission finds the RPC connection and wallet ready
+    try:
+        await get_io_executor().run(get_oracle_client().status)
+    except Exception as e:
+        print(f"⚠️ Oracle worker failed to start, will retry on first submission: {e}")
+    # Start the prediction job workers (re-queues jobs left over from a previous run)
+    await job_queue.start()
+    # Start the shared SSE heartbeat ticker
+    broadcast_hub.start()
+    # Start retention compaction (its first pass also measures the database size)
+    retention.start()
     print("✅ Analytics will ONLY update when predictions are generated")
     yield
-    # Shutdown - cancel background task
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    # Shutdown
+    await job_queue.stop()
+    await broadcast_hub.close()
+    await retention.close()
+    await oracle_batcher.close()
+    close_oracle_client()
+    shutdown_executors(wait=False)
+    write_buffer.close()
+    state_version.close()
+    close_storage()
 
 # Create FastAPI app with lifespan handler
 app = FastAPI(
@@ -269,18 +231,16 @@ def load_stats_from_db():
     """Load current stats from database"""
     global prediction_stats
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT total_predictions, approved_predictions, accuracy FROM prediction_stats ORDER BY id DESC LIMIT 1')
-        result = cursor.fetchone()
+        write_buffer.flush()
+        result = storage.fetchone('SELECT total_predictions, approved_predictions, accuracy FROM prediction_stats ORDER BY id DESC LIMIT 1')
         if result:
-            prediction_stats["total_predictions"] = result[0]
-            prediction_stats["approved_predictions"] = result[1]
-            prediction_stats["accuracy"] = result[2]
+            with state_lock:
+                prediction_stats["total_predictions"] = result[0]
+                prediction_stats["approved_predictions"] = result[1]
+                prediction_stats["accuracy"] = result[2]
             print(f"📂 Loaded prediction stats from DB: {prediction_stats}")
         else:
             print("⚠️ No prediction stats found in database - using default values")
-        conn.close()
     except Exception as e:
         print(f"❌ Error loading stats from DB: {e}")
 
@@ -288,27 +248,20 @@ def save_analytics_to_db():
     """Save current analytics data to database for persistence"""
     global analytics_data
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
+        with state_lock:
+            # Check if we have real prediction data
+            has_real_data = False
+            source = "simulation"
+            if analytics_data.get("real_time_consumption"):
+                has_real_data = any(item.get("source") == "real_prediction" for item in analytics_data["real_time_consumption"])
+                if has_real_data:
+                    source = "real_prediction"
+            
+            # Write only the sections that changed, and new entries of the growing lists
+            changed = analytics_store.save(analytics_data, write_buffer)
+            state_version.bump()
         
-        # Check if we have real prediction data
-        has_real_data = False
-        source = "simulation"
-        if analytics_data.get("real_time_consumption"):
-            has_real_data = any(item.get("source") == "real_prediction" for item in analytics_data["real_time_consumption"])
-            if has_real_data:
-                source = "real_prediction"
-        
-        # Clear old data and insert new
-        cursor.execute('DELETE FROM analytics_data_persistent')
-        cursor.execute('''
-            INSERT INTO analytics_data_persistent (data_json, source, has_real_data)
-            VALUES (?, ?, ?)
-        ''', (json.dumps(analytics_data), source, has_real_data))
-        
-        conn.commit()
-        conn.close()
-        print(f"💾 Analytics data saved to database (source: {source}, real_data: {has_real_data})")
+        print(f"💾 Analytics data queued for saving ({changed} sections changed, source: {source}, real_data: {has_real_data})")
     except Exception as e:
         print(f"Error saving analytics to DB: {e}")
 
@@ -316,17 +269,15 @@ def load_analytics_from_db():
     """Load persisted analytics data from database"""
     global analytics_data
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT data_json, source, has_real_data FROM analytics_data_persistent ORDER BY id DESC LIMIT 1')
-        result = cursor.fetchone()
-        if result:
-            data_json, source, has_real_data = result
-            loaded_data = json.loads(data_json)
-            analytics_data.update(loaded_data)
+        write_buffer.flush()
+        # Only sections changed since the last load are read and parsed
+        with state_lock:
+            loaded = analytics_store.load(analytics_data)
+        if loaded:
+            has_real_data = any(item.get("source") == "real_prediction" for item in analytics_data.get("real_time_consumption", []))
+            source = "real_prediction" if has_real_data else "simulation"
             print(f"📂 Loaded persisted analytics data (source: {source}, real_data: {has_real_data})")
             return True
-        conn.close()
         return False
     except Exception as e:
         print(f"Error loading analytics from DB: {e}")
@@ -335,32 +286,24 @@ def load_analytics_from_db():
 def update_stats_in_db():
     """Update stats in database"""
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE prediction_stats 
-            SET total_predictions = ?, approved_predictions = ?, accuracy = ?, last_updated = CURRENT_TIMESTAMP
-            WHERE id = (SELECT id FROM prediction_stats ORDER BY id DESC LIMIT 1)
-        ''', (prediction_stats["total_predictions"], prediction_stats["approved_predictions"], prediction_stats["accuracy"]))
-        conn.commit()
-        conn.close()
+        with state_lock:
+            state_version.bump()
+            write_buffer.replace("prediction_stats", [('''
+                UPDATE prediction_stats 
+                SET total_predictions = ?, approved_predictions = ?, accuracy = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE id = (SELECT id FROM prediction_stats ORDER BY id DESC LIMIT 1)
+            ''', (prediction_stats["total_predictions"], prediction_stats["approved_predictions"], prediction_stats["accuracy"]))])
     except Exception as e:
         print(f"Error updating stats in DB: {e}")
 
 def add_activity(activity_type: str, title: str, description: str = None, metadata: dict = None, severity: str = "info"):
     """Add a new activity to the real-time activity feed"""
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        write_buffer.add('''
             INSERT INTO recent_activities (activity_type, title, description, metadata, severity)
             VALUES (?, ?, ?, ?, ?)
         ''', (activity_type, title, description, json.dumps(metadata) if metadata else None, severity))
         
-        conn.commit()
-        conn.close()
-        
         print(f"📝 Activity logged: {title}")
         return True
         
@@ -371,10 +314,8 @@ def add_activity(activity_type: str, title: str, description: str = None, metada
 def get_recent_activities(limit: int = 20):
     """Get recent activities for the activity feed"""
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        write_buffer.flush()
+        rows = storage.fetchall('''
             SELECT activity_type, title, description, metadata, timestamp, severity
             FROM recent_activities 
             ORDER BY timestamp DESC 
@@ -382,7 +323,7 @@ def get_recent_activities(limit: int = 20):
         ''', (limit,))
         
         activities = []
-        for row in cursor.fetchall():
+        for row in rows:
             activity_type, title, description, metadata, timestamp, severity = row
             
             activities.append({
@@ -396,7 +337,6 @@ def get_recent_activities(limit: int = 20):
                 "raw_timestamp": timestamp  # Send raw timestamp for frontend calculation
             })
         
-        conn.close()
         return activities
         
     except Exception as e:
@@ -431,137 +371,141 @@ def reset_all_analytics():
     """Reset all analytics data and prediction stats to zero"""
     global analytics_data, prediction_stats
     
-    try:
-        # Reset in-memory analytics data to default values
-        analytics_data = {
-            "actual_consumption": {
-                "monthly_trends": [
-                    {"month": "Jan", "consumption": 0, "year": 2025},
-                    {"month": "Feb", "consumption": 0, "year": 2025},
-                    {"month": "Mar", "consumption": 0, "year": 2025},
-                    {"month": "Apr", "consumption": 0, "year": 2025},
-                    {"month": "May", "consumption": 0, "year": 2025},
-                    {"month": "Jun", "consumption": 0, "year": 2025},
-                    {"month": "Jul", "consumption": 0, "year": 2025},
-                    {"month": "Aug", "consumption": 0, "year": 2025},
-                    {"month": "Sep", "consumption": 0, "year": 2025},
-                    {"month": "Oct", "consumption": 0, "year": 2025},
-                    {"month": "Nov", "consumption": 0, "year": 2025},
-                    {"month": "Dec", "consumption": 0, "year": 2025}
-                ],
-                "borough_totals": {
-                    "BRONX": 0,
-                    "BROOKLYN": 0,
-                    "MANHATTAN": 0,
-                    "QUEENS": 0,
-                    "STATEN_ISLAND": 0
-                }
-            },
-            
-            # System infrastructure metrics
-            "infrastructure": {
-                "system_uptime": 99.8,  # Percentage
-                "data_processing_rate": 0,  # Files processed per hour
-                "database_size_mb": 0,
-                "api_response_time_ms": 0,
-                "file_upload_success_rate": 100,
-                "blockchain_connectivity": True,
-                "ipfs_connectivity": True,
-                "ai_model_status": "healthy"
-            },
+    # Held throughout so no writer updates the old state between the in-memory and the database reset
+    with state_lock:
+        try:
+            # Reset in-memory analytics data to default values
+            analytics_data = {
+                "actual_consumption": {
+                    "monthly_trends": [
+                        {"month": "Jan", "consumption": 0, "year": 2025},
+                        {"month": "Feb", "consumption": 0, "year": 2025},
+                        {"month": "Mar", "consumption": 0, "year": 2025},
+                        {"month": "Apr", "consumption": 0, "year": 2025},
+                        {"month": "May", "consumption": 0, "year": 2025},
+                        {"month": "Jun", "consumption": 0, "year": 2025},
+                        {"month": "Jul", "consumption": 0, "year": 2025},
+                        {"month": "Aug", "consumption": 0, "year": 2025},
+                        {"month": "Sep", "consumption": 0, "year": 2025},
+                        {"month": "Oct", "consumption": 0, "year": 2025},
+                        {"month": "Nov", "consumption": 0, "year": 2025},
+                        {"month": "Dec", "consumption": 0, "year": 2025}
+                    ],
+                    "borough_totals": {
+                        "BRONX": 0,
+                        "BROOKLYN": 0,
+                        "MANHATTAN": 0,
+                        "QUEENS": 0,
+                        "STATEN_ISLAND": 0
+                    }
+                },
             
-            # Data quality and processing metrics
-            "data_quality": {
-                "completeness_score": 95,  # Percentage of complete data
-                "accuracy_score": 98,      # Data validation accuracy
-                "timeliness_score": 92,    # How recent the data is
-                "consistency_score": 97,   # Data consistency across sources
-                "processed_files_count": 0,
-                "failed_uploads_count": 0
-            },
+                # System infrastructure metrics
+                "infrastructure": {
+                    "system_uptime": 99.8,  # Percentage
+                    "data_processing_rate": 0,  # Files processed per hour
+                    "database_size_mb": retention.last_report["database_size_mb"] if retention.last_report else 0,
+                    "api_response_time_ms": 0,
+                    "file_upload_success_rate": 100,
+                    "blockchain_connectivity": True,
+                    "ipfs_connectivity": True,
+                    "ai_model_status": "healthy"
+                },
             
-            # Water conservation and efficiency metrics (not prediction-based)
-            "conservation": {
-                "monthly_conservation_rate": [2.1, 1.8, 2.5, 3.2, 2.9, 3.1, 2.7, 2.4, 3.0, 2.8, 3.3, 3.5],  # Percentage reduction
-                "conservation_targets_met": 8,  # Out of 12 months
-                "total_water_saved_mgd": 15.7,  # Million gallons per day saved
-                "efficiency_improvements": [
-                    {"category": "Infrastructure Upgrades", "savings_mgd": 5.2},
-                    {"category": "Leak Detection", "savings_mgd": 3.8},
-                    {"category": "Smart Meters", "savings_mgd": 4.1},
-                    {"category": "Public Awareness", "savings_mgd": 2.6}
-                ]
-            },
+                # Data quality and processing metrics
+                "data_quality": {
+                    "completeness_score": 95,  # Percentage of complete data
+                    "accuracy_score": 98,      # Data validation accuracy
+                    "timeliness_score": 92,    # How recent the data is
+                    "consistency_score": 97,   # Data consistency across sources
+                    "processed_files_count": 0,
+                    "failed_uploads_count": 0
+                },
             
-            # System operational metrics
-            "operations": {
-                "daily_processing_volume": [],  # Daily data processing volumes
-                "system_alerts": {
-                    "critical": 0,
-                    "warning": 2,
-                    "info": 5
+                # Water conservation and efficiency metrics (not prediction-based)
+                "conservation": {
+                    "monthly_conservation_rate": [2.1, 1.8, 2.5, 3.2, 2.9, 3.1, 2.7, 2.4, 3.0, 2.8, 3.3, 3.5],  # Percentage reduction
+                    "conservation_targets_met": 8,  # Out of 12 months
+                    "total_water_saved_mgd": 15.7,  # Million gallons per day saved
+                    "efficiency_improvements": [
+                        {"category": "Infrastructure Upgrades", "savings_mgd": 5.2},
+                        {"category": "Leak Detection", "savings_mgd": 3.8},
+                        {"category": "Smart Meters", "savings_mgd": 4.1},
+                        {"category": "Public Awareness", "savings_mgd": 2.6}
+                    ]
                 },
-                "service_health": {
-                    "api_server": "healthy",
-                    "database": "healthy", 
-                    "ai_engine": "healthy",
-                    "blockchain_oracle": "healthy",
-                    "file_storage": "healthy"
+            
+                # System operational metrics
+                "operations": {
+                    "daily_processing_volume": [],  # Daily data processing volumes
+                    "system_alerts": {
+                        "critical": 0,
+                        "warning": 2,
+                        "info": 5
+                    },
+                    "service_health": {
+                        "api_server": "healthy",
+                        "database": "healthy", 
+                        "ai_engine": "healthy",
+                        "blockchain_oracle": "healthy",
+                        "file_storage": "healthy"
+                    },
+                    "performance_trends": {
+                        "avg_response_time": [45, 42, 38, 41, 39, 37, 40, 38, 35, 36, 34, 33],  # Last 12 hours in ms
+                        "throughput": [250, 265, 280, 275, 290, 305, 295, 310, 325, 315, 340, 335]  # Requests per hour
+                    }
                 },
-                "performance_trends": {
-                    "avg_response_time": [45, 42, 38, 41, 39, 37, 40, 38, 35, 36, 34, 33],  # Last 12 hours in ms
-                    "throughput": [250, 265, 280, 275, 290, 305, 295, 310, 325, 315, 340, 335]  # Requests per hour
-                }
-            },
             
-            # Real-time consumption monitoring (from actual data uploads)
-            "real_time_consumption": [],
-            "last_updated": datetime.now().isoformat(),
-            "data_sources": ["csv_uploads", "manual_input", "system_monitoring"]
-        }
-        
-        # Reset prediction stats
-        prediction_stats = {
-            "total_predictions": 0,
-            "approved_predictions": 0,
-            "accuracy": 95.0
-        }
-        
-        # Clear database tables
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        
-        # Clear all analytics-related tables
-        cursor.execute('DELETE FROM analytics_events')
-        cursor.execute('DELETE FROM real_time_consumption')
-        cursor.execute('DELETE FROM analytics_data_persistent')
-        cursor.execute('DELETE FROM recent_activities')  # Clear activity feed too
-        
-        # Reset prediction stats in database
-        cursor.execute('DELETE FROM prediction_stats')
-        cursor.execute('''
-            INSERT INTO prediction_stats (total_predictions, approved_predictions, accuracy)
-            VALUES (0, 0, 95.0)
-        ''')
+                # Real-time consumption monitoring (from actual data uploads)
+                "real_time_consumption": [],
+                "last_updated": datetime.now().isoformat(),
+                "data_sources": ["csv_uploads", "manual_input", "system_monitoring"]
+            }
         
-        conn.commit()
-        conn.close()
+            analytics_store.forget()
+            state_version.bump()
         
-        # Log the reset activity
-        add_activity("system", "System Reset", "Analytics system was reset to zero", 
-                    {"reset_type": "full_reset"}, "warning")
+            # Reset prediction stats
+            prediction_stats = {
+                "total_predictions": 0,
+                "approved_predictions": 0,
+                "accuracy": 95.0
+            }
         
-        print("🔄 FULL ANALYTICS RESET COMPLETED")
-        print("📊 All analytics data reset to default values")
-        print("📈 Prediction stats reset to zero")
-        print("🗃️  All database tables cleared")
-        print("✨ System ready for fresh start")
+            # Clear database tables (after committing anything still buffered, so it is cleared too)
+            write_buffer.flush()
+            with storage.transaction() as conn:
+                # Clear all analytics-related tables
+                conn.execute('DELETE FROM analytics_events')
+                conn.execute('DELETE FROM real_time_consumption')
+                conn.execute('DELETE FROM analytics_data_persistent')
+                conn.execute('DELETE FROM analytics_sections')
+                conn.execute('DELETE FROM analytics_log')
+                conn.execute('DELETE FROM recent_activities')  # Clear activity feed too
+                clear_rollups(conn)
+            
+                # Reset prediction stats in database
+                conn.execute('DELETE FROM prediction_stats')
+                conn.execute('''
+                    INSERT INTO prediction_stats (total_predictions, approved_predictions, accuracy)
+                    VALUES (0, 0, 95.0)
+                ''')
+        
+            # Log the reset activity
+            add_activity("system", "System Reset", "Analytics system was reset to zero", 
+                        {"reset_type": "full_reset"}, "warning")
+        
+            print("🔄 FULL ANALYTICS RESET COMPLETED")
+            print("📊 All analytics data reset to default values")
+            print("📈 Prediction stats reset to zero")
+            print("🗃️  All database tables cleared")
+            print("✨ System ready for fresh start")
         
-        return True
+            return True
         
-    except Exception as e:
-        print(f"❌ Error during analytics reset: {e}")
-        return False
+        except Exception as e:
+            print(f"❌ Error during analytics reset: {e}")
+            return False
 
 def extract_real_data_from_csv(file_path):
     """Extract real water consumption data from uploaded CSV file"""
@@ -621,7 +565,6 @@ def extract_real_data_from_csv(file_path):
         # Infrastructure metrics from file processing
         infrastructure_metrics = {
             "data_processing_rate": max(1, len(df) / 60),  # Rows per minute as proxy
-            "database_size_mb": file_size_mb,
             "api_response_time_ms": 35 + (file_size_mb * 2),  # Estimated based on file size
             "file_upload_success_rate": 100,
             "blockchain_connectivity": True,
@@ -669,182 +612,190 @@ def update_analytics_with_real_prediction(prediction_file_path, uploaded_file_pa
     """Update analytics data with real prediction results and uploaded data"""
     global analytics_data
     
-    try:
-        # Load the actual prediction results
-        with open(prediction_file_path, 'r') as f:
-            prediction_data = json.load(f)
-        
-        # Extract real data from uploaded CSV if available
-        real_csv_data = None
-        if uploaded_file_path and uploaded_file_path.endswith('.csv'):
-            real_csv_data = extract_real_data_from_csv(uploaded_file_path)
-        
-        # Update actual consumption with REAL prediction data
-        if "predicted_allocation" in prediction_data:
-            for borough, data in prediction_data["predicted_allocation"].items():
-                borough_upper = borough.upper()
-                # Use actual predicted consumption values
-                analytics_data["actual_consumption"]["borough_totals"][borough_upper] = data["consumption_hcf"]
-        
-        # Update monthly consumption trends with real data if available
-        if real_csv_data and real_csv_data["monthly_patterns"]:
-            monthly_data = real_csv_data["monthly_patterns"]
-            current_year = datetime.now().year
+    with state_lock:
+        try:
+            # Load the actual prediction results
+            with open(prediction_file_path, 'r') as f:
+                prediction_data = json.load(f)
+        
+            # Extract real data from uploaded CSV if available
+            real_csv_data = None
+            if uploaded_file_path and uploaded_file_path.endswith('.csv'):
+                real_csv_data = extract_real_data_from_csv(uploaded_file_path)
+        
+            # Update actual consumption with REAL prediction data
+            if "predicted_allocation" in prediction_data:
+                for borough, data in prediction_data["predicted_allocation"].items():
+                    borough_upper = borough.upper()
+                    # Use actual predicted consumption values
+                    analytics_data["actual_consumption"]["borough_totals"][borough_upper] = data["consumption_hcf"]
+        
+            # Update monthly consumption trends with real data if available
+            if real_csv_data and real_csv_data["monthly_patterns"]:
+                monthly_data = real_csv_data["monthly_patterns"]
+                current_year = datetime.now().year
             
-            for i, value in enumerate(monthly_data):
-                if i < len(analytics_data["actual_consumption"]["monthly_trends"]):
-                    analytics_data["actual_consumption"]["monthly_trends"][i]["consumption"] = round(value, 2)
-                    analytics_data["actual_consumption"]["monthly_trends"][i]["year"] = current_year
-        
-        # Update data quality metrics with real data
-        if real_csv_data and real_csv_data["data_quality_metrics"]:
-            for metric, value in real_csv_data["data_quality_metrics"].items():
-                if metric in analytics_data["data_quality"]:
-                    analytics_data["data_quality"][metric] = round(value, 2)
-        
-        # Update infrastructure metrics with real file processing data
-        if real_csv_data and real_csv_data["infrastructure_metrics"]:
-            for metric, value in real_csv_data["infrastructure_metrics"].items():
-                if metric in analytics_data["infrastructure"]:
-                    analytics_data["infrastructure"][metric] = value
-        
-        # Update conservation data with real patterns
-        if real_csv_data and real_csv_data["conservation_data"]:
-            if "monthly_conservation_rate" in real_csv_data["conservation_data"]:
-                analytics_data["conservation"]["monthly_conservation_rate"] = real_csv_data["conservation_data"]["monthly_conservation_rate"][:12]
-            if "total_water_saved_mgd" in real_csv_data["conservation_data"]:
-                analytics_data["conservation"]["total_water_saved_mgd"] = real_csv_data["conservation_data"]["total_water_saved_mgd"]
-        
-        # Update system performance based on prediction confidence
-        if "confidence_score" in prediction_data:
-            confidence = prediction_data["confidence_score"]
-            # Update system metrics based on AI performance
-            analytics_data["infrastructure"]["system_uptime"] = min(99.9, max(95.0, confidence))
-            analytics_data["infrastructure"]["ai_model_status"] = "healthy" if confidence >= 90 else "degraded"
+                for i, value in enumerate(monthly_data):
+                    if i < len(analytics_data["actual_consumption"]["monthly_trends"]):
+                        analytics_data["actual_consumption"]["monthly_trends"][i]["consumption"] = round(value, 2)
+                        analytics_data["actual_consumption"]["monthly_trends"][i]["year"] = current_year
+        
+            # Update data quality metrics with real data
+            if real_csv_data and real_csv_data["data_quality_metrics"]:
+                for metric, value in real_csv_data["data_quality_metrics"].items():
+                    if metric in analytics_data["data_quality"]:
+                        analytics_data["data_quality"][metric] = round(value, 2)
+        
+            # Update infrastructure metrics with real file processing data
+            if real_csv_data and real_csv_data["infrastructure_metrics"]:
+                for metric, value in real_csv_data["infrastructure_metrics"].items():
+                    if metric in analytics_data["infrastructure"]:
+                        analytics_data["infrastructure"][metric] = value
+        
+            # Update conservation data with real patterns
+            if real_csv_data and real_csv_data["conservation_data"]:
+                if "monthly_conservation_rate" in real_csv_data["conservation_data"]:
+                    analytics_data["conservation"]["monthly_conservation_rate"] = real_csv_data["conservation_data"]["monthly_conservation_rate"][:12]
+                if "total_water_saved_mgd" in real_csv_data["conservation_data"]:
+                    analytics_data["conservation"]["total_water_saved_mgd"] = real_csv_data["conservation_data"]["total_water_saved_mgd"]
+        
+            # Update system performance based on prediction confidence
+            if "confidence_score" in prediction_data:
+                confidence = prediction_data["confidence_score"]
+                # Update system metrics based on AI performance
+                analytics_data["infrastructure"]["system_uptime"] = min(99.9, max(95.0, confidence))
+                analytics_data["infrastructure"]["ai_model_status"] = "healthy" if confidence >= 90 else "degraded"
             
-            # Update data quality accuracy based on prediction confidence
-            analytics_data["data_quality"]["accuracy_score"] = round(confidence, 2)
+                # Update data quality accuracy based on prediction confidence
+                analytics_data["data_quality"]["accuracy_score"] = round(confidence, 2)
+        
+            # Update operational metrics
+            current_time = datetime.now()
+            analytics_data["operations"]["daily_processing_volume"].append({
+                "timestamp": current_time.isoformat(),
+                "files_processed": 1,
+                "data_size_mb": real_csv_data["file_stats"]["size_mb"] if real_csv_data else 0
+            })
         
-        # Update operational metrics
-        current_time = datetime.now()
-        analytics_data["operations"]["daily_processing_volume"].append({
-            "timestamp": current_time.isoformat(),
-            "files_processed": 1,
-            "data_size_mb": real_csv_data["file_stats"]["size_mb"] if real_csv_data else 0
-        })
+            # Keep only last 24 hours of processing data
+            cutoff_time = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+            analytics_data["operations"]["daily_processing_volume"] = [
+                entry for entry in analytics_data["operations"]["daily_processing_volume"]
+                if datetime.fromisoformat(entry["timestamp"]) >= cutoff_time
+            ]
+        
+            # Add real-time consumption data based on actual predictions
+            if "predicted_allocation" in prediction_data:
+                total_consumption = sum(data["consumption_hcf"] for data in prediction_data["predicted_allocation"].values())
+                analytics_data["real_time_consumption"].append({
+                    "timestamp": prediction_data.get("timestamp", datetime.now().isoformat()),
+                    "total_consumption": total_consumption,
+                    "source": "real_prediction",
+                    "prediction_id": prediction_data.get("prediction_id")
+                })
+            
+                # Keep only recent consumption data (last 100 entries)
+                if len(analytics_data["real_time_consumption"]) > 100:
+                    analytics_data["real_time_consumption"] = analytics_data["real_time_consumption"][-100:]
         
-        # Keep only last 24 hours of processing data
-        cutoff_time = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        analytics_data["operations"]["daily_processing_volume"] = [
-            entry for entry in analytics_data["operations"]["daily_processing_volume"]
-            if datetime.fromisoformat(entry["timestamp"]) >= cutoff_time
-        ]
+            # Update system alerts based on data quality
+            if real_csv_data:
+                quality_score = real_csv_data["data_quality_metrics"]["completeness_score"]
+                if quality_score < 80:
+                    analytics_data["operations"]["system_alerts"]["warning"] += 1
+                elif quality_score < 60:
+                    analytics_data["operations"]["system_alerts"]["critical"] += 1
         
-        # Add real-time consumption data based on actual predictions
-        if "predicted_allocation" in prediction_data:
-            total_consumption = sum(data["consumption_hcf"] for data in prediction_data["predicted_allocation"].values())
-            analytics_data["real_time_consumption"].append({
-                "timestamp": prediction_data.get("timestamp", datetime.now().isoformat()),
-                "total_consumption": total_consumption,
-                "source": "real_prediction",
-                "prediction_id": prediction_data.get("prediction_id")
-            })
-            
-            # Keep only recent consumption data (last 100 entries)
-            if len(analytics_data["real_time_consumption"]) > 100:
-                analytics_data["real_time_consumption"] = analytics_data["real_time_consumption"][-100:]
-        
-        # Update system alerts based on data quality
-        if real_csv_data:
-            quality_score = real_csv_data["data_quality_metrics"]["completeness_score"]
-            if quality_score < 80:
-                analytics_data["operations"]["system_alerts"]["warning"] += 1
-            elif quality_score < 60:
-                analytics_data["operations"]["system_alerts"]["critical"] += 1
-        
-        # Update last_updated timestamp
-        analytics_data["last_updated"] = datetime.now().isoformat()
+            # Update last_updated timestamp
+            analytics_data["last_updated"] = datetime.now().isoformat()
         
-        # Store the data in database
-        save_analytics_to_db()
+            # Store the data in database
+            save_analytics_to_db()
         
-        print(f"🎯 Analytics updated with REAL prediction data from {prediction_file_path}")
-        print(f"📊 Real borough consumption: {[f'{k}: {v:.1f} HCF' for k, v in analytics_data['actual_consumption']['borough_totals'].items()]}")
-        print(f"🔍 Analytics data last_updated: {analytics_data['last_updated']}")
-        print(f"💾 Analytics data saved to database successfully")
+            print(f"🎯 Analytics updated with REAL prediction data from {prediction_file_path}")
+            print(f"📊 Real borough consumption: {[f'{k}: {v:.1f} HCF' for k, v in analytics_data['actual_consumption']['borough_totals'].items()]}")
+            print(f"🔍 Analytics data last_updated: {analytics_data['last_updated']}")
+            print(f"💾 Analytics data saved to database successfully")
         
-    except Exception as e:
-        print(f"Error updating analytics with real prediction: {e}")
-        # Fallback to simulation mode if real data update fails
-        update_analytics_data_fallback()
+        except Exception as e:
+            print(f"Error updating analytics with real prediction: {e}")
+            # Fallback to simulation mode if real data update fails
+            update_analytics_data_fallback()
 
 def update_analytics_data_fallback():
     """Fallback method with simulated infrastructure data"""
     import random
     global analytics_data
     
-    # Update infrastructure metrics with realistic variations
-    analytics_data["infrastructure"]["system_uptime"] = min(99.9, max(95.0, 
-        analytics_data["infrastructure"]["system_uptime"] + random.uniform(-0.1, 0.2)))
+    with state_lock:
+        # Update infrastructure metrics with realistic variations
+        analytics_data["infrastructure"]["system_uptime"] = min(99.9, max(95.0, 
+            analytics_data["infrastructure"]["system_uptime"] + random.uniform(-0.1, 0.2)))
     
-    analytics_data["infrastructure"]["api_response_time_ms"] = max(25, min(150,
-        analytics_data["infrastructure"]["api_response_time_ms"] + random.uniform(-5, 10)))
+        analytics_data["infrastructure"]["api_response_time_ms"] = max(25, min(150,
+            analytics_data["infrastructure"]["api_response_time_ms"] + random.uniform(-5, 10)))
     
-    analytics_data["infrastructure"]["data_processing_rate"] = max(0.5, min(20,
-        analytics_data["infrastructure"]["data_processing_rate"] + random.uniform(-1, 2)))
+        analytics_data["infrastructure"]["data_processing_rate"] = max(0.5, min(20,
+            analytics_data["infrastructure"]["data_processing_rate"] + random.uniform(-1, 2)))
     
-    # Update data quality metrics with small variations
-    quality_metrics = ["completeness_score", "accuracy_score", "timeliness_score", "consistency_score"]
-    for metric in quality_metrics:
-        if metric in analytics_data["data_quality"]:
-            current = analytics_data["data_quality"][metric]
-            variation = random.uniform(-1, 2)  # Small improvements over time
-            analytics_data["data_quality"][metric] = max(80, min(100, current + variation))
+        # Update data quality metrics with small variations
+        quality_metrics = ["completeness_score", "accuracy_score", "timeliness_score", "consistency_score"]
+        for metric in quality_metrics:
+            if metric in analytics_data["data_quality"]:
+                current = analytics_data["data_quality"][metric]
+                variation = random.uniform(-1, 2)  # Small improvements over time
+                analytics_data["data_quality"][metric] = max(80, min(100, current + variation))
     
-    # Update conservation rates with seasonal patterns
-    current_month_idx = datetime.now().month - 1
-    if current_month_idx < len(analytics_data["conservation"]["monthly_conservation_rate"]):
-        base_rate = analytics_data["conservation"]["monthly_conservation_rate"][current_month_idx]
-        variation = random.uniform(-0.2, 0.3)  # Conservation generally improves
-        analytics_data["conservation"]["monthly_conservation_rate"][current_month_idx] = max(0, min(5, base_rate + variation))
+        # Update conservation rates with seasonal patterns
+        current_month_idx = datetime.now().month - 1
+        if current_month_idx < len(analytics_data["conservation"]["monthly_conservation_rate"]):
+            base_rate = analytics_data["conservation"]["monthly_conservation_rate"][current_month_idx]
+            variation = random.uniform(-0.2, 0.3)  # Conservation generally improves
+            analytics_data["conservation"]["monthly_conservation_rate"][current_month_idx] = max(0, min(5, base_rate + variation))
     
-    # Update system alerts occasionally
-    if random.random() < 0.1:  # 10% chance of new alert
-        alert_type = random.choice(["warning", "info"])
-        analytics_data["operations"]["system_alerts"][alert_type] += 1
+        # Update system alerts occasionally
+        if random.random() < 0.1:  # 10% chance of new alert
+            alert_type = random.choice(["warning", "info"])
+            analytics_data["operations"]["system_alerts"][alert_type] += 1
     
-    # Update performance trends (last 12 data points)
-    if len(analytics_data["operations"]["performance_trends"]["avg_response_time"]) >= 12:
-        analytics_data["operations"]["performance_trends"]["avg_response_time"].pop(0)
-        analytics_data["operations"]["performance_trends"]["throughput"].pop(0)
+        # Update performance trends (last 12 data points)
+        if len(analytics_data["operations"]["performance_trends"]["avg_response_time"]) >= 12:
+            analytics_data["operations"]["performance_trends"]["avg_response_time"].pop(0)
+            analytics_data["operations"]["performance_trends"]["throughput"].pop(0)
     
-    # Add new performance data points
-    last_response = analytics_data["operations"]["performance_trends"]["avg_response_time"][-1] if analytics_data["operations"]["performance_trends"]["avg_response_time"] else 35
-    last_throughput = analytics_data["operations"]["performance_trends"]["throughput"][-1] if analytics_data["operations"]["performance_trends"]["throughput"] else 300
+        # Add new performance data points
+        last_response = analytics_data["operations"]["performance_trends"]["avg_response_time"][-1] if analytics_data["operations"]["performance_trends"]["avg_response_time"] else 35
+        last_throughput = analytics_data["operations"]["performance_trends"]["throughput"][-1] if analytics_data["operations"]["performance_trends"]["throughput"] else 300
     
-    new_response = max(25, min(60, last_response + random.uniform(-3, 2)))
-    new_throughput = max(200, min(400, last_throughput + random.uniform(-15, 20)))
+        new_response = max(25, min(60, last_response + random.uniform(-3, 2)))
+        new_throughput = max(200, min(400, last_throughput + random.uniform(-15, 20)))
     
-    analytics_data["operations"]["performance_trends"]["avg_response_time"].append(round(new_response))
-    analytics_data["operations"]["performance_trends"]["throughput"].append(round(new_throughput))
+        analytics_data["operations"]["performance_trends"]["avg_response_time"].append(round(new_response))
+        analytics_data["operations"]["performance_trends"]["throughput"].append(round(new_throughput))
     
-    # Simulate processing volume updates
-    current_hour = datetime.now().hour
-    processing_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "files_processed": random.randint(0, 3),
-        "data_size_mb": round(random.uniform(0.1, 5.0), 2)
-    }
-    analytics_data["operations"]["daily_processing_volume"].append(processing_entry)
+        # Simulate processing volume updates
+        current_hour = datetime.now().hour
+        processing_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "files_processed": random.randint(0, 3),
+            "data_size_mb": round(random.uniform(0.1, 5.0), 2)
+        }
+        analytics_data["operations"]["daily_processing_volume"].append(processing_entry)
     
-    # Keep only last 24 hours of processing data
-    cutoff_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    analytics_data["operations"]["daily_processing_volume"] = [
-        entry for entry in analytics_data["operations"]["daily_processing_volume"]
-        if datetime.fromisoformat(entry["timestamp"]) >= cutoff_time
-    ]
+        # Keep only last 24 hours of processing data
+        cutoff_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        analytics_data["operations"]["daily_processing_volume"] = [
+            entry for entry in analytics_data["operations"]["daily_processing_volume"]
+            if datetime.fromisoformat(entry["timestamp"]) >= cutoff_time
+        ]
     
-    analytics_data["last_updated"] = datetime.now().isoformat()
+        analytics_data["last_updated"] = datetime.now().isoformat()
+
+def simulate_analytics():
+    """Apply one simulated analytics change and record the new version with it"""
+    with state_lock:
+        update_analytics_data_fallback()
+        state_version.bump()
 
 # Keep the old function name for simulation endpoint
 def update_analytics_data(prediction_data=None):
@@ -859,100 +810,292 @@ def update_analytics_data(prediction_data=None):
 def store_analytics_event(event_type, borough=None, consumption_value=None, quality_metric=None, quality_value=None, efficiency_score=None):
     """Store analytics events in database"""
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        cursor.execute('''
+        write_buffer.add('''
             INSERT INTO analytics_events (event_type, borough, consumption_value, quality_metric, quality_value, efficiency_score)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (event_type, borough, consumption_value, quality_metric, quality_value, efficiency_score))
-        conn.commit()
-        conn.close()
     except Exception as e:
         print(f"Error storing analytics event: {e}")
 
-async def broadcast_stats_update():
-    """Broadcast stats update to all connected clients"""
-    if connected_clients:
-        update_data = {
-            "type": "stats_update",
-            "stats": prediction_stats,
-            "analytics": analytics_data,
-            "timestamp": datetime.now().isoformat()
-        }
-        message = f"data: {json.dumps(update_data)}\n\n"
-        disconnected_clients = set()
+def copy_state(parts):
+    """
+    Deep copies of the requested in-memory state, taken under state_lock so none is half-updated
+
+    Args:
+        parts: Any of "stats" and "analytics"
+
+    Returns:
+        dict: The copies, by part name
+    """
+    with state_lock:
+        state = {}
+        if "stats" in parts:
+            state["stats"] = copy.deepcopy(prediction_stats)
+        if "analytics" in parts:
+            state["analytics"] = copy.deepcopy(analytics_data)
+        return state
+
+async def get_broadcast_state(parts):
+    """Current values of the requested state parts, for the broadcast hub"""
+    state = await storage.run(copy_state, parts)
+    if "activities" in parts:
+        state["activities"] = await storage.run(get_recent_activities, 10)  # Latest 10 activities
+    return state
+
+# Streams the dashboard state to SSE clients as a snapshot plus coalesced JSON-patch deltas
+broadcast_hub = BroadcastHub(get_broadcast_state,
+                             coalesce_ms=max(0, int(os.environ.get("SSE_COALESCE_MS", 50))),
+                             history=max(1, int(os.environ.get("SSE_PATCH_HISTORY", 100))),
+                             max_queue=max(2, int(os.environ.get("SSE_QUEUE_SIZE", 64))),
+                             max_overflows=max(0, int(os.environ.get("SSE_MAX_OVERFLOWS", 3))),
+                             heartbeat_seconds=max(1, int(os.environ.get("SSE_HEARTBEAT_SECONDS", 30))))
+
+def record_database_size(report):
+    """
+    Show the real database size on the dashboard
+
+    Returns:
+        bool: Whether the size shown changed
+    """
+    with state_lock:
+        if analytics_data["infrastructure"].get("database_size_mb") == report["database_size_mb"]:
+            return False
+        analytics_data["infrastructure"]["database_size_mb"] = report["database_size_mb"]
+        state_version.bump()
+        return True
+
+async def record_compaction(report):
+    """Retention hook: update the database size after each pass (on an I/O thread, as it takes state_lock)"""
+    if await storage.run(record_database_size, report):
+        broadcast_hub.publish("analytics")
+
+# Prunes raw analytics rows past retention (their history stays in the rollups) and reclaims the space
+retention = RetentionCompactor(storage,
+                               policies={
+                                   "analytics_events": max(0, int(os.environ.get("RETENTION_ANALYTICS_EVENTS_DAYS", 90))),
+                                   "recent_activities": max(0, int(os.environ.get("RETENTION_ACTIVITIES_DAYS", 90))),
+                                   "real_time_consumption": max(0, int(os.environ.get("RETENTION_REAL_TIME_DAYS", 30)))
+                               },
+                               batch_size=max(1, int(os.environ.get("RETENTION_BATCH_SIZE", 500))),
+                               vacuum_pages=max(1, int(os.environ.get("RETENTION_VACUUM_PAGES", 1000))),
+                               interval_seconds=max(1, int(os.environ.get("RETENTION_INTERVAL_SECONDS", 3600))),
+                               on_report=record_compaction)
+
+def validate_file_extension(filename: str) -> bool:
+    """Validate that the file has an allowed extension"""
+    allowed_extensions = [".csv", ".json"]
+    return any(filename.endswith(ext) for ext in allowed_extensions)
+
+def save_upload(source, file_path):
+    """Copy an uploaded file to disk"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+def read_json_file(path):
+    """Load a JSON file"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+def record_prediction(prediction_data, prediction_file_path, uploaded_file_path, confidence_int, ipfs_hash, stakeholder_address):
+    """
+    Update stats, analytics, the event log and the activity feed for a new prediction
+
+    Runs on an I/O thread; state_lock keeps concurrent predictions from interleaving.
+
+    Returns:
+        str: The prediction ID recorded in the prediction file
+    """
+    with state_lock:
+        # Update prediction stats
+        prediction_stats["total_predictions"] += 1
+        
+        # Calculate new accuracy (simulated improvement with each successful prediction)
+        current_accuracy = prediction_stats["accuracy"]
+        new_accuracy = min(96, current_accuracy + 0.01)  # Gradual improvement
+        prediction_stats["accuracy"] = round(new_accuracy, 2)
         
-        print(f"🔄 Broadcasting to {len(connected_clients)} connected clients")
-        print(f"📊 Analytics data preview: Borough allocations: {list(analytics_data['actual_consumption']['borough_totals'].items())[:2]}...")
+        # Update analytics data with REAL prediction data
+        update_analytics_with_real_prediction(prediction_file_path, uploaded_file_path)
         
-        for client in connected_clients:
-            try:
-                await client.put(message)
-                print("✅ Message sent to client")
-            except Exception as e:
-                print(f"❌ Failed to send message to client: {e}")
-                disconnected_clients.add(client)
+        # Store analytics event with real data
+        store_analytics_event("prediction_generated", consumption_value=confidence_int)
         
-        # Remove disconnected clients
-        connected_clients.difference_update(disconnected_clients)
+        # Update database
+        update_stats_in_db()
         
-        if disconnected_clients:
-            print(f"🧹 Removed {len(disconnected_clients)} disconnected clients")
-    else:
-        print("⚠️  No connected clients to broadcast to")
-
-async def broadcast_analytics_update():
-    """Broadcast analytics updates to all connected clients"""
-    if connected_clients:
-        disconnected = []
-        update_data = {
-            "type": "analytics_update",
-            "analytics": analytics_data,
-            "timestamp": datetime.now().isoformat()
-        }
+        # Log prediction generation activity
+        prediction_id = prediction_data.get("prediction_id", "N/A")
+        borough_count = len(prediction_data.get("predicted_allocation", {}))
+        add_activity(
+            "prediction", 
+            "New prediction generated",
+            f"Stakeholder {stakeholder_address[:8]}... generated prediction {prediction_id} with {borough_count} borough allocations",
+            {
+                "prediction_id": prediction_id,
+                "borough_count": borough_count,
+                "oracle_hash": ipfs_hash,
+                "confidence": confidence_int,
+                "stakeholder_address": stakeholder_address
+            },
+            "success"
+        )
+    return prediction_id
+
+def record_approval():
+    """
+    Count a finalized prediction
+
+    Returns:
+        dict: A snapshot of the prediction stats after the increment
+    """
+    with state_lock:
+        prediction_stats["approved_predictions"] += 1
+        update_stats_in_db()
+        return dict(prediction_stats)
+
+def record_consumption(borough, consumption):
+    """Fold a manual consumption reading into the analytics data"""
+    with state_lock:
+        # Update analytics data with real consumption
+        analytics_data["actual_consumption"]["borough_totals"][borough] += consumption * 0.1  # Small cumulative effect
         
-        for client in connected_clients:
-            try:
-                await client.put(f"data: {json.dumps(update_data)}\n\n")
-                print("📈 Analytics data broadcasted to client")
-            except Exception as e:
-                print(f"Error broadcasting analytics: {e}")
-                disconnected.append(client)
-        
-        # Remove disconnected connections
-        for conn in disconnected:
-            connected_clients.remove(conn)
-
-async def broadcast_activity_update():
-    """Broadcast activity updates to all connected clients"""
-    if connected_clients:
-        disconnected = []
-        recent_activities = get_recent_activities(10)  # Get latest 10 activities
-        update_data = {
-            "type": "activity_update",
-            "activities": recent_activities,
-            "timestamp": datetime.now().isoformat()
-        }
+        # Add to real-time consumption tracking
+        current_time = datetime.now()
+        analytics_data["real_time_consumption"].append({
+            "borough": borough,
+            "consumption": consumption,
+            "timestamp": current_time.isoformat(),
+            "hour": current_time.hour,
+            "source": "manual_input"
+        })
         
-        for client in connected_clients:
-            try:
-                await client.put(f"data: {json.dumps(update_data)}\n\n")
-                print("🔔 Activity update broadcasted to client")
-            except Exception as e:
-                print(f"Error broadcasting activity: {e}")
-                disconnected.append(client)
+        # Keep only recent data
+        if len(analytics_data["real_time_consumption"]) > 100:
+            analytics_data["real_time_consumption"] = analytics_data["real_time_consumption"][-100:]
         
-        # Remove disconnected connections
-        for conn in disconnected:
-            connected_clients.remove(conn)
+        analytics_data["last_updated"] = current_time.isoformat()
+        state_version.bump()
 
-def validate_file_extension(filename: str) -> bool:
-    """Validate that the file has an allowed extension"""
-    allowed_extensions = [".csv", ".json"]
-    return any(filename.endswith(ext) for ext in allowed_extensions)
+async def run_prediction_pipeline(file_path, stakeholder_address, timestamp, set_stage=None):
+    """
+    Run the prediction pipeline for a saved upload: predict, IPFS upload,
+    oracle submission, then stats/analytics bookkeeping and broadcasts
+
+    Args:
+        file_path: Path of the saved upload
+        stakeholder_address: Ethereum address of the stakeholder who uploaded it
+        timestamp: Upload timestamp reported back to the client
+        set_stage: Optional async callable(stage, progress) notified as each stage starts,
+            with what earlier stages produced
+
+    Returns:
+        dict: Prediction details for the client
+    """
+    async def enter_stage(stage, progress=None):
+        if set_stage:
+            await set_stage(stage, progress)
+
+    io_executor = get_io_executor()
+    
+    # Run prediction on the uploaded file in a prediction worker
+    await enter_stage("predict")
+    prediction_file_path = await get_prediction_executor().run(run_prediction, file_path)
+    
+    # Load the prediction JSON file to extract confidence score
+    prediction_data = await io_executor.run(read_json_file, prediction_file_path)
+    await io_executor.run(prediction_catalog.add, prediction_file_path, prediction_data)
+    confidence_score = prediction_data.get("confidence_score", 0)
+        
+    # Convert confidence score to integer between 0-100
+    # AIPredictionMultisig contract expects uint8 (0-255)
+    confidence_int = int(round(confidence_score))
+    # Ensure it's within valid range
+    confidence_int = max(0, min(100, confidence_int))
+    
+    # Upload prediction to IPFS
+    await enter_stage("ipfs")
+    ipfs_hash = await io_executor.run(upload_to_ipfs, prediction_file_path)
+    await io_executor.run(prediction_catalog.set_ipfs_hash, prediction_file_path, ipfs_hash)
+    
+    # Submit to AIPredictionMultisig contract; submissions arriving together share one oracle round
+    await enter_stage("oracle", {"prediction_id": prediction_data.get("prediction_id"),
+                                 "prediction_file": os.path.basename(prediction_file_path),
+                                 "ipfsHash": ipfs_hash})
+    oracle_result = None
+    try:
+        oracle_result = await oracle_batcher.submit(prediction_data.get("prediction_id"), ipfs_hash, confidence_int)
+    except OracleTimeoutError as e:
+        # Keep the prediction so the client still gets it with the timeout
+        e.prediction = prediction_data
+        raise
+    except OracleError as e:
+        # Log the error but don't fail the request
+        print(f"Contract submission warning: {e}")
+    
+    # Update stats, analytics, the event log and the activity feed
+    await enter_stage("analytics", {"transaction_hash": oracle_result.get("txHash") if oracle_result else None})
+    prediction_id = await io_executor.run(
+        record_prediction, prediction_data, prediction_file_path, file_path,
+        confidence_int, ipfs_hash, stakeholder_address
+    )
+    
+    # Broadcast combined update to all connected clients
+    broadcast_hub.publish("stats", "analytics", "activities")
+    
+    print("🚀 PREDICTION CYCLE COMPLETED WITH REAL-TIME UPDATES")
+    
+    tx_result = oracle_result.get("txHash") if oracle_result else None
+    
+    # Return successful response
+    response = {
+        "status": "success",
+        "prediction_id": prediction_id,
+        "ipfsHash": ipfs_hash,
+        "confidence_score": confidence_int,
+        "timestamp": timestamp,
+        "prediction_file": os.path.basename(prediction_file_path),
+        "oracle_address": os.environ.get("ORACLE_ADDRESS", "Not configured")
+    }
+    
+    # Add transaction info if available
+    if tx_result:
+        response["transaction_hash"] = tx_result
+        
+    return response
+
+async def run_prediction_job(job, set_stage):
+    """Job queue runner: run the pipeline for a queued upload"""
+    timestamp = datetime.fromisoformat(job["created_at"]).strftime("%Y%m%d_%H%M%S")
+    try:
+        return await run_prediction_pipeline(job["upload_path"], job["stakeholder_address"], timestamp, set_stage)
+    except OracleTimeoutError:
+        raise RuntimeError("Oracle submission timed out after 60 seconds")
+
+async def broadcast_job_update(job):
+    """Broadcast a prediction job status change to all connected clients"""
+    broadcast_hub.send({
+        "type": "job_update",
+        "job": job,
+        "timestamp": datetime.now().isoformat()
+    })
+
+# Coalesces oracle submissions (ORACLE_BATCH_WINDOW_MS, ORACLE_BATCH_MAX_SIZE, ORACLE_MAX_RETRIES)
+oracle_batcher = create_submission_batcher()
+
+job_queue = PredictionJobQueue(
+    run_prediction_job,
+    db_path=DB_PATH,
+    workers=max(1, int(os.environ.get("PREDICTION_JOB_WORKERS", 2))),
+    max_pending=max(1, int(os.environ.get("PREDICTION_JOB_MAX_PENDING", 32))),
+    on_update=broadcast_job_update
+)
 
 @app.post("/predict", response_class=JSONResponse)
-async def predict(file: UploadFile = File(...), stakeholder_address: str = Form("")):
+async def predict(
+    file: UploadFile = File(...),
+    stakeholder_address: str = Form(""),
+    async_mode: bool = Query(False, alias="async")
+):
     """
     Upload a file with water consumption data, run predictions, 
     upload results to IPFS, and submit to the AIPredictionMultisig contract.
@@ -960,9 +1103,10 @@ async def predict(file: UploadFile = File(...), stakeholder_address: str = Form(
     Args:
         file: CSV or JSON file with water consumption data
         stakeholder_address: Ethereum address of the authenticated stakeholder
+        async_mode: With ?async=true, queue the upload as a job and return its ID immediately
     
     Returns:
-        JSON response with prediction details
+        JSON response with prediction details, or the job ID in async mode
     """
     
     # Debug logging
@@ -998,114 +1142,57 @@ async def predict(file: UploadFile = File(...), stakeholder_address: str = Form(
     unique_filename = f"{timestamp}_{prediction_id}{file_extension}"
     file_path = os.path.join("data_uploads", unique_filename)
     
+    io_executor = get_io_executor()
     try:
         # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Run prediction on the uploaded file
-        prediction_file_path = run_prediction(file_path)
-        
-        # Load the prediction JSON file to extract confidence score
-        with open(prediction_file_path, "r") as f:
-            prediction_data = json.load(f)
-            confidence_score = prediction_data.get("confidence_score", 0)
-            
-        # Convert confidence score to integer between 0-100
-        # AIPredictionMultisig contract expects uint8 (0-255)
-        confidence_int = int(round(confidence_score))
-        # Ensure it's within valid range
-        confidence_int = max(0, min(100, confidence_int))
-        
-        # Upload prediction to IPFS
-        ipfs_hash = upload_to_ipfs(prediction_file_path)
-        
-        # Submit to AIPredictionMultisig contract (with timeout for network reliability)
-        oracle_result = subprocess.run(
-            ["node", "oracle_submit.js", ipfs_hash, str(confidence_int)],
-            capture_output=True,
-            text=True,
-            timeout=60  # 1 minute timeout for blockchain operations
+        await io_executor.run(save_upload, file.file, file_path)
+    except ExecutorSaturatedError as e:
+        print(f"⚠️ Rejecting prediction request: {e}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return JSONResponse(
+            status_code=503,
+            content={"status": "busy", "message": "Server is busy processing other predictions, please retry shortly"}
         )
-        
-        # Update prediction stats
-        prediction_stats["total_predictions"] += 1
-        
-        # Calculate new accuracy (simulated improvement with each successful prediction)
-        current_accuracy = prediction_stats["accuracy"]
-        new_accuracy = min(96, current_accuracy + 0.01)  # Gradual improvement
-        prediction_stats["accuracy"] = round(new_accuracy, 2)
-        
-        # Update analytics data with REAL prediction data
-        update_analytics_with_real_prediction(prediction_file_path, file_path)
-        
-        # Store analytics event with real data
-        store_analytics_event("prediction_generated", consumption_value=confidence_int)
-        
-        # Update database
-        update_stats_in_db()
-        
-        # Log prediction generation activity
-        prediction_id = prediction_data.get("prediction_id", "N/A")
-        borough_count = len(prediction_data.get("predicted_allocation", {}))
-        add_activity(
-            "prediction", 
-            "New prediction generated",
-            f"Stakeholder {stakeholder_address[:8]}... generated prediction {prediction_id} with {borough_count} borough allocations",
-            {
-                "prediction_id": prediction_id,
-                "borough_count": borough_count,
-                "oracle_hash": ipfs_hash,
-                "confidence": confidence_int,
-                "stakeholder_address": stakeholder_address
-            },
-            "success"
+    
+    if async_mode:
+        try:
+            job = await job_queue.submit(file_path, stakeholder_address, file.filename)
+        except JobQueueFullError as e:
+            print(f"⚠️ Rejecting prediction job: {e}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            return JSONResponse(
+                status_code=503,
+                content={"status": "busy", "message": "Too many prediction jobs are waiting, please retry shortly"}
+            )
+        print(f"📥 Queued prediction job {job['id']}")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "accepted",
+                "job_id": job["id"],
+                "status_url": f"/jobs/{job['id']}",
+                "timestamp": timestamp
+            }
         )
+    
+    try:
+        return await run_prediction_pipeline(file_path, stakeholder_address, timestamp)
         
-        # Broadcast combined update to all connected clients
-        await broadcast_stats_update()
-        await broadcast_analytics_update()
-        await broadcast_activity_update()
-        
-        print("🚀 PREDICTION CYCLE COMPLETED WITH REAL-TIME UPDATES")
-        
-        tx_result = None
-        if oracle_result.returncode != 0:
-            # Log the error but don't fail the request
-            print(f"Contract submission warning: {oracle_result.stderr}")
-        else:
-            # Try to extract transaction ID or prediction ID from output
-            output_lines = oracle_result.stdout.split('\n')
-            for line in output_lines:
-                if 'Transaction submitted:' in line:
-                    tx_result = line.split('Transaction submitted:')[1].strip()
-                elif 'Prediction submitted with ID:' in line:
-                    prediction_blockchain_id = line.split('Prediction submitted with ID:')[1].strip()
-        
-        # Return successful response
-        response = {
-            "status": "success",
-            "prediction_id": prediction_id,
-            "ipfsHash": ipfs_hash,
-            "confidence_score": confidence_int,
-            "timestamp": timestamp,
-            "prediction_file": os.path.basename(prediction_file_path),
-            "oracle_address": os.environ.get("ORACLE_ADDRESS", "Not configured")
-        }
-        
-        # Add transaction info if available
-        if tx_result:
-            response["transaction_hash"] = tx_result
-            
-        return response
-        
-    except subprocess.TimeoutExpired:
+    except ExecutorSaturatedError as e:
+        print(f"⚠️ Rejecting prediction request: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={"status": "busy", "message": "Server is busy processing other predictions, please retry shortly"}
+        )
+    except OracleTimeoutError as e:
         return JSONResponse(
             status_code=408,
             content={
                 "status": "timeout",
                 "message": "Oracle submission timed out after 60 seconds",
-                "prediction": prediction_data if 'prediction_data' in locals() else None
+                "prediction": getattr(e, "prediction", None)
             }
         )
     except Exception as e:
@@ -1120,41 +1207,80 @@ async def predict(file: UploadFile = File(...), stakeholder_address: str = Form(
             os.remove(file_path)
             print(f"🧹 Cleaned up uploaded file: {file_path}")
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status and per-stage progress of a prediction job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Prediction job {job_id} not found")
+    return {"status": "success", "job": job}
+
+def reload_state_from_db():
+    """Reload stats and analytics and take the new version in one step under state_lock"""
+    with state_lock:
+        load_stats_from_db()
+        load_analytics_from_db()
+        state_version.bump(persist=False)
+
+async def sync_state_from_db():
+    """Reload stats and analytics from the database if another process changed them"""
+    if state_version.check_due() and await storage.run(state_version.changed_elsewhere):
+        print("🔄 Dashboard state changed in another process, reloading")
+        await storage.run(reload_state_from_db)
+        broadcast_hub.publish("stats", "analytics")
+
+def build_snapshot(resource, build_content):
+    """
+    ETag and deep copy of a response body, taken together under state_lock
+
+    Every change bumps the version under the same lock, so the ETag always names the body sent with it.
+    """
+    with state_lock:
+        return state_version.etag(resource), copy.deepcopy(build_content())
+
+async def versioned_response(request: Request, resource: str, build_content):
+    """Answer 304 if the client's ETag matches the current state version, otherwise the full body"""
+    if_none_match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    etag = state_version.etag(resource)
+    if etag in if_none_match:
+        # The client already holds the body for this version
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    etag, content = await storage.run(build_snapshot, resource, build_content)
+    return JSONResponse(content=content, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
 @app.get("/stats/stream")
-async def stream_stats():
-    """Server-Sent Events endpoint for real-time dashboard updates"""
+async def stream_stats(request: Request, last_event_id: Optional[str] = None):
+    """
+    Server-Sent Events endpoint for real-time dashboard updates
+
+    Sends a snapshot of the dashboard state, then JSON-patch deltas. A client resuming
+    with Last-Event-ID (header, or last_event_id query parameter for a manual reconnect)
+    gets only the patches it missed when they are still available.
+    """
+    resume_from = request.headers.get("last-event-id") or last_event_id
+
     async def event_generator():
-        client_queue = asyncio.Queue()
-        connected_clients.add(client_queue)
-        
+        subscriber = None
         try:
             # Load latest persisted analytics data before sending initial data
-            load_analytics_from_db()
+            await sync_state_from_db()
             
-            # Send initial stats and analytics
-            initial_data = {
-                "type": "initial_data",
-                "stats": prediction_stats,
-                "analytics": analytics_data,
-                "timestamp": datetime.now().isoformat()
-            }
-            initial_message = f"data: {json.dumps(initial_data)}\n\n"
-            yield initial_message
+            subscriber, catch_up = await broadcast_hub.connect(resume_from)
+            for frame in catch_up:
+                yield frame
             
-            # Keep connection alive and send updates
+            # Send updates (and the hub's shared heartbeats) until the client goes away
             while True:
-                try:
-                    # Wait for new messages or send heartbeat every 30 seconds
-                    message = await asyncio.wait_for(client_queue.get(), timeout=30.0)
-                    yield message
-                except asyncio.TimeoutError:
-                    # Send heartbeat to keep connection alive
-                    yield "data: {\"heartbeat\": true}\n\n"
+                message = await subscriber.get()
+                if message is None:
+                    break  # Evicted for falling too far behind; the browser reconnects
+                yield message
                     
         except Exception as e:
             print(f"SSE client disconnected: {e}")
         finally:
-            connected_clients.discard(client_queue)
+            if subscriber is not None:
+                broadcast_hub.unsubscribe(subscriber)
     
     return StreamingResponse(
         event_generator(),
@@ -1169,11 +1295,10 @@ async def stream_stats():
     )
 
 @app.get("/stats")
-async def get_stats():
-    """Get current dashboard statistics (always loads latest persisted data)"""
-    # Always try to load the most recent persisted data to ensure consistency
-    load_stats_from_db()
-    return {"status": "success", "stats": prediction_stats}
+async def get_stats(request: Request):
+    """Get current dashboard statistics (served from memory, 304 if unchanged since the client's ETag)"""
+    await sync_state_from_db()
+    return await versioned_response(request, "stats", lambda: {"status": "success", "stats": prediction_stats})
 
 @app.post("/stats/approve")
 async def approve_prediction(request: dict):
@@ -1186,37 +1311,35 @@ async def approve_prediction(request: dict):
         return {"status": "success", "message": "Individual approval recorded, waiting for finalization", "finalized": False}
     
     # Prediction is now finalized (2/2 approvals reached)
-    prediction_stats["approved_predictions"] += 1
-    update_stats_in_db()
+    stats = await storage.run(record_approval)
     
     # Log finalization activity
-    add_activity(
+    await storage.run(
+        add_activity,
         "approval",
         "Prediction finalized", 
         f"Prediction #{prediction_id} reached required approvals and was finalized",
         {
             "prediction_id": prediction_id,
-            "approval_count": prediction_stats["approved_predictions"],
-            "approval_rate": round((prediction_stats["approved_predictions"] / prediction_stats["total_predictions"]) * 100, 1) if prediction_stats["total_predictions"] > 0 else 0
+            "approval_count": stats["approved_predictions"],
+            "approval_rate": round((stats["approved_predictions"] / stats["total_predictions"]) * 100, 1) if stats["total_predictions"] > 0 else 0
         },
         "success"
     )
     
     # Store finalization event (don't update analytics data as approvals don't change consumption)
-    store_analytics_event("prediction_finalized")
+    await storage.run(store_analytics_event, "prediction_finalized")
     
     # Broadcast updates to all connected clients
-    await broadcast_stats_update()
-    await broadcast_activity_update()
+    broadcast_hub.publish("stats", "activities")
     
-    return {"status": "success", "message": "Prediction finalized", "finalized": True, "stats": prediction_stats}
+    return {"status": "success", "message": "Prediction finalized", "finalized": True, "stats": stats}
 
 @app.get("/analytics")
-async def get_analytics():
-    """Get current analytics data (always loads latest persisted data)"""
-    # Always try to load the most recent persisted data to ensure consistency
-    load_analytics_from_db()
-    return {"analytics": analytics_data}
+async def get_analytics(request: Request):
+    """Get current analytics data (served from memory, 304 if unchanged since the client's ETag)"""
+    await sync_state_from_db()
+    return await versioned_response(request, "analytics", lambda: {"analytics": analytics_data})
 
 @app.post("/analytics/reset")
 async def reset_analytics(clear_files: bool = False):
@@ -1240,18 +1363,20 @@ async def reset_analytics(clear_files: bool = False):
                 print(f"🗑️  Deleted: {file_path}")
             
             print(f"🧹 Cleared {len(prediction_files)} prediction files and {len(upload_files)} upload files")
+            await storage.run(prediction_catalog.sync)
         except Exception as e:
             print(f"⚠️  Error clearing files: {e}")
     
-    success = reset_all_analytics()
+    success = await storage.run(reset_all_analytics)
     
     if success:
         # Broadcast the reset data to all connected clients
-        await broadcast_stats_update()
+        broadcast_hub.publish("stats", "analytics")
+        state = await storage.run(copy_state, ("stats", "analytics"))
         return {
             "message": f"Analytics system reset to zero successfully{' (files cleared)' if clear_files else ''}", 
-            "analytics": analytics_data,
-            "stats": prediction_stats,
+            "analytics": state["analytics"],
+            "stats": state["stats"],
             "files_cleared": clear_files,
             "status": "reset_complete"
         }
@@ -1265,46 +1390,26 @@ async def reset_analytics(clear_files: bool = False):
 async def simulate_analytics_update():
     """Simulate analytics data change (TESTING ONLY - normally only prediction generation updates analytics)"""
     print("⚠️  Manual simulation triggered - this is for testing only")
-    update_analytics_data_fallback()
-    store_analytics_event("simulation_update")
-    await broadcast_analytics_update()
-    return {"message": "Analytics data updated (SIMULATION - for testing only)", "analytics": analytics_data}
+    await storage.run(simulate_analytics)
+    await storage.run(store_analytics_event, "simulation_update")
+    broadcast_hub.publish("analytics")
+    state = await storage.run(copy_state, ("analytics",))
+    return {"message": "Analytics data updated (SIMULATION - for testing only)", "analytics": state["analytics"]}
 
 @app.post("/analytics/consumption")
 async def add_consumption_data(borough: str, consumption: float):
     """Add real-time consumption data for a specific borough"""
     try:
         # Store in database
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        cursor.execute('''
+        await storage.execute_async('''
             INSERT INTO real_time_consumption (borough, consumption)
             VALUES (?, ?)
         ''', (borough.upper(), consumption))
-        conn.commit()
-        conn.close()
-        
-        # Update analytics data with real consumption
-        analytics_data["actual_consumption"]["borough_totals"][borough.upper()] += consumption * 0.1  # Small cumulative effect
-        
-        # Add to real-time consumption tracking
-        current_time = datetime.now()
-        analytics_data["real_time_consumption"].append({
-            "borough": borough.upper(),
-            "consumption": consumption,
-            "timestamp": current_time.isoformat(),
-            "hour": current_time.hour,
-            "source": "manual_input"
-        })
-        
-        # Keep only recent data
-        if len(analytics_data["real_time_consumption"]) > 100:
-            analytics_data["real_time_consumption"] = analytics_data["real_time_consumption"][-100:]
         
-        analytics_data["last_updated"] = current_time.isoformat()
-        store_analytics_event("consumption_data", borough=borough.upper(), consumption_value=consumption)
+        await storage.run(record_consumption, borough.upper(), consumption)
+        await storage.run(store_analytics_event, "consumption_data", borough=borough.upper(), consumption_value=consumption)
         
-        await broadcast_analytics_update()
+        broadcast_hub.publish("analytics")
         return {"message": "Consumption data added", "borough": borough, "consumption": consumption}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding consumption data: {str(e)}")
@@ -1313,9 +1418,7 @@ async def add_consumption_data(borough: str, consumption: float):
 async def get_real_time_consumption():
     """Get real-time consumption data"""
     try:
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        cursor.execute('''
+        rows = await storage.fetchall_async('''
             SELECT borough, consumption, timestamp
             FROM real_time_consumption
             ORDER BY timestamp DESC
@@ -1323,7 +1426,7 @@ async def get_real_time_consumption():
         ''')
         
         data = []
-        for row in cursor.fetchall():
+        for row in rows:
             borough, consumption, timestamp = row
             data.append({
                 "borough": borough,
@@ -1331,7 +1434,6 @@ async def get_real_time_consumption():
                 "timestamp": timestamp
             })
         
-        conn.close()
         return {
             "status": "success",
             "data": data,
@@ -1348,7 +1450,7 @@ async def get_real_time_consumption():
 async def get_activities(limit: int = 20):
     """Get recent activities for the activity feed"""
     try:
-        activities = get_recent_activities(limit)
+        activities = await storage.run(get_recent_activities, limit)
         return {
             "status": "success",
             "activities": activities,
@@ -1370,10 +1472,10 @@ async def add_new_activity(
 ):
     """Add a new activity (admin use)"""
     try:
-        success = add_activity(activity_type, title, description, None, severity)
+        success = await storage.run(add_activity, activity_type, title, description, None, severity)
         if success:
             # Broadcast the activity update to all connected clients
-            await broadcast_activity_update()
+            broadcast_hub.publish("activities")
             return {"status": "success", "message": "Activity added"}
         else:
             return JSONResponse(
@@ -1402,56 +1504,24 @@ async def get_prediction(prediction_id: str):
         if prediction_id.endswith('.json'):
             file_path = os.path.join("outputs", prediction_id)
         else:
-            # Search for the prediction file by ID or IPFS hash
-            outputs_dir = "outputs"
-            if not os.path.exists(outputs_dir):
-                raise HTTPException(status_code=404, detail="Outputs directory not found")
-            
-            # Look for prediction files containing this ID or IPFS hash
-            found_file = None
-            for filename in os.listdir(outputs_dir):
-                if filename.startswith('prediction_') and filename.endswith('.json'):
-                    file_path = os.path.join(outputs_dir, filename)
-                    try:
-                        with open(file_path, 'r') as f:
-                            data = json.load(f)
-                            # Check if it matches by prediction ID
-                            if data.get('prediction_id') == prediction_id:
-                                found_file = file_path
-                                break
-                            # Check if it matches by IPFS hash in metadata
-                            if data.get('metadata', {}).get('ipfs_hash') == prediction_id:
-                                found_file = file_path
-                                break
-                            # Check if the prediction_id is an IPFS hash format (starts with Qm or baf)
-                            if (prediction_id.startswith(('Qm', 'baf')) and 
-                                data.get('metadata', {}).get('ipfs_hash') == prediction_id):
-                                found_file = file_path
-                                break
-                    except:
-                        continue
+            # Look the prediction up by ID or IPFS hash in the catalog
+            entry = await storage.run(prediction_catalog.find, prediction_id)
             
-            # If still not found, try to match by filename timestamp with IPFS hash
-            if not found_file and len(prediction_id) > 10:
-                # For IPFS hashes, try to get the most recent prediction as fallback
-                # This is a temporary solution until we implement proper IPFS mapping
-                prediction_files = [f for f in os.listdir(outputs_dir) 
-                                  if f.startswith('prediction_') and f.endswith('.json')]
-                if prediction_files:
-                    # Sort by timestamp and get the most recent one
-                    prediction_files.sort(reverse=True)
-                    found_file = os.path.join(outputs_dir, prediction_files[0])
+            # If still not found, fall back to the most recent prediction for IPFS-hash-like IDs
+            # (predictions cataloged from old files may not have their hash recorded)
+            if entry is None and len(prediction_id) > 10:
+                recent = await storage.run(prediction_catalog.recent, 1)
+                entry = recent[0] if recent else None
             
-            if not found_file:
+            if entry is None:
                 raise HTTPException(status_code=404, detail=f"Prediction with ID or hash {prediction_id} not found")
-            file_path = found_file
+            file_path = entry["file_path"]
         
         # Read and return the prediction data
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="Prediction file not found")
         
-        with open(file_path, 'r') as f:
-            prediction_data = json.load(f)
+        prediction_data = await storage.run(read_json_file, file_path)
         
         # Add file metadata
         prediction_data['file_info'] = {
@@ -1470,61 +1540,69 @@ async def get_prediction(prediction_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving prediction: {str(e)}")
 
+def parse_time_filter(name, value):
+    """Normalize an ISO date/datetime query parameter for comparison with catalog timestamps"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).strftime("%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO date or datetime")
+
 @app.get("/predictions/list")
-async def list_predictions(limit: int = 20):
+async def list_predictions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    borough: Optional[str] = None
+):
     """
-    List recent predictions with basic metadata
+    List predictions with basic metadata, newest first, one page at a time
     
     Args:
-        limit: Maximum number of predictions to return (default 20)
+        limit: Maximum number of predictions to return (default 20, at most 100)
+        cursor: next_cursor from the previous page, to continue after it
+        start: Only predictions at or after this ISO date/datetime
+        end: Only predictions before this ISO date/datetime
+        min_confidence: Only predictions with at least this confidence score
+        borough: Only predictions allocating water to this borough
     
     Returns:
-        List of predictions with summary data
+        List of predictions with summary data, and the cursor of the next page (null on the last page)
     """
+    start = parse_time_filter("start", start)
+    end = parse_time_filter("end", end)
     try:
-        outputs_dir = "outputs"
-        if not os.path.exists(outputs_dir):
-            return {"status": "success", "predictions": []}
-        
-        predictions = []
-        
-        # Get all prediction files
-        for filename in sorted(os.listdir(outputs_dir), reverse=True):
-            if filename.startswith('prediction_') and filename.endswith('.json'):
-                file_path = os.path.join(outputs_dir, filename)
-                try:
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                    
-                    # Extract summary information
-                    prediction_summary = {
-                        'filename': filename,
-                        'prediction_id': data.get('prediction_id'),
-                        'timestamp': data.get('timestamp'),
-                        'confidence_score': data.get('confidence_score'),
-                        'total_consumption': data.get('metadata', {}).get('total_consumption_hcf'),
-                        'number_of_boroughs': data.get('metadata', {}).get('number_of_boroughs'),
-                        'file_size': os.path.getsize(file_path),
-                        'created_at': datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
-                    }
-                    
-                    predictions.append(prediction_summary)
-                    
-                    if len(predictions) >= limit:
-                        break
-                        
-                except Exception as e:
-                    print(f"Error reading prediction file {filename}: {e}")
-                    continue
-        
-        return {
-            "status": "success",
-            "predictions": predictions,
-            "total_count": len(predictions)
-        }
-        
+        # Summaries come from the prediction catalog, no prediction file is opened
+        entries, next_cursor = await storage.run(
+            prediction_catalog.page, limit, cursor, start, end, min_confidence, borough
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing predictions: {str(e)}")
+    
+    predictions = [{
+        'filename': entry['filename'],
+        'prediction_id': entry['prediction_id'],
+        'timestamp': entry['timestamp'],
+        'confidence_score': entry['confidence_score'],
+        'total_consumption': entry['total_consumption'],
+        'number_of_boroughs': entry['number_of_boroughs'],
+        'boroughs': entry['boroughs'],
+        'file_size': entry['file_size'],
+        'created_at': entry['created_at']
+    } for entry in entries]
+    
+    return {
+        "status": "success",
+        "predictions": predictions,
+        "total_count": len(predictions),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
 
 @app.get("/reports")
 async def get_system_reports():
@@ -1535,13 +1613,9 @@ async def get_system_reports():
         Water allocation reports, prediction analytics, blockchain activity, and system usage
     """
     try:
-        # Get current stats from database
-        conn = sqlite3.connect('dashboard_stats.db')
-        cursor = conn.cursor()
-        
-        # Get prediction statistics
-        cursor.execute('SELECT * FROM prediction_stats ORDER BY last_updated DESC LIMIT 1')
-        stats_row = cursor.fetchone()
+        # Get prediction statistics (queries run on the I/O executor)
+        await storage.run(write_buffer.flush)
+        stats_row = await storage.fetchone_async('SELECT * FROM prediction_stats ORDER BY last_updated DESC LIMIT 1')
         current_stats = {
             "total_predictions": stats_row[1] if stats_row else 0,
             "approved_predictions": stats_row[2] if stats_row else 0,
@@ -1549,61 +1623,31 @@ async def get_system_reports():
             "last_updated": stats_row[4] if stats_row else datetime.now().isoformat()
         }
         
-        # Get recent activities for system usage analysis
-        cursor.execute('''
-            SELECT activity_type, COUNT(*) as count, MAX(timestamp) as last_activity
-            FROM recent_activities 
-            WHERE timestamp >= datetime('now', '-30 days')
-            GROUP BY activity_type
-        ''')
-        activity_summary = []
-        for row in cursor.fetchall():
-            activity_summary.append({
-                "type": row[0],
-                "count": row[1],
-                "last_activity": row[2]
-            })
+        # Reports only change when the rollups, the catalog or the stats do
+        cache_key = await storage.run(report_engine.cache_key, tuple(stats_row or ()))
+        cached_report = report_engine.cached(cache_key)
+        if cached_report is not None:
+            return {
+                "status": "success",
+                "report": cached_report
+            }
         
-        # Get recent predictions data
-        predictions_data = []
-        outputs_dir = "outputs"
-        if os.path.exists(outputs_dir):
-            prediction_files = [f for f in os.listdir(outputs_dir) 
-                              if f.startswith('prediction_') and f.endswith('.json')]
-            prediction_files.sort(reverse=True)
-            
-            for filename in prediction_files[:10]:  # Get last 10 predictions
-                file_path = os.path.join(outputs_dir, filename)
-                try:
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                    
-                    predictions_data.append({
-                        "filename": filename,
-                        "prediction_id": data.get('prediction_id'),
-                        "timestamp": data.get('timestamp'),
-                        "confidence_score": data.get('confidence_score'),
-                        "total_consumption": data.get('metadata', {}).get('total_consumption_hcf'),
-                        "boroughs": list(data.get('predicted_allocation', {}).keys()),
-                        "created_at": datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
-                    })
-                except:
-                    continue
+        # Get activity counts for system usage analysis from the daily rollups
+        activity_summary = await storage.run(report_engine.activity_summary)
+        
+        # Get recent predictions data from the prediction catalog (last 10 predictions)
+        predictions_data = [{
+            "filename": entry["filename"],
+            "prediction_id": entry["prediction_id"],
+            "timestamp": entry["timestamp"],
+            "confidence_score": entry["confidence_score"],
+            "total_consumption": entry["total_consumption"],
+            "boroughs": entry["boroughs"],
+            "created_at": entry["created_at"]
+        } for entry in await storage.run(prediction_catalog.recent, 10)]
         
         # Get analytics data for trends
-        cursor.execute('''
-            SELECT borough, AVG(consumption_value) as avg_consumption, COUNT(*) as data_points
-            FROM analytics_events 
-            WHERE event_type = 'consumption' AND timestamp >= datetime('now', '-30 days')
-            GROUP BY borough
-        ''')
-        borough_trends = []
-        for row in cursor.fetchall():
-            borough_trends.append({
-                "borough": row[0],
-                "avg_consumption": round(row[1], 2) if row[1] else 0,
-                "data_points": row[2]
-            })
+        borough_trends = await storage.run(report_engine.borough_trends, 'consumption')
         
         # Calculate prediction accuracy trend (last 30 days)
         accuracy_trend = []
@@ -1616,24 +1660,7 @@ async def get_system_reports():
                     })
         
         # System utilization metrics
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_activities,
-                COUNT(CASE WHEN activity_type = 'prediction' THEN 1 END) as predictions,
-                COUNT(CASE WHEN activity_type = 'approval' THEN 1 END) as approvals,
-                COUNT(CASE WHEN activity_type = 'blockchain' THEN 1 END) as blockchain_txs
-            FROM recent_activities 
-            WHERE timestamp >= datetime('now', '-30 days')
-        ''')
-        utilization_row = cursor.fetchone()
-        system_utilization = {
-            "total_activities": utilization_row[0] if utilization_row else 0,
-            "predictions_generated": utilization_row[1] if utilization_row else 0,
-            "approvals_processed": utilization_row[2] if utilization_row else 0,
-            "blockchain_transactions": utilization_row[3] if utilization_row else 0
-        }
-        
-        conn.close()
+        system_utilization = report_engine.utilization(activity_summary)
         
         # Compile comprehensive report
         report = {
@@ -1684,6 +1711,7 @@ async def get_system_reports():
             recommendations.append("No blockchain transactions detected. Verify smart contract integration.")
         
         report["recommendations"] = recommendations
+        report_engine.store(cache_key, report)
         
         return {
             "status": "success",
@@ -1700,17 +1728,36 @@ async def get_system_reports():
             }
         )
 
+@app.get("/model/status")
+async def get_model_status():
+    """Report the version and load time of the model loaded by the prediction workers"""
+    try:
+        model_stats = await get_prediction_executor().run(prediction_worker_model_stats)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"status": "success", "model": model_stats}
+
+@app.get("/executors/status")
+async def get_executors_status():
+    """Report concurrency limits and queue depth of the background executors and job queue"""
+    return {"status": "success", "executors": get_executor_stats(), "jobs": job_queue.stats(),
+            "oracle_batches": oracle_batcher.stats(), "storage": get_storage_stats(),
+            "write_behind": write_buffer.stats(), "state": state_version.stats(),
+            "sse": broadcast_hub.stats(), "reports": report_engine.stats(),
+            "retention": retention.stats()}
+
 @app.get("/")
 async def root():
     """Root endpoint to verify the API is running"""
     contract_address = os.environ.get("SMART_CONTRACT_ADDRESS", "Not configured")
     oracle_address = os.environ.get("ORACLE_ADDRESS", "Not configured")
+    state = await storage.run(copy_state, ("stats",))
     return {
         "message": "BIWMS API is running.",
         "smart_contract": contract_address,
         "oracle_address": oracle_address,
         "network": "BSC Testnet (Chain ID: 97)",
-        "stats": prediction_stats
+        "stats": state["stats"]
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+"""
+Bounded executors for running blocking work off the asyncio event loop.
+
+The API keeps two pools:
+- an I/O thread pool for file writes, IPFS uploads, the oracle subprocess and
+  SQLite bookkeeping
+- a prediction process pool (spawned, so TensorFlow state is never forked)
+  for model inference and pandas work
+
+Each pool admits at most `max_workers` running and `max_queue` waiting calls;
+callers beyond that are rejected instead of piling up. For the process pool,
+run time includes time spent queued, since workers can't report it back.
+Limits come from environment variables:
+
+    IO_THREAD_WORKERS           (default 8)
+    IO_MAX_QUEUE                (default 64)
+    PREDICTION_PROCESS_WORKERS  (default 1, 0 runs predictions on a thread)
+    PREDICTION_MAX_QUEUE        (default 16)
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a pool's wait queue is full"""
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"⚠️ Invalid {name}={os.environ[name]!r}, using {default}")
+        return default
+
+
+class BoundedExecutor:
+    """An executor with a concurrency limit, a bounded wait queue and usage metrics"""
+
+    def __init__(self, name, executor, max_workers, max_queue):
+        self.name = name
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_queued_seen = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _timed_call(self, enqueued_at, func, args, kwargs):
+        # Runs on the worker: the time since enqueueing is the queue wait
+        started_at = time.perf_counter()
+        try:
+            return func(*args, **kwargs), started_at - enqueued_at, time.perf_counter() - started_at
+        except BaseException as e:
+            e.executor_timing = (started_at - enqueued_at, time.perf_counter() - started_at)
+            raise
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) on the pool and await its result
+
+        Raises:
+            ExecutorSaturatedError: If max_queue calls are already waiting for a worker
+        """
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError(
+                    f"{self.name} executor is saturated ({self.in_flight} calls in flight)"
+                )
+            self.in_flight += 1
+            self.submitted += 1
+            self.max_queued_seen = max(self.max_queued_seen, self.in_flight - self.max_workers)
+
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.perf_counter()
+        timed = isinstance(self.executor, ThreadPoolExecutor)
+        if timed:
+            call = functools.partial(self._timed_call, enqueued_at, func, args, kwargs)
+        else:
+            # Process workers can't report timings back cheaply; measure around the call
+            call = functools.partial(func, *args, **kwargs)
+        try:
+            result = await loop.run_in_executor(self.executor, call)
+        except BaseException as e:
+            wait, run = getattr(e, "executor_timing", (0.0, time.perf_counter() - enqueued_at))
+            with self._lock:
+                self.in_flight -= 1
+                self.failed += 1
+                self.total_wait_seconds += wait
+                self.total_run_seconds += run
+            raise
+
+        if timed:
+            result, wait, run = result
+        else:
+            wait, run = 0.0, time.perf_counter() - enqueued_at
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_wait_seconds += wait
+            self.total_run_seconds += run
+        return result
+
+    def stats(self):
+        """Snapshot of the executor's limits and queue metrics"""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": min(self.in_flight, self.max_workers),
+                "queued": max(self.in_flight - self.max_workers, 0),
+                "max_queued_seen": self.max_queued_seen,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait_seconds / finished * 1000, 2) if finished else 0.0,
+                "avg_run_ms": round(self.total_run_seconds / finished * 1000, 2) if finished else 0.0
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def warm_prediction_worker():
+    """Load the shared model once when a prediction process starts"""
+    try:
+        from AI_feeds.model_registry import get_model_registry
+        get_model_registry().get()
+    except Exception as e:
+        print(f"⚠️ Prediction worker warm-up failed, will retry on first prediction: {e}")
+
+
+def prediction_worker_model_stats():
+    """Model registry stats as seen by a prediction worker"""
+    from AI_feeds.model_registry import get_model_registry
+    return get_model_registry().stats()
+
+
+_io_executor = None
+_prediction_executor = None
+_executors_lock = threading.Lock()
+
+
+def get_io_executor():
+    """Shared thread pool for blocking I/O"""
+    global _io_executor
+    with _executors_lock:
+        if _io_executor is None:
+            workers = max(1, _env_int("IO_THREAD_WORKERS", 8))
+            _io_executor = BoundedExecutor(
+                "io", ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io"),
+                workers, max(0, _env_int("IO_MAX_QUEUE", 64))
+            )
+        return _io_executor
+
+
+def get_prediction_executor():
+    """Shared process pool for model inference and pandas work"""
+    global _prediction_executor
+    with _executors_lock:
+        if _prediction_executor is None:
+            workers = _env_int("PREDICTION_PROCESS_WORKERS", 1)
+            max_queue = max(0, _env_int("PREDICTION_MAX_QUEUE", 16))
+            if workers > 0:
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_prediction_worker
+                )
+            else:
+                workers = 1
+                pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prediction")
+            _prediction_executor = BoundedExecutor("prediction", pool, workers, max_queue)
+        return _prediction_executor
+
+
+def get_executor_stats():
+    """Metrics for every executor that has been started"""
+    with _executors_lock:
+        executors = [executor for executor in (_io_executor, _prediction_executor) if executor is not None]
+    return {executor.name: executor.stats() for executor in executors}
+
+
+def shutdown_executors(wait=True):
+    """Stop all shared executors"""
+    global _io_executor, _prediction_executor
+    with _executors_lock:
+        executors = [executor for executor in (_io_executor, _prediction_executor) if executor is not None]
+        _io_executor = None
+        _prediction_executor = None
+    for executor in executors:
+        executor.shutdown(wait=wait)
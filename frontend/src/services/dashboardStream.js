@@ -0,0 +1,106 @@
+/**
+ * Dashboard Stream
+ * Keeps a local copy of the dashboard state in sync with the /stats/stream
+ * SSE endpoint: a full snapshot on connect, then JSON-patch deltas.
+ */
+
+const STREAM_URL = 'http://localhost:8000/stats/stream';
+
+function unescapeToken(token) {
+  return token.replace(/~1/g, '/').replace(/~0/g, '~');
+}
+
+/**
+ * Apply JSON-patch operations (add, remove, replace) to a document in place
+ * @param {Object} doc - The document to change
+ * @param {Array} ops - Operations as {op, path, value}
+ * @returns {Object} - The changed document
+ */
+export function applyPatch(doc, ops) {
+  for (const { op, path, value } of ops) {
+    const tokens = path.split('/').slice(1).map(unescapeToken);
+    const last = tokens.pop();
+    let parent = doc;
+    for (const token of tokens) {
+      parent = parent[token];
+    }
+    if (Array.isArray(parent)) {
+      const index = last === '-' ? parent.length : Number(last);
+      if (op === 'add') {
+        parent.splice(index, 0, value);
+      } else if (op === 'remove') {
+        parent.splice(index, 1);
+      } else {
+        parent[index] = value;
+      }
+    } else if (op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = value;
+    }
+  }
+  return doc;
+}
+
+/**
+ * Open the dashboard event stream
+ * @param {Object} handlers - onState(state, parts) after a snapshot or patch,
+ *   onEvent(data) for other events (job updates, heartbeats), onOpen(), onError(event)
+ * @returns {Object} - { close() }
+ */
+export function connectDashboardStream({ onState, onEvent, onOpen, onError } = {}) {
+  let state = null;
+  let version = null;
+  let lastEventId = null;
+  let eventSource = null;
+
+  const open = () => {
+    // A manual reconnect can't set the Last-Event-ID header, so pass it as a parameter
+    const url = lastEventId ? `${STREAM_URL}?last_event_id=${encodeURIComponent(lastEventId)}` : STREAM_URL;
+    eventSource = new EventSource(url);
+    eventSource.onopen = () => onOpen && onOpen();
+    eventSource.onerror = (event) => onError && onError(event);
+    eventSource.onmessage = (event) => {
+      let data;
+      try {
+        data = JSON.parse(event.data);
+      } catch (error) {
+        console.error('Error parsing SSE data:', error, event.data);
+        return;
+      }
+
+      if (data.type === 'snapshot') {
+        state = data.state;
+        version = data.version;
+        lastEventId = event.lastEventId;
+        onState && onState(state, ['stats', 'analytics', 'activities']);
+      } else if (data.type === 'patch') {
+        if (state === null || data.base !== version) {
+          // Missed an update: reconnect and resume from the last version applied
+          console.log(`Dashboard stream gap (have ${version}, patch from ${data.base}) - resyncing`);
+          eventSource.close();
+          open();
+          return;
+        }
+        applyPatch(state, data.ops);
+        version = data.version;
+        lastEventId = event.lastEventId;
+        const parts = [...new Set(data.ops.map(op => op.path.split('/')[1]))];
+        onState && onState(state, parts);
+      } else {
+        onEvent && onEvent(data);
+      }
+    };
+  };
+
+  open();
+
+  return {
+    close() {
+      if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+      }
+    }
+  };
+}
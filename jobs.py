@@ -0,0 +1,262 @@
+"""
+Asynchronous prediction job queue.
+
+`/predict?async=true` saves the upload, records a job and returns its ID
+straight away. A fixed number of worker tasks take jobs off a bounded queue
+and run the prediction pipeline stage by stage (predict -> ipfs -> oracle ->
+analytics). Every status change is written to the `prediction_jobs` table
+and reported to a listener (the SSE broadcaster), and `/jobs/{id}` returns
+the latest state.
+
+Jobs left queued or running by a previous process are picked up again on
+start if they never got past the IPFS stage and their upload is still on
+disk, and marked failed if the upload is gone. A job interrupted at the
+oracle or analytics stage may already have an on-chain submission, so it is
+never run again: it is marked needs_review, keeping its stage and the
+partial result the pipeline recorded (prediction, IPFS hash, transaction).
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+
+from executors import get_io_executor
+from storage import get_storage
+
+JOB_STAGES = ["predict", "ipfs", "oracle", "analytics"]
+# Running these again can't put a second prediction on chain
+RESTARTABLE_STAGES = (None, "predict", "ipfs")
+FINISHED_STATUSES = ("completed", "failed", "needs_review")
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when too many jobs are already waiting"""
+
+
+def init_jobs_table(db_path):
+    """Create the prediction_jobs table if it doesn't exist"""
+    get_storage(db_path).execute('''
+        CREATE TABLE IF NOT EXISTS prediction_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stage TEXT,
+            stakeholder_address TEXT,
+            upload_path TEXT,
+            original_filename TEXT,
+            result_json TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+
+class PredictionJobQueue:
+    """Bounded queue of prediction jobs processed by a fixed pool of worker tasks"""
+
+    def __init__(self, runner, db_path='dashboard_stats.db', workers=2, max_pending=32, on_update=None):
+        """
+        Args:
+            runner: async callable(job, set_stage) running the pipeline and returning the result dict;
+                set_stage(stage, progress=None) also merges progress into the job's partial result
+            db_path: SQLite database holding the prediction_jobs table
+            workers: Number of jobs processed concurrently
+            max_pending: Maximum number of queued jobs before submissions are rejected
+            on_update: Optional async callable(job) called after every status change
+        """
+        self.runner = runner
+        self.db_path = db_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.on_update = on_update
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        """Create the table, recover unfinished jobs and start the workers"""
+        io_executor = get_io_executor()
+        await io_executor.run(init_jobs_table, self.db_path)
+        self._queue = asyncio.Queue()
+
+        for job in await io_executor.run(self._load_unfinished_jobs):
+            if job["stage"] not in RESTARTABLE_STAGES:
+                job.update(status="needs_review",
+                           error=f"Interrupted at the {job['stage']} stage; not run again because its "
+                                 f"prediction may already have been submitted to the oracle")
+                await self._save(job)
+                print(f"⚠️ Prediction job {job['id']} needs review (interrupted at {job['stage']})")
+            elif job["upload_path"] and os.path.exists(job["upload_path"]):
+                job.update(status="queued", stage=None, result=None)
+                self.jobs[job["id"]] = job
+                await self._save(job)
+                self._queue.put_nowait(job["id"])
+                print(f"🔁 Re-queued prediction job {job['id']}")
+            else:
+                job.update(status="failed", error="Upload was lost before the job could run")
+                await self._save(job)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✅ Prediction job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs are recovered on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, upload_path, stakeholder_address, original_filename=None):
+        """
+        Record a new job for a saved upload and queue it
+
+        Returns:
+            dict: The new job
+
+        Raises:
+            JobQueueFullError: If max_pending jobs are already waiting
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFullError(f"{self._queue.qsize()} prediction jobs are already waiting")
+
+        now = datetime.now().isoformat()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "stage": None,
+            "stakeholder_address": stakeholder_address,
+            "upload_path": upload_path,
+            "original_filename": original_filename,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self.jobs[job["id"]] = job
+        await self._save(job)
+        self._queue.put_nowait(job["id"])
+        return job
+
+    async def get(self, job_id):
+        """Return a job by ID from memory or the database, or None"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return public_job(job)
+        job = await get_io_executor().run(self._load_job, job_id)
+        return public_job(job) if job else None
+
+    def stats(self):
+        """Queue depth and job counts by status"""
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "jobs_by_status": counts
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            try:
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Prediction job {job_id} failed: {e}")
+
+    async def _run_job(self, job):
+        async def set_stage(stage, progress=None):
+            job.update(status="running", stage=stage)
+            if progress:
+                job["result"] = dict(job["result"] or {}, **progress)
+            await self._save(job)
+
+        try:
+            result = await self.runner(job, set_stage)
+            job.update(status="completed", stage=None, result=result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.update(status="failed", error=str(e) or e.__class__.__name__)
+            await self._save(job)
+            raise
+        finally:
+            if job["status"] in FINISHED_STATUSES and job["upload_path"] and os.path.exists(job["upload_path"]):
+                os.remove(job["upload_path"])
+                print(f"🧹 Cleaned up uploaded file: {job['upload_path']}")
+        await self._save(job)
+
+    async def _save(self, job):
+        job["updated_at"] = datetime.now().isoformat()
+        try:
+            await get_io_executor().run(self._write_job, dict(job))
+        except Exception as e:
+            print(f"❌ Error saving prediction job {job['id']}: {e}")
+        if job["status"] in FINISHED_STATUSES:
+            # Finished jobs are served from the database from now on
+            self.jobs.pop(job["id"], None)
+        if self.on_update:
+            try:
+                await self.on_update(public_job(job))
+            except Exception as e:
+                print(f"Error broadcasting job update: {e}")
+
+    def _write_job(self, job):
+        get_storage(self.db_path).execute('''
+            INSERT OR REPLACE INTO prediction_jobs
+            (id, status, stage, stakeholder_address, upload_path, original_filename,
+             result_json, error, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (job["id"], job["status"], job["stage"], job["stakeholder_address"], job["upload_path"],
+              job["original_filename"], json.dumps(job["result"]) if job["result"] is not None else None,
+              job["error"], job["created_at"], job["updated_at"]))
+
+    def _query_jobs(self, sql, params=()):
+        with get_storage(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            return [_row_to_job(row) for row in cursor.execute(sql, params).fetchall()]
+
+    def _load_job(self, job_id):
+        jobs = self._query_jobs('SELECT * FROM prediction_jobs WHERE id = ?', (job_id,))
+        return jobs[0] if jobs else None
+
+    def _load_unfinished_jobs(self):
+        return self._query_jobs(
+            "SELECT * FROM prediction_jobs WHERE status NOT IN ('completed', 'failed', 'needs_review') ORDER BY created_at"
+        )
+
+
+def _row_to_job(row):
+    job = dict(row)
+    result_json = job.pop("result_json")
+    job["result"] = json.loads(result_json) if result_json else None
+    return job
+
+
+def public_job(job):
+    """Job fields exposed to API clients"""
+    stage = job["stage"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": stage,
+        "stages": JOB_STAGES,
+        "completed_stages": JOB_STAGES if job["status"] == "completed"
+        else JOB_STAGES[:JOB_STAGES.index(stage)] if stage in JOB_STAGES else [],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
@@ -0,0 +1,146 @@
+"""
+Versioned schema migrations for dashboard_stats.db.
+
+`init_db` used to rely on CREATE TABLE IF NOT EXISTS alone, which can create
+a table but never change one that exists, so the append-only tables
+(`recent_activities`, `analytics_events`, `real_time_consumption`) never got
+the indexes their hot queries need. Each schema change is now a numbered
+migration. migrate() applies, in order, the ones the database hasn't
+recorded in `schema_migrations`, inside the caller's transaction: a failed
+migration rolls back with everything else and is retried on the next start.
+
+Migration 1 is the schema as it was before migrations existed (databases
+created back then already have it, so it only creates what's missing).
+Tables owned by other modules (analytics sections, the prediction catalog,
+the report rollups) are still created by those modules.
+
+Migrations are never edited once released; a schema change is a new entry
+at the end of MIGRATIONS.
+"""
+
+
+def _base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_stats (
+            id INTEGER PRIMARY KEY,
+            total_predictions INTEGER DEFAULT 0,
+            approved_predictions INTEGER DEFAULT 0,
+            accuracy REAL DEFAULT 96,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            borough TEXT,
+            consumption_value REAL,
+            quality_metric TEXT,
+            quality_value REAL,
+            efficiency_score REAL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS real_time_consumption (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            borough TEXT NOT NULL,
+            consumption REAL NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_data_persistent (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_json TEXT NOT NULL,
+            source TEXT DEFAULT 'simulation',
+            has_real_data BOOLEAN DEFAULT FALSE,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recent_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            activity_type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            metadata JSON,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id TEXT DEFAULT 'system',
+            severity TEXT DEFAULT 'info'
+        )
+    ''')
+
+
+def _time_indexes(conn):
+    # Activity feed: newest first, read in index order instead of sorting the table
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recent_activities_time ON recent_activities (timestamp)')
+    # /analytics/real-time reads only these columns, so the index covers it
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_real_time_consumption_time
+        ON real_time_consumption (timestamp, borough, consumption)
+    ''')
+    # Per-type time ranges (report trends, rollup backfill), covering the per-borough values
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_analytics_events_type_time
+        ON analytics_events (event_type, timestamp, borough, consumption_value)
+    ''')
+
+
+def _retention_support(conn):
+    # Pruning walks analytics_events oldest first across every event type
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analytics_events_time ON analytics_events (timestamp)')
+    # What's left of real-time readings once they are past retention
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hourly_consumption_rollup (
+            hour TEXT NOT NULL,
+            borough TEXT NOT NULL,
+            readings INTEGER NOT NULL,
+            consumption_sum REAL NOT NULL,
+            consumption_min REAL,
+            consumption_max REAL,
+            PRIMARY KEY (hour, borough)
+        ) WITHOUT ROWID
+    ''')
+
+
+MIGRATIONS = [
+    (1, "base dashboard tables", _base_tables),
+    (2, "time indexes on the append-only tables", _time_indexes),
+    (3, "retention index and hourly consumption rollup", _retention_support),
+]
+
+
+def schema_version(conn):
+    """Highest migration applied to the database (0 if none)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """
+    Apply the migrations the database hasn't recorded yet
+
+    Args:
+        conn: Connection inside an open transaction
+        migrations: (version, name, function) entries in version order
+
+    Returns:
+        list: Versions applied
+    """
+    current = schema_version(conn)
+    applied = []
+    for version, name, apply in migrations:
+        if version <= current:
+            continue
+        apply(conn)
+        conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+        applied.append(version)
+        print(f"🗄️ Applied schema migration {version}: {name}")
+    return applied
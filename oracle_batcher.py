@@ -0,0 +1,197 @@
+"""
+Batched on-chain submission of predictions.
+
+Predictions waiting for the oracle are collected for a short window (or until
+a batch fills up) and sent to the oracle worker as one submitBatch round: the
+worker signs them with consecutive nonces and broadcasts them together, so a
+burst of uploads pays for one round trip instead of one per prediction.
+Results are mapped back to each prediction ID. Items whose transaction is
+known not to have been accepted (the worker marks them retryable: nonce
+errors, connection refused) are resubmitted in a later round, up to
+max_retries times, as is a round that never reached the worker (it could
+not start, or the I/O pool was too busy to take the request). When a
+transaction may already have been sent (a timed-out round, a worker that
+exited mid-round, an UNCONFIRMED broadcast) the item fails instead: signing
+it again with a new nonce could put it on chain twice.
+
+Limits come from environment variables:
+
+    ORACLE_BATCH_WINDOW_MS  (default 200)
+    ORACLE_BATCH_MAX_SIZE   (default 10)
+    ORACLE_MAX_RETRIES      (default 2)
+"""
+
+import asyncio
+import os
+
+from executors import ExecutorSaturatedError, get_io_executor
+from oracle_client import NOT_SENT, OracleError, get_oracle_client
+
+
+class _PendingSubmission:
+    def __init__(self, prediction_id, ipfs_hash, confidence_score, future):
+        self.prediction_id = prediction_id
+        self.ipfs_hash = ipfs_hash
+        self.confidence_score = confidence_score
+        self.future = future
+        self.attempts = 0
+
+
+class SubmissionBatcher:
+    """Coalesces oracle submissions into batched worker rounds"""
+
+    def __init__(self, client_factory=get_oracle_client, window_ms=200, max_batch=10, max_retries=2,
+                 request_timeout=60.0, run_blocking=None):
+        """
+        Args:
+            client_factory: Returns the OracleWorkerClient to submit through
+            window_ms: How long to wait for more submissions before sending a batch
+            max_batch: Maximum submissions per round; a full batch is sent immediately
+            max_retries: Times a retryable failure is resubmitted before giving up
+            request_timeout: Seconds to wait for a round to complete
+            run_blocking: async callable(func, *args) running blocking calls off the event loop
+        """
+        self.client_factory = client_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.run_blocking = run_blocking or (lambda func, *args: get_io_executor().run(func, *args))
+        self._pending = []
+        self._timer = None
+        self._round_lock = None
+        self.batches = 0
+        self.submissions = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def submit(self, prediction_id, ipfs_hash, confidence_score):
+        """
+        Queue a prediction for the next oracle round and wait for its result
+
+        Returns:
+            dict: The worker's result for this prediction, plus its predictionId
+
+        Raises:
+            OracleError: If the submission failed for good
+            OracleTimeoutError: If its round timed out (not retried, the transaction may have been sent)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingSubmission(prediction_id, ipfs_hash, int(confidence_score), future))
+        self._schedule()
+        return await future
+
+    def _schedule(self):
+        if not self._pending:
+            return
+        if len(self._pending) >= self.max_batch:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = asyncio.ensure_future(self._flush_after(0))
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_after(self.window))
+
+    async def _flush_after(self, delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Send everything that is waiting, in rounds of at most max_batch"""
+        if self._round_lock is None:
+            self._round_lock = asyncio.Lock()
+        # One round at a time keeps each batch's nonce block contiguous
+        async with self._round_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._run_round(batch)
+
+    async def _run_round(self, batch):
+        self.batches += 1
+        for item in batch:
+            item.attempts += 1
+        params = {"submissions": [{"ipfsHash": item.ipfs_hash, "confidenceScore": item.confidence_score}
+                                  for item in batch]}
+        print(f"⛓️ Submitting oracle batch of {len(batch)} predictions")
+
+        try:
+            client = self.client_factory()
+        except Exception as e:
+            for item in batch:
+                self._retry_or_fail(item, OracleError(str(e), NOT_SENT), retryable=True)
+            return
+        try:
+            response = await self.run_blocking(client.request, "submitBatch", params, self.request_timeout)
+            results = response["results"]
+        except ExecutorSaturatedError as e:
+            # Rejected before the request was handed to the worker
+            for item in batch:
+                self._retry_or_fail(item, OracleError(str(e), NOT_SENT), retryable=True)
+            return
+        except Exception as e:
+            error = e if isinstance(e, OracleError) else OracleError(str(e))
+            # Only a batch that never reached the worker is safe to send again; once it
+            # did (timeout, worker exited mid-round) its transactions may be on chain
+            for item in batch:
+                self._retry_or_fail(item, error, retryable=error.code == NOT_SENT)
+            return
+
+        for item, outcome in zip(batch, results):
+            if outcome.get("ok"):
+                self.submissions += 1
+                result = dict(outcome["result"], predictionId=item.prediction_id)
+                if not item.future.done():
+                    item.future.set_result(result)
+            else:
+                error_info = outcome.get("error") or {}
+                error = OracleError(error_info.get("message", "Oracle submission failed"), error_info.get("code"))
+                self._retry_or_fail(item, error, retryable=error_info.get("retryable", False))
+
+    def _retry_or_fail(self, item, error, retryable):
+        if retryable and item.attempts <= self.max_retries and not item.future.done():
+            self.retries += 1
+            print(f"🔁 Retrying oracle submission for prediction {item.prediction_id} "
+                  f"(attempt {item.attempts + 1}): {error}")
+            self._pending.append(item)
+            self._schedule()
+        else:
+            self._fail(item, error)
+
+    def _fail(self, item, error):
+        self.failures += 1
+        if not item.future.done():
+            item.future.set_exception(error)
+
+    def stats(self):
+        """Round and retry counters"""
+        return {
+            "window_ms": int(self.window * 1000),
+            "max_batch": self.max_batch,
+            "max_retries": self.max_retries,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "submitted": self.submissions,
+            "retries": self.retries,
+            "failures": self.failures,
+            "avg_batch_size": round((self.submissions + self.failures) / self.batches, 2) if self.batches else 0.0
+        }
+
+    async def close(self):
+        """Send anything still waiting"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+
+def create_submission_batcher():
+    """Batcher configured from the environment"""
+    return SubmissionBatcher(
+        window_ms=max(0, int(os.environ.get("ORACLE_BATCH_WINDOW_MS", 200))),
+        max_batch=max(1, int(os.environ.get("ORACLE_BATCH_MAX_SIZE", 10))),
+        max_retries=max(0, int(os.environ.get("ORACLE_MAX_RETRIES", 2)))
+    )
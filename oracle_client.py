@@ -0,0 +1,209 @@
+"""
+Python client for the long-lived Node oracle worker (oracle_worker.js).
+
+The worker process is started on first use and kept running, so the RPC
+connection and wallet stay warm between predictions. Requests and responses
+are line-delimited JSON matched by request ID, which lets several threads
+submit at once. If the worker dies it is restarted on the next request.
+"""
+
+import itertools
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class OracleError(RuntimeError):
+    """The oracle worker rejected or failed a request"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class OracleTimeoutError(OracleError):
+    """The oracle worker did not answer in time"""
+
+
+# Code of errors raised before a request reached the worker (safe to send again)
+NOT_SENT = "NOT_SENT"
+
+
+class OracleWorkerClient:
+    """Thread-safe client for a persistent oracle_worker.js process"""
+
+    def __init__(self, script="oracle_worker.js", node="node", cwd=None, env=None,
+                 startup_timeout=60.0, request_timeout=60.0):
+        """
+        Args:
+            script: Path of the worker script
+            node: Node.js executable
+            cwd: Working directory for the worker (where its .env and node_modules are found)
+            env: Extra environment variables for the worker
+            startup_timeout: Seconds to wait for the worker's ready message
+            request_timeout: Default seconds to wait for each response
+        """
+        self.script = script
+        self.node = node
+        self.cwd = cwd
+        self.env = env
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.ready_info = None
+        self._process = None
+        self._pending = {}
+        self._ready = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _start(self):
+        env = os.environ.copy()
+        if self.env:
+            env.update(self.env)
+        self._ready = Future()
+        self._process = subprocess.Popen(
+            [self.node, self.script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,  # worker logs go straight to our stderr
+            cwd=self.cwd,
+            env=env,
+            text=True,
+            bufsize=1
+        )
+        threading.Thread(target=self._read_responses, args=(self._process, self._ready),
+                         name="oracle-worker-reader", daemon=True).start()
+        try:
+            self.ready_info = self._ready.result(timeout=self.startup_timeout)
+        except FutureTimeoutError:
+            self._stop_process()
+            raise OracleTimeoutError(f"Oracle worker did not start within {self.startup_timeout}s")
+        except OracleError:
+            self._stop_process()
+            raise
+        print(f"✅ Oracle worker ready (rpc: {self.ready_info.get('rpcUrl')}, simulated: {self.ready_info.get('simulated')})")
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+            return self._process
+
+    def _read_responses(self, process, ready):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Ignoring non-JSON output from oracle worker: {line.strip()}")
+                continue
+
+            event = message.get("event")
+            if event == "ready":
+                ready.set_result(message)
+                continue
+            if event == "error":
+                if not ready.done():
+                    ready.set_exception(OracleError(message.get("message", "Oracle worker failed to start")))
+                continue
+
+            future = self._pending.pop(message.get("id"), None)
+            if future is None:
+                continue
+            if message.get("ok"):
+                future.set_result(message.get("result"))
+            else:
+                error = message.get("error") or {}
+                future.set_exception(OracleError(error.get("message", "Oracle request failed"), error.get("code")))
+
+        # The worker exited: fail everything still waiting on it
+        error = OracleError(f"Oracle worker exited with code {process.wait()}")
+        if not ready.done():
+            ready.set_exception(error)
+        with self._lock:
+            if self._process in (process, None):
+                for request_id in list(self._pending):
+                    self._pending.pop(request_id).set_exception(error)
+
+    def request(self, method, params=None, timeout=None):
+        """
+        Send one request to the worker and wait for its result
+
+        Raises:
+            OracleError: If the worker reports an error or exits (code NOT_SENT if
+                the request never reached it)
+            OracleTimeoutError: If no response arrives within the timeout
+        """
+        try:
+            process = self._ensure_running()
+        except OracleError as e:
+            raise OracleError(f"Oracle worker could not start: {e}", NOT_SENT)
+        request_id = next(self._ids)
+        future = Future()
+        self._pending[request_id] = future
+        try:
+            with self._write_lock:
+                process.stdin.write(json.dumps({"id": request_id, "method": method, "params": params or {}}) + "\n")
+                process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._pending.pop(request_id, None)
+            raise OracleError(f"Oracle worker is not accepting requests: {e}", NOT_SENT)
+
+        timeout = self.request_timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._pending.pop(request_id, None)
+            raise OracleTimeoutError(f"Oracle {method} timed out after {timeout} seconds")
+
+    def submit(self, ipfs_hash, confidence_score, timeout=None):
+        """
+        Submit a prediction to the AIPredictionMultisig contract
+
+        Returns:
+            dict: Structured result with txHash, nonce and rpcUrl (txHash is None when simulated)
+        """
+        return self.request("submit", {"ipfsHash": ipfs_hash, "confidenceScore": int(confidence_score)}, timeout)
+
+    def status(self):
+        """Worker connection and nonce state"""
+        return self.request("status", timeout=10)
+
+    def _stop_process(self):
+        process = self._process
+        self._process = None
+        if process is not None and process.poll() is None:
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def close(self):
+        """Stop the worker process"""
+        with self._lock:
+            self._stop_process()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_oracle_client():
+    """Shared oracle worker client for the process"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OracleWorkerClient()
+        return _client
+
+
+def close_oracle_client():
+    """Stop the shared oracle worker if it was started"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,489 @@
+#!/usr/bin/env node
+
+/**
+ * Long-lived Oracle Worker for the AIPredictionMultisig Contract
+ *
+ * Unlike oracle_submit.js, which starts a new Node process for every prediction,
+ * this worker is started once by the backend and kept running. It connects to the
+ * RPC (with failover) and derives the wallet once, then serves submissions over a
+ * line-delimited JSON protocol on stdin/stdout.
+ *
+ * Protocol (one JSON object per line):
+ *   request:  {"id": 1, "method": "submit", "params": {"ipfsHash": "Qm...", "confidenceScore": 87}}
+ *   response: {"id": 1, "ok": true, "result": {"txHash": "0x...", "nonce": 12, ...}}
+ *             {"id": 1, "ok": false, "error": {"message": "...", "code": "..."}}
+ *   methods:  submit, submitBatch, status, ping
+ *   submitBatch takes {"submissions": [{"ipfsHash": ..., "confidenceScore": ...}, ...]} and
+ *   returns {"results": [{"ok": true, "result": {...}} | {"ok": false, "error": {...}}, ...]}
+ *
+ * When ready the worker writes {"event": "ready", ...}. Logs go to stderr, so
+ * stdout only ever carries protocol messages.
+ *
+ * Transactions are signed locally and sent with eth_sendRawTransaction. Nonces are
+ * assigned from a local counter, so several submissions can be in flight at once
+ * without waiting for each other; the counter is re-synced from the chain after a
+ * nonce error.
+ *
+ * A submission is only signed again (with a new nonce) when its transaction is known
+ * not to have been accepted: the node rejected it, or the connection was refused.
+ * When the outcome is unknown (the broadcast timed out or the connection dropped
+ * after sending) the worker looks the transaction up by hash; if the node doesn't
+ * know it either, the item fails with code UNCONFIRMED and is not retryable, since
+ * the transaction may still be mined and a second one would duplicate it.
+ *
+ * Environment Variables:
+ * - SMART_CONTRACT_ADDRESS: The deployed contract address (required)
+ * - ORACLE_PRIVATE_KEY: Private key for oracle wallet (without it submissions are simulated)
+ * - ORACLE_ADDRESS: Expected oracle address for verification
+ * - RPC_URL: Secondary RPC endpoint (as in oracle_submit.js)
+ * - ORACLE_RPC_URLS: Comma-separated RPC endpoints replacing the default list (e.g. a local stand-in node)
+ * - ORACLE_CHAIN_ID: Chain ID (default 97, BSC Testnet)
+ * - ORACLE_BROADCAST_TIMEOUT_MS: How long to wait for eth_sendRawTransaction (default 20000)
+ *
+ * @requires ethers ^5.0.0
+ * @requires dotenv
+ */
+
+require('dotenv').config();
+const readline = require('readline');
+const ethers = require('ethers');
+
+const contractABI = [
+    "function submitPrediction(string memory _ipfsHash, uint8 _confidenceScore) external returns (uint256)"
+];
+const contractInterface = new ethers.utils.Interface(contractABI);
+
+const CONTRACT_ADDRESS = process.env.SMART_CONTRACT_ADDRESS;
+const PRIVATE_KEY = process.env.ORACLE_PRIVATE_KEY;
+const ORACLE_ADDRESS = process.env.ORACLE_ADDRESS;
+const CHAIN_ID = parseInt(process.env.ORACLE_CHAIN_ID || '97');
+
+const RPC_URLS = process.env.ORACLE_RPC_URLS
+    ? process.env.ORACLE_RPC_URLS.split(',').map(url => url.trim()).filter(Boolean)
+    : [
+        "https://bsc-testnet.publicnode.com",
+        process.env.RPC_URL || "https://data-seed-prebsc-1-s1.binance.org:8545/",
+        "https://endpoints.omniatech.io/v1/bsc/testnet/public",
+        "https://data-seed-prebsc-1-s1.bnbchain.org:8545",
+        "https://bsc-testnet.nodereal.io/v1/e9a36765eb8a40b9bd12e680a1fd2bc5",
+        "https://bsctestapi.terminet.io/rpc",
+        "https://bsc-testnet-rpc.publicnode.com"
+    ];
+
+const GAS_LIMIT = 300000;
+// Gas price is refreshed at most this often instead of once per transaction
+const GAS_PRICE_TTL_MS = 30000;
+const RPC_TIMEOUT_MS = 10000;
+const BROADCAST_TIMEOUT_MS = parseInt(process.env.ORACLE_BROADCAST_TIMEOUT_MS || '20000');
+
+const state = {
+    provider: null,
+    rpcUrl: null,
+    wallet: null,
+    nextNonce: null,
+    nonceSync: null,
+    gasPrice: null,
+    gasPriceAt: 0,
+    submitted: 0,
+    failed: 0
+};
+
+function log(message) {
+    process.stderr.write(`[oracle-worker] ${message}\n`);
+}
+
+function send(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+function withTimeout(promise, ms, label) {
+    return Promise.race([
+        promise,
+        new Promise((_, reject) => setTimeout(() => reject(new Error(`${label} timeout`)), ms))
+    ]);
+}
+
+/**
+ * Connect to the first RPC endpoint that answers, trying the first three in parallel
+ * and the rest one by one, like oracle_submit.js
+ */
+async function connect(excludeUrl = null) {
+    const urls = RPC_URLS.filter(url => url !== excludeUrl);
+    const tryUrl = async (url) => {
+        // Static provider: the network is fixed, so ethers doesn't re-detect it on every call
+        const provider = new ethers.providers.StaticJsonRpcProvider(url, { chainId: CHAIN_ID, name: 'oracle-network' });
+        await withTimeout(provider.getBlockNumber(), RPC_TIMEOUT_MS, 'Connection');
+        return { provider, url };
+    };
+
+    const parallel = await Promise.allSettled(urls.slice(0, 3).map(tryUrl));
+    let connection = null;
+    for (const result of parallel) {
+        if (result.status === 'fulfilled') {
+            connection = result.value;
+            break;
+        }
+    }
+    for (const url of urls.slice(3)) {
+        if (connection) break;
+        try {
+            connection = await tryUrl(url);
+        } catch (error) {
+            log(`Failed to connect to ${url.substring(0, 40)}...: ${error.message}`);
+        }
+    }
+    if (!connection) {
+        throw new Error('Could not connect to any RPC endpoint');
+    }
+
+    state.provider = connection.provider;
+    state.rpcUrl = connection.url;
+    state.wallet = new ethers.Wallet(PRIVATE_KEY, state.provider);
+    log(`Connected to ${state.rpcUrl} as ${state.wallet.address}`);
+}
+
+async function syncNonce() {
+    // Concurrent callers share one in-flight sync
+    if (!state.nonceSync) {
+        state.nonceSync = withTimeout(
+            state.provider.getTransactionCount(state.wallet.address, 'pending'), RPC_TIMEOUT_MS, 'Nonce sync'
+        ).then(nonce => {
+            state.nextNonce = nonce;
+            log(`Nonce synced: ${nonce}`);
+        }).finally(() => {
+            state.nonceSync = null;
+        });
+    }
+    return state.nonceSync;
+}
+
+async function getGasPrice() {
+    const now = Date.now();
+    if (state.gasPrice && now - state.gasPriceAt < GAS_PRICE_TTL_MS) {
+        return state.gasPrice;
+    }
+    try {
+        const gasPrice = await withTimeout(state.provider.getGasPrice(), 5000, 'Gas price');
+        // Add 20% premium to gas price for faster transaction processing
+        state.gasPrice = gasPrice.mul(120).div(100);
+    } catch (error) {
+        log('Using fallback gas price due to timeout');
+        state.gasPrice = state.gasPrice || ethers.utils.parseUnits('10', 'gwei');
+    }
+    state.gasPriceAt = now;
+    return state.gasPrice;
+}
+
+function isNonceError(error) {
+    const message = (error.message || '').toLowerCase();
+    return message.includes('nonce') || message.includes('replacement transaction underpriced');
+}
+
+function isNetworkError(error) {
+    const message = (error.message || '').toLowerCase();
+    return error.code === 'NETWORK_ERROR' || error.code === 'SERVER_ERROR' || message.includes('timeout')
+        || message.includes('econnrefused') || message.includes('missing response');
+}
+
+/**
+ * Whether a failed broadcast certainly left the transaction unaccepted, so signing
+ * the submission again can't put it on chain twice
+ */
+function isRejectedBroadcast(error) {
+    // The node answered with a JSON-RPC error (ethers keeps it as error.error)
+    if (error.error && typeof error.error.code === 'number') {
+        return true;
+    }
+    // The request never reached a node
+    const serverError = error.serverError || {};
+    const text = `${error.message || ''} ${serverError.code || ''} ${serverError.message || ''}`.toLowerCase();
+    return text.includes('econnrefused') || text.includes('enotfound');
+}
+
+async function findTransaction(txHash) {
+    try {
+        return await withTimeout(state.provider.send('eth_getTransactionByHash', [txHash]), RPC_TIMEOUT_MS, 'Transaction lookup');
+    } catch (error) {
+        log(`Could not look up ${txHash}: ${error.message}`);
+        return null;
+    }
+}
+
+function unconfirmedError(error, txHash, nonce) {
+    return Object.assign(
+        new Error(`Transaction ${txHash} (nonce ${nonce}) may have been sent: ${error.message}`),
+        { code: 'UNCONFIRMED', txHash, nonce }
+    );
+}
+
+function validateSubmission(params) {
+    const ipfsHash = params && params.ipfsHash;
+    const confidenceScore = params && Number(params.confidenceScore);
+    if (!ipfsHash || typeof ipfsHash !== 'string') {
+        throw Object.assign(new Error('IPFS hash is required'), { code: 'INVALID_PARAMS' });
+    }
+    if (!Number.isInteger(confidenceScore) || confidenceScore < 0 || confidenceScore > 100) {
+        throw Object.assign(new Error('Confidence score must be a number between 0 and 100'), { code: 'INVALID_PARAMS' });
+    }
+    return { ipfsHash, confidenceScore };
+}
+
+async function signSubmission(submission, nonce, gasPrice) {
+    const signedTx = await state.wallet.signTransaction({
+        to: CONTRACT_ADDRESS,
+        data: contractInterface.encodeFunctionData('submitPrediction', [submission.ipfsHash, submission.confidenceScore]),
+        nonce,
+        gasLimit: GAS_LIMIT,
+        gasPrice,
+        chainId: CHAIN_ID
+    });
+    // The hash is known before broadcasting, so it doesn't depend on the RPC's reply
+    return { signedTx, txHash: ethers.utils.keccak256(signedTx) };
+}
+
+async function broadcast(signedTx, txHash) {
+    const returnedHash = await withTimeout(
+        state.provider.send('eth_sendRawTransaction', [signedTx]), BROADCAST_TIMEOUT_MS, 'Transaction submission'
+    );
+    if (returnedHash && returnedHash.toLowerCase() !== txHash.toLowerCase()) {
+        log(`RPC returned hash ${returnedHash} for transaction ${txHash}`);
+    }
+}
+
+function submissionResult(submission, txHash, nonce) {
+    return {
+        simulated: false,
+        txHash,
+        nonce,
+        ipfsHash: submission.ipfsHash,
+        confidenceScore: submission.confidenceScore,
+        rpcUrl: state.rpcUrl,
+        explorerUrl: `https://testnet.bscscan.com/tx/${txHash}`
+    };
+}
+
+function simulatedResult(submission) {
+    log(`No private key configured. Simulating submission of ${submission.ipfsHash}`);
+    return { simulated: true, txHash: null, ipfsHash: submission.ipfsHash, confidenceScore: submission.confidenceScore };
+}
+
+/**
+ * Sign and broadcast one submitPrediction transaction
+ *
+ * The nonce is taken from the local counter before any await, so concurrent
+ * submissions get consecutive nonces in arrival order.
+ */
+async function submitPrediction(params, attempt = 0) {
+    const submission = validateSubmission(params);
+
+    if (!PRIVATE_KEY) {
+        return simulatedResult(submission);
+    }
+
+    if (state.nextNonce === null) {
+        await syncNonce();
+    }
+    const nonce = state.nextNonce++;
+    const gasPrice = await getGasPrice();
+    const { signedTx, txHash } = await signSubmission(submission, nonce, gasPrice);
+
+    try {
+        await broadcast(signedTx, txHash);
+    } catch (error) {
+        if (!isRejectedBroadcast(error)) {
+            // The transaction may be in a mempool: never sign this submission again
+            state.nextNonce = null;
+            if (await findTransaction(txHash)) {
+                log(`Broadcast of ${txHash} failed (${error.message}) but the node has it`);
+                return submissionResult(submission, txHash, nonce);
+            }
+            throw unconfirmedError(error, txHash, nonce);
+        }
+        if (attempt === 0 && isNonceError(error)) {
+            log(`Nonce ${nonce} rejected (${error.message}), re-syncing`);
+            await syncNonce();
+            return submitPrediction(params, attempt + 1);
+        }
+        if (attempt === 0 && isNetworkError(error)) {
+            log(`RPC ${state.rpcUrl} failed (${error.message}), failing over`);
+            await connect(state.rpcUrl);
+            await syncNonce();
+            return submitPrediction(params, attempt + 1);
+        }
+        // The nonce was never used; re-sync so the next submission doesn't leave a gap
+        state.nextNonce = null;
+        throw error;
+    }
+
+    log(`Transaction submitted: ${txHash} (nonce ${nonce})`);
+    return submissionResult(submission, txHash, nonce);
+}
+
+/**
+ * Submit several predictions in one round
+ *
+ * The batch gets a contiguous block of nonces and one gas price, all
+ * transactions are signed up front and then broadcast together. Each item
+ * gets its own result; failed items carry an error code and a `retryable`
+ * flag so the caller can resubmit them in a later round. Only items whose
+ * transaction was rejected are retryable; see isRejectedBroadcast.
+ */
+async function submitBatch(params) {
+    const items = (params && params.submissions) || [];
+    const results = new Array(items.length);
+    const valid = [];
+    items.forEach((item, index) => {
+        try {
+            valid.push({ index, submission: validateSubmission(item) });
+        } catch (error) {
+            results[index] = { ok: false, error: { message: error.message, code: error.code, retryable: false } };
+        }
+    });
+
+    if (!PRIVATE_KEY) {
+        for (const { index, submission } of valid) {
+            results[index] = { ok: true, result: simulatedResult(submission) };
+        }
+        return { results };
+    }
+
+    if (valid.length) {
+        if (state.nextNonce === null) {
+            await syncNonce();
+        }
+        const firstNonce = state.nextNonce;
+        state.nextNonce += valid.length;
+        const gasPrice = await getGasPrice();
+        const signed = await Promise.all(valid.map(({ submission }, offset) =>
+            signSubmission(submission, firstNonce + offset, gasPrice)
+        ));
+
+        const sent = await Promise.allSettled(signed.map(({ signedTx, txHash }) => broadcast(signedTx, txHash)));
+        let resync = false;
+        let failover = false;
+        for (const [offset, outcome] of sent.entries()) {
+            const { index, submission } = valid[offset];
+            const { txHash } = signed[offset];
+            const nonce = firstNonce + offset;
+            if (outcome.status === 'fulfilled') {
+                results[index] = { ok: true, result: submissionResult(submission, txHash, nonce) };
+                continue;
+            }
+            const error = outcome.reason;
+            resync = true;
+            failover = failover || isNetworkError(error);
+            if (!isRejectedBroadcast(error)) {
+                if (await findTransaction(txHash)) {
+                    log(`Broadcast of ${txHash} failed (${error.message}) but the node has it`);
+                    results[index] = { ok: true, result: submissionResult(submission, txHash, nonce) };
+                } else {
+                    const unconfirmed = unconfirmedError(error, txHash, nonce);
+                    results[index] = {
+                        ok: false,
+                        error: { message: unconfirmed.message, code: unconfirmed.code, txHash, nonce, retryable: false }
+                    };
+                }
+                continue;
+            }
+            const nonceError = isNonceError(error);
+            const networkError = isNetworkError(error);
+            results[index] = {
+                ok: false,
+                error: {
+                    message: error.message,
+                    code: nonceError ? 'NONCE' : networkError ? 'NETWORK' : (error.code || 'SUBMIT_FAILED'),
+                    retryable: nonceError || networkError
+                }
+            };
+        }
+        log(`Batch of ${valid.length} submitted from nonce ${firstNonce}`);
+
+        if (failover) {
+            log(`RPC ${state.rpcUrl} failed during batch, failing over`);
+            try {
+                await connect(state.rpcUrl);
+            } catch (error) {
+                log(`Failover failed: ${error.message}`);
+            }
+        }
+        if (resync) {
+            // Unused nonces are picked up again by the next round
+            state.nextNonce = null;
+        }
+    }
+    return { results };
+}
+
+const handlers = {
+    ping: async () => ({ pong: true }),
+    status: async () => ({
+        rpcUrl: state.rpcUrl,
+        address: state.wallet ? state.wallet.address : null,
+        nextNonce: state.nextNonce,
+        submitted: state.submitted,
+        failed: state.failed,
+        simulated: !PRIVATE_KEY
+    }),
+    submit: async (params) => submitPrediction(params),
+    submitBatch: async (params) => submitBatch(params)
+};
+
+async function handleLine(line) {
+    if (!line.trim()) return;
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (error) {
+        send({ id: null, ok: false, error: { message: `Invalid JSON: ${error.message}`, code: 'PARSE_ERROR' } });
+        return;
+    }
+
+    const handler = handlers[request.method];
+    if (!handler) {
+        send({ id: request.id, ok: false, error: { message: `Unknown method: ${request.method}`, code: 'UNKNOWN_METHOD' } });
+        return;
+    }
+    try {
+        const result = await handler(request.params || {});
+        if (request.method === 'submit') state.submitted++;
+        if (request.method === 'submitBatch') {
+            for (const item of result.results) {
+                if (item.ok) state.submitted++; else state.failed++;
+            }
+        }
+        send({ id: request.id, ok: true, result });
+    } catch (error) {
+        if (request.method === 'submit') state.failed++;
+        log(`ERROR: ${request.method} failed: ${error.message}`);
+        send({ id: request.id, ok: false, error: { message: error.message, code: error.code || 'SUBMIT_FAILED' } });
+    }
+}
+
+async function main() {
+    if (!CONTRACT_ADDRESS) {
+        send({ event: 'error', message: 'SMART_CONTRACT_ADDRESS environment variable is required' });
+        process.exit(1);
+    }
+
+    if (PRIVATE_KEY) {
+        await connect();
+        if (ORACLE_ADDRESS && state.wallet.address.toLowerCase() !== ORACLE_ADDRESS.toLowerCase()) {
+            log(`WARNING: Wallet address ${state.wallet.address} does not match ORACLE_ADDRESS ${ORACLE_ADDRESS}`);
+        }
+        await syncNonce();
+    } else {
+        log('No private key found in environment variables. Submissions will be simulated.');
+    }
+
+    const input = readline.createInterface({ input: process.stdin });
+    // Requests are handled concurrently; responses carry the request id
+    input.on('line', line => { handleLine(line); });
+    input.on('close', () => process.exit(0));
+
+    send({ event: 'ready', address: state.wallet ? state.wallet.address : null, rpcUrl: state.rpcUrl, simulated: !PRIVATE_KEY });
+}
+
+main().catch(error => {
+    send({ event: 'error', message: error.message });
+    process.exit(1);
+});
@@ -0,0 +1,284 @@
+"""
+Indexed catalog of prediction output files.
+
+Looking a prediction up used to mean listing `outputs/` and parsing every
+`prediction_*.json` until one matched; listing recent predictions and the
+reports re-parsed files on every request. The catalog keeps one row per
+prediction file in the `prediction_catalog` table: its ID, IPFS hash,
+timestamp, confidence, total consumption, boroughs and file path. Indexes
+on the ID, the hash and the filename make lookups O(log n), so the JSON
+file is only opened when its full content is asked for.
+
+Listing is keyset-paginated: predictions come newest first by (timestamp,
+filename), and a page's cursor is the key of its last row, so every page
+is one index range read no matter how deep it is. A date range is part of
+that same range read; a borough filter reads the `prediction_boroughs`
+index table instead, which is keyed (borough, timestamp, filename).
+
+The pipeline adds a row as soon as `run_prediction` has written the file
+and records the IPFS hash once the upload is done. sync() indexes files that
+are on disk but not in the catalog (files written before the catalog
+existed, or by another tool) and drops rows whose file is gone; only the
+new files are parsed.
+"""
+
+import base64
+import json
+import os
+from datetime import datetime
+
+CATALOG_COLUMNS = ("filename", "prediction_id", "ipfs_hash", "timestamp", "confidence_score",
+                   "total_consumption", "number_of_boroughs", "boroughs", "file_path", "file_size", "created_at")
+
+
+def create_catalog_table(conn):
+    """Create the prediction_catalog table and its lookup indexes"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_catalog (
+            filename TEXT PRIMARY KEY,
+            prediction_id TEXT,
+            ipfs_hash TEXT,
+            timestamp TEXT,
+            confidence_score REAL,
+            total_consumption REAL,
+            number_of_boroughs INTEGER,
+            boroughs TEXT,
+            file_path TEXT NOT NULL,
+            file_size INTEGER,
+            created_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_prediction_catalog_id ON prediction_catalog (prediction_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_prediction_catalog_ipfs ON prediction_catalog (ipfs_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_prediction_catalog_time ON prediction_catalog (timestamp, filename)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_boroughs (
+            borough TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            PRIMARY KEY (borough, timestamp, filename)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_prediction_boroughs_file ON prediction_boroughs (filename)')
+
+    # Rows cataloged before pagination existed: give them a sort key and fill the borough index
+    conn.execute('UPDATE prediction_catalog SET timestamp = created_at WHERE timestamp IS NULL')
+    if not conn.execute('SELECT 1 FROM prediction_boroughs LIMIT 1').fetchone():
+        conn.execute('''
+            INSERT OR IGNORE INTO prediction_boroughs (borough, timestamp, filename)
+            SELECT UPPER(borough.value), catalog.timestamp, catalog.filename
+            FROM prediction_catalog AS catalog, json_each(catalog.boroughs) AS borough
+        ''')
+
+
+def encode_cursor(timestamp, filename):
+    """Opaque pagination cursor for the row with this sort key"""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, filename]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Sort key of a pagination cursor
+
+    Raises:
+        ValueError: If the cursor wasn't produced by encode_cursor
+    """
+    try:
+        timestamp, filename = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(timestamp, str) or not isinstance(filename, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return timestamp, filename
+
+
+def is_prediction_file(filename):
+    return filename.startswith('prediction_') and filename.endswith('.json')
+
+
+def summarize_prediction(file_path, data, ipfs_hash=None):
+    """
+    Catalog row for a prediction file
+
+    Args:
+        file_path: Path of the prediction JSON file
+        data: Its parsed content
+        ipfs_hash: IPFS hash of the upload, if known (otherwise taken from the file's metadata)
+
+    Returns:
+        dict: Values for CATALOG_COLUMNS
+    """
+    metadata = data.get('metadata') or {}
+    boroughs = list((data.get('predicted_allocation') or {}).keys())
+    created_at = datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
+    return {
+        "filename": os.path.basename(file_path),
+        "prediction_id": data.get('prediction_id'),
+        "ipfs_hash": ipfs_hash or metadata.get('ipfs_hash'),
+        # Files without a timestamp sort by when they were written
+        "timestamp": data.get('timestamp') or created_at,
+        "confidence_score": data.get('confidence_score'),
+        "total_consumption": metadata.get('total_consumption_hcf'),
+        "number_of_boroughs": metadata.get('number_of_boroughs'),
+        "boroughs": json.dumps(boroughs),
+        "file_path": os.path.abspath(file_path),
+        "file_size": os.path.getsize(file_path),
+        "created_at": created_at
+    }
+
+
+class PredictionCatalog:
+    """Reads and maintains the prediction_catalog table"""
+
+    def __init__(self, pool, outputs_dir="outputs"):
+        """
+        Args:
+            pool: ConnectionPool for the dashboard database
+            outputs_dir: Directory run_prediction writes prediction files to
+        """
+        self.pool = pool
+        self.outputs_dir = outputs_dir
+
+    def add(self, file_path, data=None, ipfs_hash=None):
+        """
+        Catalog a prediction file (replacing an existing row for the same filename)
+
+        Args:
+            file_path: Path of the prediction JSON file
+            data: Its parsed content, if already loaded
+            ipfs_hash: IPFS hash of the upload, if known
+
+        Returns:
+            dict: The catalog row
+        """
+        if data is None:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+        row = summarize_prediction(file_path, data, ipfs_hash)
+        with self.pool.transaction() as conn:
+            conn.execute(
+                f'INSERT OR REPLACE INTO prediction_catalog ({", ".join(CATALOG_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(CATALOG_COLUMNS))})',
+                tuple(row[column] for column in CATALOG_COLUMNS)
+            )
+            conn.execute('DELETE FROM prediction_boroughs WHERE filename = ?', (row["filename"],))
+            conn.executemany(
+                'INSERT OR IGNORE INTO prediction_boroughs (borough, timestamp, filename) VALUES (?, ?, ?)',
+                [(borough.upper(), row["timestamp"], row["filename"]) for borough in json.loads(row["boroughs"])]
+            )
+        return row
+
+    def set_ipfs_hash(self, file_path, ipfs_hash):
+        """Record the IPFS hash a prediction file was uploaded under"""
+        self.pool.execute('UPDATE prediction_catalog SET ipfs_hash = ? WHERE filename = ?',
+                          (ipfs_hash, os.path.basename(file_path)))
+
+    def find(self, key):
+        """
+        Look a prediction up by prediction ID, IPFS hash or filename
+
+        Returns:
+            dict: The catalog row, or None
+        """
+        row = self.pool.fetchone(f'''
+            SELECT {", ".join(CATALOG_COLUMNS)} FROM prediction_catalog
+            WHERE prediction_id = ? OR ipfs_hash = ? OR filename = ?
+            LIMIT 1
+        ''', (key, key, key))
+        return self._row(row) if row else None
+
+    def recent(self, limit=20):
+        """The most recent predictions, newest first"""
+        return self.page(limit)[0]
+
+    def page(self, limit=20, cursor=None, start=None, end=None, min_confidence=None, borough=None):
+        """
+        One page of predictions, newest first
+
+        Args:
+            limit: Page size
+            cursor: next_cursor of the previous page, to continue after it
+            start: Only predictions with timestamp >= start (ISO string)
+            end: Only predictions with timestamp < end (ISO string)
+            min_confidence: Only predictions with at least this confidence score
+            borough: Only predictions with an allocation for this borough
+
+        Returns:
+            tuple: (list of catalog rows, cursor for the next page or None if this is the last)
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        # Rows are ordered by the (timestamp, filename) key of whichever index drives the query
+        if borough:
+            source = 'prediction_boroughs AS keys JOIN prediction_catalog AS catalog ON catalog.filename = keys.filename'
+            key = 'keys'
+            conditions, params = ['keys.borough = ?'], [borough.upper()]
+        else:
+            source = 'prediction_catalog AS catalog'
+            key = 'catalog'
+            conditions, params = [], []
+        if start:
+            conditions.append(f'{key}.timestamp >= ?')
+            params.append(start)
+        if end:
+            conditions.append(f'{key}.timestamp < ?')
+            params.append(end)
+        if cursor:
+            conditions.append(f'({key}.timestamp, {key}.filename) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+        if min_confidence is not None:
+            conditions.append('catalog.confidence_score >= ?')
+            params.append(min_confidence)
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        rows = self.pool.fetchall(f'''
+            SELECT {", ".join(f"catalog.{column}" for column in CATALOG_COLUMNS)} FROM {source}
+            {where}
+            ORDER BY {key}.timestamp DESC, {key}.filename DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
+
+        entries = [self._row(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(entries[-1]["timestamp"], entries[-1]["filename"])
+        return entries, next_cursor
+
+    def count(self):
+        return self.pool.fetchone('SELECT COUNT(*) FROM prediction_catalog')[0]
+
+    def sync(self):
+        """
+        Bring the catalog in line with the outputs directory, parsing only files not yet cataloged
+
+        Returns:
+            tuple: (files added, rows removed)
+        """
+        on_disk = set()
+        if os.path.isdir(self.outputs_dir):
+            on_disk = {filename for filename in os.listdir(self.outputs_dir) if is_prediction_file(filename)}
+        cataloged = {row[0] for row in self.pool.fetchall('SELECT filename FROM prediction_catalog')}
+
+        added = 0
+        for filename in sorted(on_disk - cataloged):
+            try:
+                self.add(os.path.join(self.outputs_dir, filename))
+                added += 1
+            except Exception as e:
+                print(f"⚠️ Could not catalog prediction file {filename}: {e}")
+
+        missing = sorted(cataloged - on_disk)
+        if missing:
+            with self.pool.transaction() as conn:
+                conn.executemany('DELETE FROM prediction_catalog WHERE filename = ?', [(name,) for name in missing])
+                conn.executemany('DELETE FROM prediction_boroughs WHERE filename = ?', [(name,) for name in missing])
+        if added or missing:
+            print(f"🗂️ Prediction catalog synced: {added} files added, {len(missing)} removed")
+        return added, len(missing)
+
+    @staticmethod
+    def _row(row):
+        entry = dict(zip(CATALOG_COLUMNS, row))
+        entry["boroughs"] = json.loads(entry["boroughs"]) if entry["boroughs"] else []
+        return entry
@@ -0,0 +1,209 @@
+"""
+Daily rollups behind the /reports endpoint.
+
+The report used to GROUP BY and COUNT(CASE ...) over every row of
+`recent_activities` and `analytics_events` in a 30-day window on each call.
+Now SQLite triggers keep two rollup tables current as rows are inserted,
+whichever process inserts them:
+
+- `daily_activity_rollup`: per day and activity type, the number of
+  activities and the latest one's timestamp
+- `daily_event_rollup`: per day, event type and borough ('' when none), the
+  number of events and the sum/count of their consumption values, so
+  averages can be combined across days
+
+so a 30-day report reads at most 30 rows per activity type or borough
+through the rollups' primary keys. The same triggers (and inserts into or
+deletes from `prediction_catalog`) bump a single `report_version` counter,
+which ReportEngine uses to serve a cached report until something it is
+built from has changed.
+
+The rollups are history: deleting raw rows (e.g. pruning old events) does
+not take them back out. Resetting the dashboard clears them with
+clear_rollups().
+"""
+
+import threading
+
+ROLLUP_TABLES = ("daily_activity_rollup", "daily_event_rollup")
+
+
+def create_rollup_tables(conn):
+    """Create the rollup tables and their triggers, backfilling from existing rows the first time"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_activity_rollup (
+            day TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            activities INTEGER NOT NULL DEFAULT 0,
+            last_activity TIMESTAMP,
+            PRIMARY KEY (day, activity_type)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_event_rollup (
+            day TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            borough TEXT NOT NULL DEFAULT '',
+            events INTEGER NOT NULL DEFAULT 0,
+            value_sum REAL NOT NULL DEFAULT 0,
+            value_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (event_type, day, borough)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO report_version (id, version) VALUES (1, 0)')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS rollup_recent_activities AFTER INSERT ON recent_activities
+        BEGIN
+            INSERT INTO daily_activity_rollup (day, activity_type, activities, last_activity)
+            VALUES (COALESCE(date(NEW.timestamp), date('now')), COALESCE(NEW.activity_type, ''), 1, NEW.timestamp)
+            ON CONFLICT (day, activity_type) DO UPDATE SET
+                activities = activities + 1,
+                last_activity = MAX(COALESCE(last_activity, ''), excluded.last_activity);
+            UPDATE report_version SET version = version + 1 WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS rollup_analytics_events AFTER INSERT ON analytics_events
+        BEGIN
+            INSERT INTO daily_event_rollup (day, event_type, borough, events, value_sum, value_count)
+            VALUES (COALESCE(date(NEW.timestamp), date('now')), COALESCE(NEW.event_type, ''), COALESCE(NEW.borough, ''), 1,
+                    COALESCE(NEW.consumption_value, 0), NEW.consumption_value IS NOT NULL)
+            ON CONFLICT (event_type, day, borough) DO UPDATE SET
+                events = events + 1,
+                value_sum = value_sum + excluded.value_sum,
+                value_count = value_count + excluded.value_count;
+            UPDATE report_version SET version = version + 1 WHERE id = 1;
+        END
+    ''')
+    for action in ("INSERT", "DELETE"):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS report_version_catalog_{action.lower()} AFTER {action} ON prediction_catalog
+            BEGIN
+                UPDATE report_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+    if conn.execute('SELECT version FROM report_version WHERE id = 1').fetchone()[0] == 0:
+        _backfill(conn)
+
+
+def _backfill(conn):
+    # Rows written before the triggers existed
+    conn.execute('''
+        INSERT OR IGNORE INTO daily_activity_rollup (day, activity_type, activities, last_activity)
+        SELECT COALESCE(date(timestamp), date('now')), COALESCE(activity_type, ''), COUNT(*), MAX(timestamp)
+        FROM recent_activities GROUP BY 1, 2
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO daily_event_rollup (day, event_type, borough, events, value_sum, value_count)
+        SELECT COALESCE(date(timestamp), date('now')), COALESCE(event_type, ''), COALESCE(borough, ''), COUNT(*),
+               COALESCE(SUM(consumption_value), 0), COUNT(consumption_value)
+        FROM analytics_events GROUP BY 1, 2, 3
+    ''')
+    conn.execute('UPDATE report_version SET version = 1 WHERE id = 1')
+
+
+def clear_rollups(conn):
+    """Empty the rollups (when the raw tables are cleared) and invalidate cached reports"""
+    for table in ROLLUP_TABLES:
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute('UPDATE report_version SET version = version + 1 WHERE id = 1')
+
+
+class ReportEngine:
+    """Reads report aggregates from the daily rollups and caches the assembled report by version"""
+
+    def __init__(self, pool, days=30):
+        """
+        Args:
+            pool: ConnectionPool for the dashboard database
+            days: Length of the report window in calendar days
+        """
+        self.pool = pool
+        self.days = days
+        self._lock = threading.Lock()
+        self._cached = None  # (key, report)
+        self.hits = 0
+        self.builds = 0
+
+    def window_start(self):
+        return f"-{self.days} days"
+
+    def version(self):
+        return self.pool.fetchone('SELECT version FROM report_version WHERE id = 1')[0]
+
+    def utilization(self, activity_summary):
+        """System utilization counts, derived from activity_summary()"""
+        counts = {entry["type"]: entry["count"] for entry in activity_summary}
+        return {
+            "total_activities": sum(counts.values()),
+            "predictions_generated": counts.get("prediction", 0),
+            "approvals_processed": counts.get("approval", 0),
+            "blockchain_transactions": counts.get("blockchain", 0)
+        }
+
+    def activity_summary(self):
+        """
+        Activities per type over the window
+
+        Returns:
+            list: {"type", "count", "last_activity"} per activity type
+        """
+        rows = self.pool.fetchall('''
+            SELECT activity_type, SUM(activities), MAX(last_activity)
+            FROM daily_activity_rollup
+            WHERE day >= date('now', ?)
+            GROUP BY activity_type
+        ''', (self.window_start(),))
+        return [{"type": row[0], "count": row[1], "last_activity": row[2]} for row in rows]
+
+    def borough_trends(self, event_type='consumption'):
+        """
+        Average consumption value and number of data points per borough over the window
+
+        Returns:
+            list: {"borough", "avg_consumption", "data_points"} per borough
+        """
+        rows = self.pool.fetchall('''
+            SELECT NULLIF(borough, ''), SUM(value_sum), SUM(value_count), SUM(events)
+            FROM daily_event_rollup
+            WHERE event_type = ? AND day >= date('now', ?)
+            GROUP BY borough
+        ''', (event_type, self.window_start()))
+        return [{
+            "borough": row[0],
+            "avg_consumption": round(row[1] / row[2], 2) if row[2] else 0,
+            "data_points": row[3]
+        } for row in rows]
+
+    def cache_key(self, *parts):
+        """
+        Key a report is cached under: the rollup version, today's date (the window
+        moves at midnight) and anything else it is built from that doesn't bump
+        the version, such as the prediction_stats row
+        """
+        # SQLite's date, so the key rolls over with the window's own notion of today
+        return (*self.pool.fetchone("SELECT version, date('now') FROM report_version WHERE id = 1"), *parts)
+
+    def cached(self, key):
+        """The report stored under `key`, or None if it was built from older data"""
+        with self._lock:
+            if self._cached is not None and self._cached[0] == key:
+                self.hits += 1
+                return self._cached[1]
+        return None
+
+    def store(self, key, report):
+        with self._lock:
+            self._cached = (key, report)
+            self.builds += 1
+
+    def stats(self):
+        return {"builds": self.builds, "cache_hits": self.hits, "window_days": self.days}
@@ -0,0 +1,220 @@
+"""
+Retention for the append-only dashboard tables.
+
+`analytics_events`, `recent_activities` and `real_time_consumption` only
+ever grew (the all-or-nothing /analytics/reset aside), and every query and
+backup got slower as they did. RetentionCompactor keeps raw rows for a
+configurable number of days per table and keeps the history beyond that
+as rollups:
+
+- analytics events and activities already feed the daily rollups behind
+  /reports (report_rollups.py) as they are written, so their old rows are
+  simply deleted
+- real-time readings are folded into `hourly_consumption_rollup` (count,
+  sum, min and max per hour and borough) in the same transaction that
+  deletes them
+
+Rows are deleted oldest first in batches of batch_size, each batch its own
+short transaction, so writers in this and other processes get the write
+lock between batches instead of waiting for one long DELETE. Afterwards
+`PRAGMA incremental_vacuum` hands the freed pages back to the filesystem,
+vacuum_pages at a time. That needs auto_vacuum = INCREMENTAL, which a
+database created before retention existed only gets from one full VACUUM;
+the compactor runs that once, on its first pass.
+
+The compactor runs on the I/O executor every interval_seconds, from a task
+started in the app's lifespan, and reports rows pruned and the database
+size after each pass.
+"""
+
+import asyncio
+import inspect
+import json
+import time
+
+# Where each table's history lives once its raw rows are pruned
+ROLLUPS = {
+    "analytics_events": "daily_event_rollup",
+    "recent_activities": "daily_activity_rollup",
+    "real_time_consumption": "hourly_consumption_rollup",
+}
+
+FOLD_REAL_TIME_CONSUMPTION = '''
+    INSERT INTO hourly_consumption_rollup (hour, borough, readings, consumption_sum, consumption_min, consumption_max)
+    SELECT strftime('%Y-%m-%d %H:00:00', timestamp), borough, COUNT(*), SUM(consumption), MIN(consumption), MAX(consumption)
+    FROM real_time_consumption
+    WHERE id IN (SELECT value FROM json_each(?))
+    GROUP BY 1, 2
+    ON CONFLICT (hour, borough) DO UPDATE SET
+        readings = readings + excluded.readings,
+        consumption_sum = consumption_sum + excluded.consumption_sum,
+        consumption_min = MIN(consumption_min, excluded.consumption_min),
+        consumption_max = MAX(consumption_max, excluded.consumption_max)
+'''
+
+# auto_vacuum mode value for INCREMENTAL
+INCREMENTAL = 2
+
+
+class RetentionCompactor:
+    """Prunes raw rows past their retention in small batches and reclaims the space"""
+
+    def __init__(self, pool, policies, batch_size=500, batch_pause_ms=10, vacuum_pages=1000,
+                 interval_seconds=3600, on_report=None):
+        """
+        Args:
+            pool: ConnectionPool for the dashboard database
+            policies: Days of raw rows to keep, by table name (0 keeps them forever)
+            batch_size: Rows deleted per transaction
+            batch_pause_ms: Pause between batches, so other writers get a turn
+            vacuum_pages: Pages freed per incremental_vacuum step
+            interval_seconds: Time between compaction passes
+            on_report: Called on the event loop with each pass's report; awaited if it is a coroutine function
+        """
+        unknown = set(policies) - set(ROLLUPS)
+        if unknown:
+            raise ValueError(f"No retention support for tables: {', '.join(sorted(unknown))}")
+        self.pool = pool
+        self.policies = policies
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause_ms / 1000
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval_seconds
+        self.on_report = on_report
+        self._task = None
+        self._incremental_vacuum_checked = False
+        self.runs = 0
+        self.rows_pruned = 0
+        self.last_report = None
+
+    def prune(self, table, days):
+        """
+        Delete a table's rows older than `days`, batch by batch
+
+        Returns:
+            int: The number of rows deleted
+        """
+        pruned = 0
+        while True:
+            with self.pool.transaction() as conn:
+                ids = [row[0] for row in conn.execute(f'''
+                    SELECT id FROM {table}
+                    WHERE timestamp < datetime('now', ?)
+                    ORDER BY timestamp
+                    LIMIT ?
+                ''', (f"-{days} days", self.batch_size))]
+                if ids:
+                    batch = json.dumps(ids)
+                    if table == "real_time_consumption":
+                        conn.execute(FOLD_REAL_TIME_CONSUMPTION, (batch,))
+                    conn.execute(f'DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))', (batch,))
+            pruned += len(ids)
+            if len(ids) < self.batch_size:
+                return pruned
+            time.sleep(self.batch_pause)
+
+    def enable_incremental_vacuum(self):
+        """
+        Switch the database to auto_vacuum = INCREMENTAL if it isn't already
+
+        Returns:
+            bool: True if a full VACUUM was run to switch it
+        """
+        if self.pool.fetchone('PRAGMA auto_vacuum')[0] == INCREMENTAL:
+            return False
+        print("🧹 Rebuilding the database once to enable incremental vacuum...")
+        self.pool.execute_outside_transaction('PRAGMA auto_vacuum = INCREMENTAL')
+        self.pool.execute_outside_transaction('VACUUM')
+        return True
+
+    def vacuum(self):
+        """
+        Return free pages to the filesystem, vacuum_pages per step
+
+        Returns:
+            int: The number of pages freed
+        """
+        freed = 0
+        free_pages = self.pool.fetchone('PRAGMA freelist_count')[0]
+        while free_pages:
+            self.pool.execute_outside_transaction(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})')
+            remaining = self.pool.fetchone('PRAGMA freelist_count')[0]
+            if remaining >= free_pages:
+                break  # auto_vacuum is off (another process owns the switch); nothing more to free
+            freed += free_pages - remaining
+            free_pages = remaining
+        return freed
+
+    def database_size(self):
+        """
+        Returns:
+            tuple: (size in bytes, free pages)
+        """
+        with self.pool.connection() as conn:
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return page_count * page_size, free_pages
+
+    def compact(self):
+        """
+        Run one compaction pass: prune every table, then vacuum
+
+        Returns:
+            dict: Rows pruned per table, pages freed and the database size afterwards
+        """
+        started = time.perf_counter()
+        rebuilt = False
+        if not self._incremental_vacuum_checked:
+            rebuilt = self.enable_incremental_vacuum()
+            self._incremental_vacuum_checked = True
+
+        pruned = {table: self.prune(table, days) for table, days in self.policies.items() if days > 0}
+        pages_freed = self.vacuum() if any(pruned.values()) or rebuilt else 0
+        size_bytes, free_pages = self.database_size()
+
+        report = {
+            "rows_pruned": sum(pruned.values()),
+            "pruned": pruned,
+            "pages_freed": pages_freed,
+            "database_size_mb": round(size_bytes / (1024 * 1024), 2),
+            "free_pages": free_pages,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        self.runs += 1
+        self.rows_pruned += report["rows_pruned"]
+        self.last_report = report
+        if report["rows_pruned"]:
+            print(f"🧹 Pruned {report['rows_pruned']} rows past retention {pruned}, "
+                  f"database now {report['database_size_mb']} MB")
+        return report
+
+    def start(self):
+        """Start the background compaction task (its first pass runs right away)"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                report = await self.pool.run(self.compact)
+                if self.on_report is not None:
+                    outcome = self.on_report(report)
+                    if inspect.isawaitable(outcome):
+                        await outcome
+            except Exception as e:
+                print(f"⚠️ Retention compaction failed, will retry: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            "policies_days": dict(self.policies),
+            "runs": self.runs,
+            "rows_pruned": self.rows_pruned,
+            "last_report": self.last_report
+        }
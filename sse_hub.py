@@ -0,0 +1,417 @@
+"""
+Server-Sent Events fan-out for the dashboard stream.
+
+The hub keeps a copy of the dashboard state it last sent (stats, analytics
+and recent activities) and a version number for it. Clients get a full
+`snapshot` event when they connect, then `patch` events carrying only the
+JSON-patch operations (RFC 6902 add/remove/replace) between consecutive
+versions. Every state event has an SSE `id: <epoch>-<version>`, so a client
+that reconnects with `Last-Event-ID` (or notices a version gap and
+reconnects) is sent just the patches it missed, or a fresh snapshot if they
+are no longer in the hub's history or came from another server process.
+
+Every event is encoded once, to bytes, and the same buffer is put on every
+subscriber's queue. State changes are coalesced: publish() only marks which
+parts of the state changed, and after a short window one patch covers every
+changed part.
+
+Subscriber queues are bounded, so a stalled tab can't grow memory. When a
+queue is full the oldest job update or heartbeat is dropped; if it holds only
+state patches they are all replaced by one snapshot of the current version
+(the patches chain, so dropping one would break the client's state). A
+client that fills its queue again and again without reading anything is
+evicted: its stream ends and the browser reconnects later with Last-Event-ID.
+
+One hub-level ticker keeps idle connections open by queueing the same
+pre-encoded comment frame for every subscriber that has nothing waiting;
+connections don't run timers of their own.
+
+orjson is used for encoding when it is installed, the standard json module
+otherwise.
+"""
+
+import asyncio
+import json
+import uuid
+from collections import deque
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # optional, only faster
+    orjson = None
+
+STATE_PARTS = ("stats", "analytics", "activities")
+# An SSE comment: keeps proxies and the browser from timing the connection out, never reaches onmessage
+HEARTBEAT_FRAME = b": heartbeat\n\n"
+
+
+def encode_json(payload):
+    """Compact JSON bytes for a payload"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # types only the json module handles
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def decode_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_event(payload, event_id=None):
+    """A complete SSE frame for a payload, with an `id:` line if given"""
+    frame = b"data: " + encode_json(payload) + b"\n\n"
+    if event_id is not None:
+        frame = b"id: " + event_id.encode() + b"\n" + frame
+    return frame
+
+
+def _pointer(path):
+    return "".join("/" + str(key).replace("~", "~0").replace("/", "~1") for key in path)
+
+
+def diff(old, new, path=()):
+    """
+    JSON-patch operations turning `old` into `new`
+
+    Dicts are compared key by key. A list whose entries only shifted (the
+    rolling windows in the analytics data, the newest-first activity feed)
+    becomes removes at one end plus adds at the other; other lists of equal
+    length are compared element by element, anything else is replaced whole.
+
+    Returns:
+        list: Operations as {"op", "path"[, "value"]} dicts
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path + (key,))})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": _pointer(path + (key,)), "value": value})
+            else:
+                ops.extend(diff(old[key], value, path + (key,)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        shifted = _shift_ops(old, new, path)
+        if shifted is not None:
+            return shifted
+        if len(old) == len(new):
+            ops = []
+            for index, (before, after) in enumerate(zip(old, new)):
+                ops.extend(diff(before, after, path + (index,)))
+            return ops
+    return [{"op": "replace", "path": _pointer(path), "value": new}]
+
+
+def _shift_ops(old, new, path):
+    # Entries dropped from the front and appended at the end (rolling windows), or inserted
+    # at the front and dropped from the end (newest-first feeds); the cheaper of the two
+    candidates = []
+    for dropped in range(len(old)):
+        kept = len(old) - dropped
+        if kept <= len(new) and old[dropped] == new[0] and old[dropped:] == new[:kept]:
+            ops = [{"op": "remove", "path": _pointer(path + (0,))} for _ in range(dropped)]
+            ops.extend({"op": "add", "path": _pointer(path + ("-",)), "value": value} for value in new[kept:])
+            candidates.append(ops)
+            break
+    for added in range(len(new)):
+        kept = len(new) - added
+        if kept <= len(old) and new[added] == old[0] and new[added:] == old[:kept]:
+            ops = [{"op": "remove", "path": _pointer(path + (index,))} for index in range(len(old) - 1, kept - 1, -1)]
+            ops.extend({"op": "add", "path": _pointer(path + (index,)), "value": value}
+                       for index, value in enumerate(new[:added]))
+            candidates.append(ops)
+            break
+    if not old:
+        candidates.append([{"op": "add", "path": _pointer(path + ("-",)), "value": value} for value in new])
+    return min(candidates, key=len) if candidates else None
+
+
+class Subscriber:
+    """One SSE client's bounded queue of encoded frames"""
+
+    def __init__(self):
+        self.frames = deque()  # (frame, is_state_event)
+        self.overflows = 0  # times the queue filled up since the client last read
+        self.evicted = False
+        self._ready = asyncio.Event()
+
+    def qsize(self):
+        return len(self.frames)
+
+    def put(self, frame, is_state):
+        self.frames.append((frame, is_state))
+        self._ready.set()
+
+    def get_nowait(self):
+        frame = self.frames.popleft()[0]
+        self.overflows = 0
+        return frame
+
+    async def get(self, timeout=None):
+        """
+        Wait for the next frame
+
+        Returns:
+            bytes: The frame, or None once the subscriber was evicted
+
+        Raises:
+            asyncio.TimeoutError: If nothing arrived within `timeout` seconds
+        """
+        while not self.frames and not self.evicted:
+            self._ready.clear()
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        if self.evicted:
+            return None
+        return self.get_nowait()
+
+    def evict(self):
+        self.evicted = True
+        self.frames.clear()
+        self._ready.set()
+
+
+class BroadcastHub:
+    """Versions the dashboard state and streams it to SSE subscribers as a snapshot plus patches"""
+
+    def __init__(self, get_state, coalesce_ms=50, history=100, max_queue=64, max_overflows=3,
+                 heartbeat_seconds=30):
+        """
+        Args:
+            get_state: async callable(parts) returning {part: value} for the requested state parts
+            coalesce_ms: How long to gather state changes before sending one patch
+            history: Number of recent patches kept for clients resuming with Last-Event-ID
+            max_queue: Frames a subscriber may have waiting before older ones are dropped or coalesced
+            max_overflows: Times a subscriber may fill its queue without reading before it is evicted
+            heartbeat_seconds: Interval of the shared heartbeat ticker
+        """
+        self.get_state = get_state
+        self.coalesce = coalesce_ms / 1000
+        self.max_queue = max(2, max_queue)
+        self.max_overflows = max_overflows
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.subscribers = set()
+        self._state = None  # JSON-safe copy of the state as of self.version
+        self._dirty = set(STATE_PARTS)
+        self._history = deque(maxlen=history)  # (version, encoded patch frame)
+        self._snapshot = None  # (version, encoded snapshot frame)
+        self.heartbeat_interval = heartbeat_seconds
+        self._flush_task = None
+        self._heartbeat_task = None
+        self._lock = None
+        self.heartbeats = 0
+        self.events_sent = 0
+        self.encodes = 0
+        self.coalesced = 0
+        self.patches = 0
+        self.snapshots_sent = 0
+        self.resumes = 0
+        self.patch_bytes = 0
+        self.full_bytes = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self.evictions = 0
+
+    def event_id(self, version=None):
+        return f"{self.epoch}-{self.version if version is None else version}"
+
+    def subscribe(self):
+        """Register a new client and return its Subscriber"""
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def connect(self, last_event_id=None):
+        """
+        Subscribe a client and work out what it needs to catch up
+
+        Args:
+            last_event_id: The SSE id of the last event the client applied, if it is resuming
+
+        Returns:
+            tuple: (Subscriber for later events, list of frames to send first)
+        """
+        # Bring the state up to date, then subscribe and pick the catch-up frames with no
+        # await in between, so no patch can fall between them and the queue
+        await self.flush()
+        subscriber = self.subscribe()
+        return subscriber, self.catch_up(last_event_id)
+
+    def catch_up(self, last_event_id=None):
+        """Frames taking a client from `last_event_id` to the current version"""
+        epoch, _, version = (last_event_id or "").partition("-")
+        if epoch == self.epoch and version.isdigit():
+            version = int(version)
+            if version == self.version:
+                self.resumes += 1
+                return []
+            missed = [frame for patch_version, frame in self._history if patch_version > version]
+            if self._history and self._history[0][0] <= version + 1 and version < self.version:
+                self.resumes += 1
+                return missed
+        self.snapshots_sent += 1
+        return [self.snapshot_frame()]
+
+    def snapshot_frame(self):
+        """The full state at the current version, encoded once per version"""
+        if self._snapshot is None or self._snapshot[0] != self.version:
+            self._snapshot = (self.version, self._encode({
+                "type": "snapshot",
+                "version": self.version,
+                "state": self._state,
+                "timestamp": datetime.now().isoformat()
+            }, self.event_id()))
+        return self._snapshot[1]
+
+    def publish(self, *parts):
+        """Mark parts of the state as changed; one patch covers them after the coalescing window"""
+        if self._dirty:
+            self.coalesced += 1
+        self._dirty.update(parts)
+        if self.subscribers and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.coalesce)
+        await self.flush()
+
+    async def flush(self):
+        """Re-read the changed parts and send one patch for whatever actually differs"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            parts, self._dirty = [part for part in STATE_PARTS if part in self._dirty], set()
+            if not parts:
+                return
+            try:
+                # Round-trip through JSON: a detached copy, in exactly the form clients hold
+                fresh = decode_json(encode_json(await self.get_state(parts)))
+            except Exception as e:
+                print(f"❌ Failed to read dashboard state for broadcast: {e}")
+                self._dirty.update(parts)
+                return
+            if self._state is None:
+                self._state = {part: None for part in STATE_PARTS}
+                self._state.update(fresh)
+                self.version += 1
+                return
+            ops = diff({part: self._state[part] for part in parts}, fresh)
+            if not ops:
+                return
+            self._state.update(fresh)
+            self.version += 1
+            frame = self._encode({
+                "type": "patch",
+                "version": self.version,
+                "base": self.version - 1,
+                "ops": ops,
+                "timestamp": datetime.now().isoformat()
+            }, self.event_id())
+            self._history.append((self.version, frame))
+            self.patches += 1
+            self.patch_bytes += len(frame)
+            self.full_bytes += len(encode_json(self._state))
+            self.send_frame(frame, is_state=True)
+
+    def send(self, payload):
+        """Encode a non-state event (job update, heartbeat) once and queue it for every subscriber"""
+        if self.subscribers:
+            self.send_frame(self._encode(payload))
+
+    def send_frame(self, frame, is_state=False):
+        """Queue already encoded bytes for every subscriber, applying the overflow policy"""
+        for subscriber in list(self.subscribers):
+            if subscriber.evicted:
+                continue
+            if subscriber.qsize() >= self.max_queue and not self._make_room(subscriber, is_state):
+                continue
+            subscriber.put(frame, is_state)
+        self.events_sent += 1
+
+    def _make_room(self, subscriber, is_state):
+        # Returns whether the new frame should still be queued
+        subscriber.overflows += 1
+        if subscriber.overflows > self.max_overflows:
+            self.evictions += 1
+            self.dropped += subscriber.qsize()
+            subscriber.evict()
+            self.unsubscribe(subscriber)
+            print(f"🧹 Evicted SSE client that stopped reading ({self.max_queue * self.max_overflows}+ events behind)")
+            return False
+
+        frames = subscriber.frames
+        oldest_event = next((index for index, (_, state) in enumerate(frames) if not state), None)
+        if oldest_event is not None:
+            # Drop the oldest job update or heartbeat
+            del frames[oldest_event]
+            self.dropped += 1
+            return True
+
+        # Only state patches queued: coalesce them into one snapshot of the current version,
+        # which also covers a new patch
+        self.dropped += len(frames)
+        self.resyncs += 1
+        frames.clear()
+        subscriber.put(self.snapshot_frame(), True)
+        return not is_state
+
+    def start(self):
+        """Start the shared heartbeat ticker"""
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.heartbeat()
+
+    def heartbeat(self):
+        """Queue the heartbeat comment for every subscriber with nothing else waiting"""
+        for subscriber in list(self.subscribers):
+            if not subscriber.qsize() and not subscriber.evicted:
+                subscriber.put(HEARTBEAT_FRAME, False)
+                self.heartbeats += 1
+
+    def _encode(self, payload, event_id=None):
+        self.encodes += 1
+        return encode_event(payload, event_id)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "queued_frames": sum(subscriber.qsize() for subscriber in self.subscribers),
+            "max_queue_depth": max((subscriber.qsize() for subscriber in self.subscribers), default=0),
+            "queue_limit": self.max_queue,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "evictions": self.evictions,
+            "version": self.version,
+            "events_sent": self.events_sent,
+            "encodes": self.encodes,
+            "coalesced": self.coalesced,
+            "patches": self.patches,
+            "snapshots_sent": self.snapshots_sent,
+            "resumes": self.resumes,
+            "heartbeats": self.heartbeats,
+            "patch_bytes": self.patch_bytes,
+            "full_state_bytes": self.full_bytes,
+            "encoder": "orjson" if orjson is not None else "json"
+        }
+
+    async def close(self):
+        for task in (self._flush_task, self._heartbeat_task):
+            if task is not None:
+                task.cancel()
+        self._heartbeat_task = None
@@ -0,0 +1,607 @@
+"""
+Pooled SQLite access for dashboard_stats.db.
+
+Connections are opened once and reused instead of per helper call, so
+SQLite's per-connection statement cache keeps every query prepared. The
+database runs in WAL mode: readers never wait for the writer, and commits
+append to the log instead of rewriting the database. Writes in this process
+queue on a lock rather than in SQLite's busy handler, which sleeps in steps
+and caused sporadic 100 ms+ stalls. busy_timeout still covers other
+processes (training scripts, a second API worker).
+
+Each blocking method has an async twin (run, execute_async, fetchall_async,
+...) that runs it on the I/O executor, so handlers never block the event
+loop on disk.
+
+WriteBehindBuffer batches small writes (events, activities, stats) into one
+transaction per flush, so a prediction pays for one commit instead of four.
+StateVersion versions in-memory state and notices commits by other processes.
+
+Settings come from environment variables:
+
+    SQLITE_POOL_SIZE            (default 4)
+    SQLITE_BUSY_TIMEOUT_MS      (default 5000)
+    WRITE_BEHIND_INTERVAL_MS    (default 250)
+    WRITE_BEHIND_MAX_ROWS       (default 100)
+"""
+
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from executors import get_io_executor
+
+DEFAULT_DB_PATH = 'dashboard_stats.db'
+
+
+class ConnectionPool:
+    """A fixed-size pool of WAL-mode SQLite connections with a single in-process writer"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, size=4, busy_timeout_ms=5000, statement_cache_size=256):
+        """
+        Args:
+            db_path: SQLite database file
+            size: Maximum number of open connections
+            busy_timeout_ms: How long a connection waits for another process's lock
+            statement_cache_size: Prepared statements kept per connection
+        """
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache_size = statement_cache_size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self.checkouts = 0
+        self.checkout_waits = 0
+        self.writes = 0
+        self.total_write_wait_seconds = 0.0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,  # a connection is used by one thread at a time, via the pool
+            isolation_level=None,  # transactions are explicit, see transaction()
+            cached_statements=self.statement_cache_size
+        )
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA journal_mode = WAL')
+        # Safe with WAL: a power loss can drop the last commits but never corrupts the database
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+
+    def _checkout(self):
+        if self._closed:
+            raise RuntimeError(f"Connection pool for {self.db_path} is closed")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    opening = True
+                else:
+                    opening = False
+            if opening:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                with self._lock:
+                    self.checkout_waits += 1
+                conn = self._idle.get()
+        with self._lock:
+            self.checkouts += 1
+        return conn
+
+    def _checkin(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            with self._lock:
+                self._opened -= 1
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for reads (autocommit, each statement sees the latest commit)"""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Borrow a connection inside a write transaction
+
+        Commits when the block exits normally and rolls back if it raises.
+        Writers in this process take turns on a lock; BEGIN IMMEDIATE takes
+        SQLite's write lock up front so the transaction can't fail halfway
+        on a lock upgrade.
+        """
+        wait_started = time.perf_counter()
+        with self._write_lock:
+            waited = time.perf_counter() - wait_started
+            with self.connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+                conn.commit()
+            with self._lock:
+                self.writes += 1
+                self.total_write_wait_seconds += waited
+
+    def execute(self, sql, params=()):
+        """
+        Run one write statement in its own transaction
+
+        Returns:
+            int: The number of rows changed
+        """
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def executemany(self, sql, rows):
+        """Run a write statement for every parameter tuple in one transaction"""
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    def execute_outside_transaction(self, sql):
+        """
+        Run a statement that can't run inside a transaction (VACUUM, PRAGMA incremental_vacuum)
+
+        Holds the writer lock so no write in this process runs alongside it.
+
+        Returns:
+            list: The rows the statement returned
+        """
+        with self._write_lock:
+            with self.connection() as conn:
+                rows = conn.execute(sql).fetchall()
+            with self._lock:
+                self.writes += 1
+            return rows
+
+    def fetchone(self, sql, params=()):
+        """Run a query and return its first row, or None"""
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        """Run a query and return every row"""
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking storage function on the I/O executor"""
+        return await get_io_executor().run(func, *args, **kwargs)
+
+    async def execute_async(self, sql, params=()):
+        return await self.run(self.execute, sql, params)
+
+    async def executemany_async(self, sql, rows):
+        return await self.run(self.executemany, sql, rows)
+
+    async def fetchone_async(self, sql, params=()):
+        return await self.run(self.fetchone, sql, params)
+
+    async def fetchall_async(self, sql, params=()):
+        return await self.run(self.fetchall, sql, params)
+
+    def stats(self):
+        """Pool usage and writer contention metrics"""
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "size": self.size,
+                "open": self._opened,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "checkout_waits": self.checkout_waits,
+                "writes": self.writes,
+                "avg_write_wait_ms": round(self.total_write_wait_seconds / self.writes * 1000, 2) if self.writes else 0.0
+            }
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed when returned"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+            conn.close()
+
+
+class WriteBehindBuffer:
+    """
+    Collects small writes and commits them together in one transaction
+
+    Rows queued with add() are inserted in order. Writes queued with
+    replace() carry a key and only the latest one per key is kept, for
+    tables that hold current state (stats, the analytics snapshot). A
+    background thread flushes every interval_ms, and reaching max_rows
+    flushes straight away. If more than max_buffered rows pile up (the
+    database is unreachable), the oldest are dropped and counted.
+
+    If a batch fails, its writes are replayed one by one (each under a
+    savepoint) in a single transaction, so one bad statement doesn't hold
+    back the others. A write that fails max_attempts flushes in a row is
+    discarded and counted.
+    """
+
+    def __init__(self, pool, interval_ms=250, max_rows=100, max_buffered=10000, max_attempts=3):
+        """
+        Args:
+            pool: ConnectionPool the rows are written through
+            interval_ms: Longest a buffered write waits before it is committed
+            max_rows: Number of pending rows that triggers an immediate flush
+            max_buffered: Rows kept while flushes fail before the oldest are dropped
+            max_attempts: Failed flushes after which a write that keeps failing is discarded
+        """
+        self.pool = pool
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.max_buffered = max_buffered
+        self.max_attempts = max_attempts
+        self._rows = []  # (sql, params, failed attempts)
+        self._latest = {}
+        self._latest_failures = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.buffered = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.discarded = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def add(self, sql, params=()):
+        """Queue one write statement"""
+        with self._lock:
+            self._rows.append((sql, params, 0))
+            self.buffered += 1
+            pending = self._trim()
+        if pending >= self.max_rows:
+            self._wake.set()
+
+    def replace(self, key, statements):
+        """Queue a list of (sql, params) statements, replacing any still pending under the same key"""
+        with self._lock:
+            if key in self._latest:
+                self.coalesced += 1
+            self._latest[key] = list(statements)
+            self._latest_failures.pop(key, None)
+            self.buffered += 1
+            pending = self._trim()
+        if pending >= self.max_rows:
+            self._wake.set()
+
+    def _trim(self):
+        overflow = min(len(self._rows) + len(self._latest) - self.max_buffered, len(self._rows))
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped += overflow
+        return len(self._rows) + len(self._latest)
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows) + len(self._latest)
+
+    def flush(self):
+        """
+        Commit everything buffered in one transaction
+
+        Returns:
+            int: Number of buffered writes committed
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, latest = self._rows, self._latest
+                failures = {key: self._latest_failures.pop(key, 0) for key in latest}
+                self._rows, self._latest = [], {}
+            count = len(rows) + len(latest)
+            if not count:
+                return 0
+            try:
+                with self.pool.transaction() as conn:
+                    for sql, params, _ in rows:
+                        conn.execute(sql, params)
+                    for statements in latest.values():
+                        for sql, params in statements:
+                            conn.execute(sql, params)
+            except Exception as e:
+                print(f"❌ Error flushing {count} buffered writes, retrying them one by one: {e}")
+                return self._flush_one_by_one(rows, latest, failures)
+            with self._lock:
+                self.flushed += count
+                self.flushes += 1
+            return count
+
+    def _flush_one_by_one(self, rows, latest, failures):
+        failed_rows, failed_latest = [], {}
+        try:
+            with self.pool.transaction() as conn:
+                for sql, params, attempts in rows:
+                    if not self._try_write(conn, [(sql, params)]):
+                        failed_rows.append((sql, params, attempts + 1))
+                for key, statements in latest.items():
+                    if not self._try_write(conn, statements):
+                        failed_latest[key] = (statements, failures[key] + 1)
+        except Exception as e:
+            # No transaction at all (the database is unreachable): nothing was wrong with the writes themselves
+            print(f"❌ Error flushing buffered writes: {e}")
+            failed_rows = rows
+            failed_latest = {key: (statements, failures[key]) for key, statements in latest.items()}
+
+        committed = len(rows) - len(failed_rows) + len(latest) - len(failed_latest)
+        discarded = 0
+        with self._lock:
+            # Put the failed writes back in front of anything queued meanwhile and retry on the next flush
+            kept = [row for row in failed_rows if row[2] < self.max_attempts]
+            discarded += len(failed_rows) - len(kept)
+            self._rows[:0] = kept
+            for key, (statements, attempts) in failed_latest.items():
+                if attempts >= self.max_attempts:
+                    discarded += 1
+                elif key not in self._latest:
+                    self._latest[key] = statements
+                    self._latest_failures[key] = attempts
+            self.discarded += discarded
+            self.failed_flushes += 1
+            self.flushed += committed
+            if committed:
+                self.flushes += 1
+            self._trim()
+        if discarded:
+            print(f"❌ Discarded {discarded} buffered writes that failed {self.max_attempts} flushes in a row")
+        return committed
+
+    @staticmethod
+    def _try_write(conn, statements):
+        conn.execute('SAVEPOINT buffered_write')
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+        except Exception as e:
+            conn.execute('ROLLBACK TO buffered_write')
+            conn.execute('RELEASE buffered_write')
+            print(f"❌ Buffered write failed: {e}")
+            return False
+        conn.execute('RELEASE buffered_write')
+        return True
+
+    def stats(self):
+        """Buffered, flushed and dropped write counters"""
+        with self._lock:
+            return {
+                "interval_ms": int(self.interval * 1000),
+                "max_rows": self.max_rows,
+                "pending": len(self._rows) + len(self._latest),
+                "buffered": self.buffered,
+                "coalesced": self.coalesced,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "discarded": self.discarded,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "avg_rows_per_flush": round(self.flushed / self.flushes, 2) if self.flushes else 0.0
+            }
+
+    def close(self):
+        """Stop the flush thread and durably commit whatever is left"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        try:
+            # Move the WAL into the database file so the last commits survive a power loss
+            with self.pool.connection() as conn:
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception as e:
+            print(f"⚠️ WAL checkpoint on shutdown failed: {e}")
+
+
+class StateVersion:
+    """
+    Version counter for in-memory state that is persisted to the database
+
+    The in-process state is authoritative and served from memory; the version
+    bumps on every change and, prefixed with a random per-instance epoch,
+    doubles as an ETag (the counter restarts at 0 on every boot and differs
+    between worker processes, so the version alone would reuse ETags). Each process records its
+    latest version in its own `state_meta` row. To notice changes made by
+    another process, a dedicated connection polls PRAGMA data_version (a
+    cheap check that changes whenever any other connection commits) at most
+    every check_interval_ms, and only then reads the other writers' rows.
+    """
+
+    def __init__(self, pool, write_buffer, key='dashboard_state', check_interval_ms=500):
+        """
+        Args:
+            pool: ConnectionPool for the database holding the state
+            write_buffer: WriteBehindBuffer the state_meta row is written through
+            key: Name of the state being versioned
+            check_interval_ms: Minimum time between checks for changes by other processes
+        """
+        self.pool = pool
+        self.write_buffer = write_buffer
+        self.key = key
+        self.check_interval = check_interval_ms / 1000
+        self.epoch = uuid.uuid4().hex[:8]
+        self.writer_id = f"{socket.gethostname()}:{os.getpid()}:{self.epoch}"
+        self.version = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._seen_writers = None
+        self._next_check = 0.0
+        self.external_changes = 0
+
+    @staticmethod
+    def create_table(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS state_meta (
+                key TEXT NOT NULL,
+                writer TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (key, writer)
+            )
+        ''')
+
+    def bump(self, persist=True):
+        """
+        Record a change to the state
+
+        Args:
+            persist: Also announce the change to other processes (False when adopting their change)
+
+        Returns:
+            int: The new version
+        """
+        with self._lock:
+            self.version += 1
+            version = self.version
+        if persist:
+            self.write_buffer.replace(f"state_meta:{self.key}", [('''
+                INSERT INTO state_meta (key, writer, version, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(key, writer) DO UPDATE SET version = excluded.version, updated_at = CURRENT_TIMESTAMP
+            ''', (self.key, self.writer_id, version))])
+        return version
+
+    def etag(self, resource):
+        return f'"{resource}-{self.epoch}-{self.version}"'
+
+    def check_due(self):
+        """Whether enough time has passed since the last check for outside changes"""
+        return time.monotonic() >= self._next_check
+
+    def changed_elsewhere(self):
+        """
+        Check whether another process changed the state since the last check
+
+        Returns:
+            bool: True if another writer's version moved on
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.pool.db_path, timeout=self.pool.busy_timeout_ms / 1000,
+                                             check_same_thread=False, isolation_level=None)
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version and self._seen_writers is not None:
+                return False
+            self._data_version = data_version
+            writers = dict(self._conn.execute(
+                'SELECT writer, version FROM state_meta WHERE key = ? AND writer != ?', (self.key, self.writer_id)
+            ).fetchall())
+            changed = self._seen_writers is not None and writers != self._seen_writers
+            self._seen_writers = writers
+            if changed:
+                self.external_changes += 1
+            return changed
+
+    def stats(self):
+        return {"version": self.version, "writer": self.writer_id, "external_changes": self.external_changes}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"⚠️ Invalid {name}={os.environ[name]!r}, using {default}")
+        return default
+
+
+def get_storage(db_path=DEFAULT_DB_PATH):
+    """Shared connection pool for a database file"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(
+                db_path,
+                size=max(1, _env_int("SQLITE_POOL_SIZE", 4)),
+                busy_timeout_ms=max(0, _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000))
+            )
+            _pools[db_path] = pool
+        return pool
+
+
+def create_write_buffer(pool):
+    """Write-behind buffer for a pool, configured from the environment"""
+    return WriteBehindBuffer(
+        pool,
+        interval_ms=max(1, _env_int("WRITE_BEHIND_INTERVAL_MS", 250)),
+        max_rows=max(1, _env_int("WRITE_BEHIND_MAX_ROWS", 100))
+    )
+
+
+def get_storage_stats():
+    """Metrics for every pool that has been created"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.db_path: pool.stats() for pool in pools}
+
+
+def close_storage():
+    """Close all shared pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,138 @@
+import copy
+import json
+
+import pytest
+
+import analytics_store
+from analytics_store import AnalyticsStore, create_analytics_tables
+from storage import ConnectionPool, WriteBehindBuffer
+
+
+def make_data():
+    return {
+        "actual_consumption": {"borough_totals": {"BRONX": 0, "QUEENS": 0}},
+        "operations": {"system_alerts": {"warning": 0}, "daily_processing_volume": []},
+        "real_time_consumption": [],
+        "last_updated": "2025-01-01T00:00:00"
+    }
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "analytics.db"))
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE analytics_data_persistent (id INTEGER PRIMARY KEY, data_json TEXT, source TEXT, has_real_data BOOLEAN)')
+        create_analytics_tables(conn)
+    yield pool
+    pool.close()
+
+
+def save(store, pool, data):
+    buffer = WriteBehindBuffer(pool, interval_ms=10000)
+    changed = store.save(data, buffer)
+    buffer.flush()
+    return changed
+
+
+def test_only_changed_sections_are_written(pool):
+    store = AnalyticsStore(pool)
+    data = make_data()
+    assert save(store, pool, data) == 5  # 3 sections + 2 lists
+
+    assert save(store, pool, data) == 0
+    data["actual_consumption"]["borough_totals"]["BRONX"] = 12.5
+    assert save(store, pool, data) == 1
+    versions = dict(pool.fetchall('SELECT name, version FROM analytics_sections'))
+    assert versions["actual_consumption"] == 2 and versions["last_updated"] == 1
+
+
+def test_appends_are_logged_as_deltas_and_replayed_with_trimming(pool):
+    writer = AnalyticsStore(pool)
+    data = make_data()
+    save(writer, pool, data)
+    for i in range(5):
+        data["real_time_consumption"].append({"total_consumption": i})
+        data["real_time_consumption"] = data["real_time_consumption"][-3:]
+        data["operations"]["daily_processing_volume"].append({"files_processed": i})
+        save(writer, pool, data)
+
+    logged = [json.loads(row[0]) for row in pool.fetchall(
+        "SELECT data_json FROM analytics_log WHERE section = 'real_time_consumption' ORDER BY id")]
+    assert logged[-1] == {"append": [{"total_consumption": 4}], "keep": 3}
+
+    reader_data = make_data()
+    assert AnalyticsStore(pool).load(reader_data)
+    assert reader_data == data
+
+
+def test_log_is_compacted_into_a_snapshot(pool, monkeypatch):
+    monkeypatch.setattr(analytics_store, "COMPACT_EVERY", 3)
+    store = AnalyticsStore(pool)
+    data = make_data()
+    save(store, pool, data)
+    for i in range(7):
+        data["real_time_consumption"].append({"total_consumption": i})
+        save(store, pool, data)
+
+    log_rows = pool.fetchone("SELECT COUNT(*) FROM analytics_log WHERE section = 'real_time_consumption'")[0]
+    assert log_rows < 3
+    reader_data = make_data()
+    AnalyticsStore(pool).load(reader_data)
+    assert reader_data["real_time_consumption"] == data["real_time_consumption"]
+
+
+def test_load_skips_own_writes_and_reads_changes_from_other_writers(pool):
+    store = AnalyticsStore(pool)
+    data = make_data()
+    save(store, pool, data)
+    data["real_time_consumption"].append({"total_consumption": 1})
+    save(store, pool, data)
+    sections_before = {name: data[name] for name in data}
+
+    store.load(data)
+    assert data["real_time_consumption"] == [{"total_consumption": 1}]
+    assert all(data[name] is sections_before[name] for name in data)
+
+    other = AnalyticsStore(pool)
+    other_data = make_data()
+    other.load(other_data)
+    other_data["operations"]["system_alerts"]["warning"] = 4
+    other_data["real_time_consumption"].append({"total_consumption": 2})
+    save(other, pool, other_data)
+
+    store.load(data)
+    assert data["operations"]["system_alerts"] == {"warning": 4}
+    assert data["real_time_consumption"] == [{"total_consumption": 1}, {"total_consumption": 2}]
+    assert data["actual_consumption"] is sections_before["actual_consumption"]
+
+
+def test_legacy_blob_is_migrated(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "legacy.db"))
+    legacy = make_data()
+    legacy["real_time_consumption"] = [{"total_consumption": 7}]
+    legacy["operations"]["daily_processing_volume"] = [{"files_processed": 1}]
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE analytics_data_persistent (id INTEGER PRIMARY KEY, data_json TEXT, source TEXT, has_real_data BOOLEAN)')
+        conn.execute('INSERT INTO analytics_data_persistent (data_json) VALUES (?)', (json.dumps(legacy),))
+    with pool.transaction() as conn:
+        create_analytics_tables(conn)
+
+    data = make_data()
+    assert AnalyticsStore(pool).load(data)
+    assert data == legacy
+    assert pool.fetchone('SELECT COUNT(*) FROM analytics_data_persistent')[0] == 0
+    pool.close()
+
+
+def test_replaced_list_is_written_as_snapshot(pool):
+    store = AnalyticsStore(pool)
+    data = make_data()
+    data["real_time_consumption"] = [{"total_consumption": 1}]
+    save(store, pool, data)
+    data["real_time_consumption"] = copy.deepcopy(data["real_time_consumption"]) + [{"total_consumption": 2}]
+    save(store, pool, data)
+
+    assert pool.fetchone("SELECT COUNT(*) FROM analytics_log WHERE section = 'real_time_consumption'")[0] == 0
+    reader_data = make_data()
+    AnalyticsStore(pool).load(reader_data)
+    assert reader_data["real_time_consumption"] == data["real_time_consumption"]
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from AI_feeds.data_pipeline import (CONTEXT_ROWS, fit_streaming_scaler, iter_borough_windows,
+                                    make_dataset, scan_history)
+
+HISTORY_CSV = 'AI_feeds/high_quality_water_consumption.csv'
+
+
+def test_scan_history_fits_encoder_and_date_range():
+    encoder, n_rows, first_date, last_date = scan_history(HISTORY_CSV, chunksize=5000)
+    df = pd.read_csv(HISTORY_CSV)
+    assert list(encoder.classes_) == sorted(df['borough'].unique())
+    assert n_rows == len(df)
+    assert first_date == pd.Timestamp(df['date'].min())
+    assert last_date == pd.Timestamp(df['date'].max())
+
+
+def test_chunked_windows_match_whole_file_windows():
+    encoder, _, _, _ = scan_history(HISTORY_CSV)
+    whole = list(iter_borough_windows(HISTORY_CSV, encoder, chunksize=10 ** 6))
+    chunked = list(iter_borough_windows(HISTORY_CSV, encoder, chunksize=997))
+    assert len(whole) == len(chunked)
+
+    # Skip each borough's warm-up rows, whose missing lags are filled with chunk-local means
+    n_boroughs = len(encoder.classes_)
+    for (X_whole, y_whole), (X_chunk, y_chunk) in list(zip(whole, chunked))[CONTEXT_ROWS * n_boroughs:]:
+        np.testing.assert_allclose(X_chunk, X_whole, rtol=1e-6)
+        assert y_chunk == y_whole
+
+
+def test_windows_never_mix_boroughs():
+    encoder, _, _, _ = scan_history(HISTORY_CSV)
+    borough_column = 6
+    for X, _ in iter_borough_windows(HISTORY_CSV, encoder, chunksize=2000):
+        assert len(set(X[:, borough_column])) == 1
+
+
+def test_dataset_scales_and_splits_by_date():
+    encoder, _, first_date, last_date = scan_history(HISTORY_CSV)
+    scaler = fit_streaming_scaler(HISTORY_CSV, encoder, chunksize=3000)
+    split_date = first_date + (last_date - first_date) * 0.8
+    args = dict(batch_size=64, chunksize=3000, split_date=split_date)
+
+    validation = make_dataset(HISTORY_CSV, encoder, scaler, subset='validation', **args)
+    X_batch, y_batch = next(iter(validation))
+    raw_X, raw_y = next(iter_borough_windows(HISTORY_CSV, encoder, chunksize=3000,
+                                             split_date=split_date, subset='validation'))
+    expected = scaler.transform(np.vstack([raw_X, np.append(np.zeros(raw_X.shape[1] - 1), raw_y)]))
+    assert X_batch.shape == (64, 14, raw_X.shape[1] - 1)
+    np.testing.assert_allclose(X_batch[0].numpy(), expected[:-1, :-1], atol=1e-5)
+    assert abs(float(y_batch[0]) - expected[-1, -1]) < 1e-5
+
+    n_train = sum(1 for _ in iter_borough_windows(HISTORY_CSV, encoder, chunksize=3000,
+                                                  split_date=split_date, subset='train'))
+    n_validation = sum(1 for _ in iter_borough_windows(HISTORY_CSV, encoder, chunksize=3000,
+                                                       split_date=split_date, subset='validation'))
+    n_total = sum(1 for _ in iter_borough_windows(HISTORY_CSV, encoder, chunksize=3000))
+    assert n_train + n_validation == n_total
+    assert 0.7 < n_train / n_total < 0.9
@@ -0,0 +1,73 @@
+import asyncio
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from executors import BoundedExecutor, ExecutorSaturatedError
+
+
+def make_executor(max_workers=2, max_queue=1):
+    return BoundedExecutor("test", ThreadPoolExecutor(max_workers=max_workers), max_workers, max_queue)
+
+
+def test_event_loop_stays_responsive_while_work_blocks():
+    executor = make_executor(max_workers=2, max_queue=4)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.gather(*[executor.run(time.sleep, 0.2) for _ in range(4)])
+        ticking.cancel()
+        return ticks
+
+    # Two rounds of 0.2s on two workers; the loop keeps ticking the whole time
+    assert asyncio.run(scenario()) >= 20
+    stats = executor.stats()
+    assert stats["completed"] == 4 and stats["active"] == 0 and stats["queued"] == 0
+    assert stats["max_queued_seen"] == 2
+    assert stats["avg_wait_ms"] > 50
+
+
+def test_calls_beyond_the_queue_limit_are_rejected():
+    executor = make_executor(max_workers=1, max_queue=1)
+
+    async def scenario():
+        running = [asyncio.create_task(executor.run(time.sleep, 0.2)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert executor.stats()["queued"] == 1
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(time.sleep, 0)
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 2
+
+
+def test_failures_are_counted_and_raised():
+    executor = make_executor()
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(executor.run(lambda: 1 / 0))
+    assert executor.stats()["failed"] == 1
+    assert executor.stats()["active"] == 0
+
+
+def test_process_pool_runs_work_in_another_process():
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    executor = BoundedExecutor("process", pool, 1, 2)
+    try:
+        assert asyncio.run(executor.run(math.factorial, 20)) == math.factorial(20)
+    finally:
+        executor.shutdown()
+    assert executor.stats()["completed"] == 1
@@ -0,0 +1,178 @@
+import os
+import shutil
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from AI_feeds.feature_state import FeatureStateStore, get_feature_state
+from AI_feeds.features import TARGET_COLUMN
+from AI_feeds.predict import build_borough_windows
+
+HISTORY_CSV = 'AI_feeds/high_quality_water_consumption.csv'
+BOROUGHS = ['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS']
+
+
+class Encoder:
+    classes_ = np.array(BOROUGHS)
+
+    def transform(self, boroughs):
+        return np.array([BOROUGHS.index(borough) for borough in boroughs])
+
+
+def batch_windows(csv_path):
+    df = pd.read_csv(csv_path)
+    df['date'] = pd.to_datetime(df['date'])
+    return build_borough_windows(df, BOROUGHS, Encoder())
+
+
+@pytest.fixture
+def history_copy(tmp_path):
+    path = tmp_path / 'history.csv'
+    shutil.copy(HISTORY_CSV, path)
+    return str(path)
+
+
+def test_windows_match_batch_feature_engine(history_copy, tmp_path):
+    store = get_feature_state(history_copy, Encoder(), state_path=str(tmp_path / 'state.joblib'))
+
+    windows, last_dates = store.windows(BOROUGHS)
+    expected_windows, expected_dates = batch_windows(history_copy)
+
+    np.testing.assert_allclose(windows, expected_windows, rtol=1e-9)
+    assert last_dates == expected_dates
+
+
+def test_appended_rows_are_ingested_incrementally(history_copy, tmp_path):
+    state_path = str(tmp_path / 'state.joblib')
+    get_feature_state(history_copy, Encoder(), state_path=state_path)
+
+    with open(history_copy, 'a') as f:
+        f.write('2025-01-01,BRONX,9000.5,2025,1,1,2,1,1,0,1,1,0,1,,,\n')
+    store = get_feature_state(history_copy, Encoder(), state_path=state_path)
+
+    windows, last_dates = store.windows(['BRONX'])
+    expected_windows, expected_dates = batch_windows(history_copy)
+    assert last_dates[0] == pd.Timestamp('2025-01-01')
+    assert windows[0, -1, -1] == 9000.5
+    np.testing.assert_allclose(windows[0], expected_windows[0], rtol=1e-9)
+
+
+def test_partial_trailing_line_waits_for_next_sync(history_copy):
+    store = FeatureStateStore(BOROUGHS)
+    store.sync_csv(history_copy)
+
+    with open(history_copy, 'a') as f:
+        f.write('2025-01-01,BRONX,90')
+    assert store.sync_csv(history_copy) == 0
+
+    with open(history_copy, 'a') as f:
+        f.write('00.5,2025,1,1,2,1,1,0,1,1,0,1,,,\n')
+    assert store.sync_csv(history_copy) == 1
+    assert store.windows(['BRONX'])[0][0, -1, -1] == 9000.5
+
+
+def test_rewritten_history_triggers_rebuild(history_copy, tmp_path):
+    state_path = str(tmp_path / 'state.joblib')
+    get_feature_state(history_copy, Encoder(), state_path=state_path)
+
+    df = pd.read_csv(history_copy).iloc[:-400]
+    df.to_csv(history_copy, index=False)
+    store = get_feature_state(history_copy, Encoder(), state_path=state_path)
+
+    windows, _ = store.windows(BOROUGHS)
+    expected_windows, _ = batch_windows(history_copy)
+    np.testing.assert_allclose(windows, expected_windows, rtol=1e-9)
+
+
+def test_single_reading_updates_window():
+    store = FeatureStateStore(['A'])
+    for day, value in enumerate(range(1, 21)):
+        store.update('A', pd.Timestamp('2024-01-01') + pd.Timedelta(days=day), float(value))
+
+    window = store.windows(['A'])[0][0]
+    assert window.shape == (14, 30)
+    last_row = window[-1]
+    assert last_row[-1] == 20.0
+    assert last_row[14] == pytest.approx(np.mean(range(14, 21)))
+    assert last_row[16] == 20.0 and last_row[17] == 14.0
+
+    with pytest.raises(ValueError):
+        store.update('A', pd.Timestamp('2023-01-01'), 1.0)
+
+
+def test_history_rewritten_in_place_and_grown_is_rebuilt(history_copy):
+    store = FeatureStateStore(BOROUGHS)
+    store.sync_csv(history_copy)
+    old_size = store.source_offset
+
+    # Same header and first rows, different values after them, and longer than before
+    df = pd.read_csv(history_copy)
+    df.loc[100:, TARGET_COLUMN] = df.loc[100:, TARGET_COLUMN] * 1.5 + 0.123
+    df.to_csv(history_copy, index=False)
+    with open(history_copy, 'a') as f:
+        f.write('2025-01-01,BRONX,9000.5,2025,1,1,2,1,1,0,1,1,0,1,,,\n')
+    with open(history_copy, 'rb') as f:
+        assert f.readline() == store.source_header and len(f.read()) > old_size
+
+    store.sync_csv(history_copy)
+
+    windows, _ = store.windows(BOROUGHS)
+    expected_windows, _ = batch_windows(history_copy)
+    np.testing.assert_allclose(windows, expected_windows, rtol=1e-9)
+
+
+def test_out_of_order_append_rebuilds_instead_of_failing(history_copy):
+    store = FeatureStateStore(BOROUGHS)
+    total = store.sync_csv(history_copy)
+
+    with open(history_copy, 'a') as f:
+        f.write('2000-01-01,BRONX,9000.5,2000,1,1,5,1,52,0,1,1,0,1,,,\n')
+
+    assert store.sync_csv(history_copy) == total + 1
+    windows, _ = store.windows(BOROUGHS)
+    expected_windows, _ = batch_windows(history_copy)
+    np.testing.assert_allclose(windows, expected_windows, rtol=1e-9)
+
+
+def test_unparseable_rows_reset_the_store_until_the_file_is_fixed(history_copy):
+    store = FeatureStateStore(BOROUGHS)
+    store.sync_csv(history_copy)
+    with open(history_copy) as f:
+        original = f.read()
+
+    with open(history_copy, 'a') as f:
+        f.write('not-a-date,BRONX,oops\n')
+    with pytest.raises(ValueError):
+        store.sync_csv(history_copy)
+    assert store.boroughs == {} and store.source_path is None
+
+    with open(history_copy, 'w') as f:
+        f.write(original)
+    assert store.sync_csv(history_copy) > 0
+    windows, _ = store.windows(BOROUGHS)
+    expected_windows, _ = batch_windows(history_copy)
+    np.testing.assert_allclose(windows, expected_windows, rtol=1e-9)
+
+
+def test_save_waits_for_a_running_sync(history_copy, tmp_path):
+    store = FeatureStateStore(BOROUGHS)
+    store.sync_csv(history_copy)
+    state_path = str(tmp_path / 'state.joblib')
+
+    with store._lock:
+        saver = threading.Thread(target=store.save, args=(state_path,))
+        saver.start()
+        saver.join(0.2)
+        assert saver.is_alive() and not os.path.exists(state_path)
+    saver.join()
+
+    savers = [threading.Thread(target=store.save, args=(state_path,)) for _ in range(4)]
+    for thread in savers:
+        thread.start()
+    for thread in savers:
+        thread.join()
+    assert sorted(os.listdir(tmp_path)) == ['history.csv', 'state.joblib']
+    np.testing.assert_array_equal(joblib.load(state_path).windows(BOROUGHS)[0], store.windows(BOROUGHS)[0])
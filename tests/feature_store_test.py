@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from AI_feeds import feature_store
+from AI_feeds.feature_store import ensure_feature_store, get_store_paths, load_borough_windows, load_feature_frame
+from AI_feeds.predict import build_borough_windows
+
+HISTORY_CSV = 'AI_feeds/high_quality_water_consumption.csv'
+BOROUGHS = ['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS']
+
+
+class Encoder:
+    classes_ = np.array(BOROUGHS)
+
+    def transform(self, boroughs):
+        return np.array([BOROUGHS.index(borough) for borough in boroughs])
+
+
+@pytest.fixture
+def history_copy(tmp_path):
+    path = tmp_path / 'history.csv'
+    shutil.copy(HISTORY_CSV, path)
+    return str(path)
+
+
+def test_store_uses_compact_types(history_copy):
+    df = load_feature_frame(history_copy)
+
+    assert isinstance(df['borough'].dtype, pd.CategoricalDtype)
+    assert df['year'].dtype == np.int16 and df['week_of_year'].dtype == np.int16
+    assert df['consumption_(hcf)'].dtype == np.float32
+    assert df['rolling_mean_30d'].dtype == np.float32
+    assert len(df) == len(pd.read_csv(history_copy))
+
+
+def test_filters_by_borough_and_date(history_copy):
+    df = load_feature_frame(history_copy, boroughs=['QUEENS'], start_date='2020-01-01', end_date='2020-01-31')
+
+    assert set(df['borough']) == {'QUEENS'}
+    assert len(df) == 31
+    assert df['date'].min() == pd.Timestamp('2020-01-01')
+    assert df['date'].max() == pd.Timestamp('2020-01-31')
+
+
+def test_windows_match_feature_engine(history_copy):
+    df = pd.read_csv(history_copy)
+    df['date'] = pd.to_datetime(df['date'])
+    expected_windows, expected_dates = build_borough_windows(df, BOROUGHS, Encoder())
+
+    windows, last_dates = load_borough_windows(history_copy, BOROUGHS, Encoder())
+
+    np.testing.assert_allclose(windows, expected_windows, rtol=1e-6)
+    assert last_dates == expected_dates
+
+
+def test_store_is_reused_until_source_changes(history_copy, monkeypatch):
+    store_path, manifest_path = get_store_paths(history_copy)
+    ensure_feature_store(history_copy)
+    assert os.path.exists(store_path) and os.path.exists(manifest_path)
+
+    builds = []
+    read_history_csv = feature_store.read_history_csv
+    monkeypatch.setattr(feature_store, 'read_history_csv', lambda path: builds.append(path) or read_history_csv(path))
+
+    # Touching the file without changing its content keeps the store
+    os.utime(history_copy, ns=(0, 0))
+    ensure_feature_store(history_copy)
+    assert builds == []
+
+    with open(history_copy, 'a') as f:
+        f.write('2025-01-01,BRONX,9000.5,2025,1,1,2,1,1,0,1,1,0,1,,,\n')
+    df = load_feature_frame(history_copy, boroughs=['BRONX'])
+    assert len(builds) == 1
+    assert df['date'].iloc[-1] == pd.Timestamp('2025-01-01')
+    assert df['consumption_(hcf)'].iloc[-1] == np.float32(9000.5)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from AI_feeds.features import add_engineered_features, get_feature_columns
+from tests.feature_benchmark import legacy_add_engineered_features
+
+HISTORY_CSV = 'AI_feeds/high_quality_water_consumption.csv'
+
+
+# The legacy fillna(inplace=True) is a no-op chained assignment under copy-on-write
+legacy_fillna_warning = pytest.mark.filterwarnings("ignore::pandas.errors.ChainedAssignmentError")
+
+
+def load_history(rows=2000):
+    df = pd.read_csv(HISTORY_CSV, nrows=rows)
+    df['date'] = pd.to_datetime(df['date'])
+    return df.sort_values('date')
+
+
+def assert_matches_legacy(actual, expected, columns):
+    """Computed values match exactly; gaps the legacy fill left as NaN hold the column mean"""
+    actual = actual[columns].to_numpy(dtype=float)
+    expected = expected[columns].to_numpy(dtype=float)
+    gaps = np.isnan(expected)
+    np.testing.assert_allclose(actual[~gaps], expected[~gaps], rtol=1e-9)
+    column_means = np.broadcast_to(np.nanmean(expected, axis=0), expected.shape)
+    np.testing.assert_allclose(actual[gaps], column_means[gaps], rtol=1e-9)
+
+
+@legacy_fillna_warning
+def test_engine_matches_legacy_features():
+    df = load_history()
+
+    expected = legacy_add_engineered_features(df.copy())
+    actual = add_engineered_features(df.copy())
+
+    columns = get_feature_columns()[7:-1]
+    assert expected[columns].isnull().any().any()
+    assert_matches_legacy(actual, expected, columns)
+    assert not actual[columns].isnull().any().any()
+
+
+def test_windows_do_not_cross_boroughs():
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02']),
+        'borough': ['A', 'B', 'A', 'B'],
+        'consumption_(hcf)': [1.0, 100.0, 3.0, 300.0],
+        'day_of_year': [1, 1, 2, 2],
+        'month': [1, 1, 1, 1],
+        'week_of_year': [1, 1, 1, 1],
+    })
+
+    result = add_engineered_features(df)
+
+    assert result['rolling_mean_7d'].tolist() == [1.0, 100.0, 2.0, 200.0]
+    assert result['rolling_max_30d'].tolist() == [1.0, 100.0, 3.0, 300.0]
+    assert result['consumption_lag_1'].tolist()[2:] == [1.0, 100.0]
+
+
+@legacy_fillna_warning
+def test_input_index_order_is_preserved():
+    df = load_history(500).sample(frac=1.0, random_state=0).sort_values('date', kind='stable')
+    df.index = np.arange(len(df))[::-1]
+
+    expected = legacy_add_engineered_features(df.copy())
+    actual = add_engineered_features(df.copy())
+
+    assert_matches_legacy(actual, expected, ['rolling_std_14d', 'consumption_lag_7'])
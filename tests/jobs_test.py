@@ -0,0 +1,170 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from jobs import JobQueueFullError, PredictionJobQueue
+
+
+def make_upload(tmp_path, name="upload.csv"):
+    path = tmp_path / name
+    path.write_text("date,borough\n")
+    return str(path)
+
+
+async def run_stages(job, set_stage):
+    for stage in ["predict", "ipfs", "oracle", "analytics"]:
+        await set_stage(stage)
+    return {"status": "success", "upload": job["upload_path"]}
+
+
+async def wait_until_finished(queue, job_id):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_runs_every_stage_and_reports_progress(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    upload = make_upload(tmp_path)
+    updates = []
+
+    async def on_update(job):
+        updates.append((job["status"], job["stage"]))
+
+    async def scenario():
+        queue = PredictionJobQueue(run_stages, db_path=db_path, workers=1, on_update=on_update)
+        await queue.start()
+        job = await queue.submit(upload, "0x" + "a" * 40, "upload.csv")
+        finished = await wait_until_finished(queue, job["id"])
+        await queue.stop()
+        return finished
+
+    finished = asyncio.run(scenario())
+
+    assert finished["status"] == "completed"
+    assert finished["result"] == {"status": "success", "upload": upload}
+    assert finished["completed_stages"] == ["predict", "ipfs", "oracle", "analytics"]
+    assert updates == [("queued", None), ("running", "predict"), ("running", "ipfs"),
+                       ("running", "oracle"), ("running", "analytics"), ("completed", None)]
+    assert not (tmp_path / "upload.csv").exists()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT status FROM prediction_jobs").fetchall() == [("completed",)]
+    conn.close()
+
+
+def test_failed_job_records_stage_and_error(tmp_path):
+    async def fail_at_ipfs(job, set_stage):
+        await set_stage("predict")
+        await set_stage("ipfs")
+        raise RuntimeError("IPFS unavailable")
+
+    async def scenario():
+        queue = PredictionJobQueue(fail_at_ipfs, db_path=str(tmp_path / "jobs.db"), workers=1)
+        await queue.start()
+        job = await queue.submit(make_upload(tmp_path), "0x" + "a" * 40)
+        finished = await wait_until_finished(queue, job["id"])
+        await queue.stop()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert finished["status"] == "failed"
+    assert finished["stage"] == "ipfs"
+    assert finished["completed_stages"] == ["predict"]
+    assert finished["error"] == "IPFS unavailable"
+
+
+def test_submissions_beyond_max_pending_are_rejected(tmp_path):
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def blocked(job, set_stage):
+            await gate.wait()
+            return {}
+
+        queue = PredictionJobQueue(blocked, db_path=str(tmp_path / "jobs.db"), workers=1, max_pending=1)
+        await queue.start()
+        await queue.submit(make_upload(tmp_path, "a.csv"), "0x1")
+        await asyncio.sleep(0.05)  # the worker picks up the first job
+        await queue.submit(make_upload(tmp_path, "b.csv"), "0x1")
+        with pytest.raises(JobQueueFullError):
+            await queue.submit(make_upload(tmp_path, "c.csv"), "0x1")
+        gate.set()
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unfinished_jobs_are_recovered_on_start(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    upload = make_upload(tmp_path)
+
+    async def never_finishes(job, set_stage):
+        await set_stage("predict")
+        await asyncio.Event().wait()
+
+    async def first_process():
+        queue = PredictionJobQueue(never_finishes, db_path=db_path, workers=1)
+        await queue.start()
+        kept = await queue.submit(upload, "0x1")
+        lost = await queue.submit(str(tmp_path / "missing.csv"), "0x1")
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return kept["id"], lost["id"]
+
+    async def second_process(kept_id, lost_id):
+        queue = PredictionJobQueue(run_stages, db_path=db_path, workers=1)
+        await queue.start()
+        kept = await wait_until_finished(queue, kept_id)
+        lost = await queue.get(lost_id)
+        await queue.stop()
+        return kept, lost
+
+    kept_id, lost_id = asyncio.run(first_process())
+    kept, lost = asyncio.run(second_process(kept_id, lost_id))
+    assert kept["status"] == "completed"
+    assert lost["status"] == "failed"
+
+
+def test_job_interrupted_after_ipfs_is_not_run_again(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    upload = make_upload(tmp_path)
+    runs = []
+
+    async def stops_at_oracle(job, set_stage):
+        await set_stage("predict")
+        await set_stage("ipfs")
+        await set_stage("oracle", {"prediction_id": "p-1", "ipfsHash": "Qm123"})
+        await asyncio.Event().wait()
+
+    async def first_process():
+        queue = PredictionJobQueue(stops_at_oracle, db_path=db_path, workers=1)
+        await queue.start()
+        job = await queue.submit(upload, "0x1")
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return job["id"]
+
+    async def counting_runner(job, set_stage):
+        runs.append(job["id"])
+        return await run_stages(job, set_stage)
+
+    async def second_process(job_id):
+        queue = PredictionJobQueue(counting_runner, db_path=db_path, workers=1)
+        await queue.start()
+        await asyncio.sleep(0.05)
+        job = await queue.get(job_id)
+        await queue.stop()
+        return job
+
+    job_id = asyncio.run(first_process())
+    job = asyncio.run(second_process(job_id))
+
+    assert runs == []
+    assert job["status"] == "needs_review" and job["stage"] == "oracle"
+    assert job["result"] == {"prediction_id": "p-1", "ipfsHash": "Qm123"}
+    assert job["completed_stages"] == ["predict", "ipfs"]
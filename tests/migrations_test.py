@@ -0,0 +1,107 @@
+import pytest
+
+from migrations import MIGRATIONS, migrate, schema_version
+from prediction_catalog import create_catalog_table
+from report_rollups import create_rollup_tables
+from storage import ConnectionPool
+
+# The queries the dashboard runs on every feed refresh, stream update and report
+HOT_QUERIES = {
+    "activity feed": ('''
+        SELECT activity_type, title, description, metadata, timestamp, severity
+        FROM recent_activities ORDER BY timestamp DESC LIMIT ?
+    ''', (20,)),
+    "real-time consumption": ('''
+        SELECT borough, consumption, timestamp FROM real_time_consumption
+        ORDER BY timestamp DESC LIMIT 100
+    ''', ()),
+    "consumption trend": ('''
+        SELECT borough, AVG(consumption_value), COUNT(*) FROM analytics_events
+        WHERE event_type = ? AND timestamp >= datetime('now', '-30 days')
+        GROUP BY borough
+    ''', ("consumption_data",)),
+    "recent activity window": ('''
+        SELECT COUNT(*) FROM recent_activities WHERE timestamp >= datetime('now', '-30 days')
+    ''', ()),
+    "report activity rollup": ('''
+        SELECT activity_type, SUM(activities), MAX(last_activity) FROM daily_activity_rollup
+        WHERE day >= date('now', ?) GROUP BY activity_type
+    ''', ("-30 days",)),
+    "report event rollup": ('''
+        SELECT borough, SUM(value_sum), SUM(value_count), SUM(events) FROM daily_event_rollup
+        WHERE event_type = ? AND day >= date('now', ?) GROUP BY borough
+    ''', ("consumption", "-30 days")),
+}
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "schema.db"))
+    yield pool
+    pool.close()
+
+
+def test_fresh_database_gets_every_migration_once(pool):
+    with pool.transaction() as conn:
+        assert migrate(conn) == [version for version, _, _ in MIGRATIONS]
+    with pool.transaction() as conn:
+        assert migrate(conn) == []
+        assert schema_version(conn) == MIGRATIONS[-1][0]
+
+
+def test_database_from_before_migrations_keeps_its_rows(pool):
+    pool.execute('''
+        CREATE TABLE recent_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, activity_type TEXT NOT NULL, title TEXT NOT NULL,
+            description TEXT, metadata JSON, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id TEXT DEFAULT 'system', severity TEXT DEFAULT 'info'
+        )
+    ''')
+    pool.execute("INSERT INTO recent_activities (activity_type, title) VALUES ('system', 'kept')")
+
+    with pool.transaction() as conn:
+        migrate(conn)
+
+    assert pool.fetchone('SELECT title FROM recent_activities')[0] == "kept"
+    indexes = {row[0] for row in pool.fetchall("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_recent_activities_time" in indexes
+
+
+def test_failed_migration_is_rolled_back_and_retried(pool):
+    def broken(conn):
+        conn.execute('CREATE TABLE half_done (id INTEGER)')
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            migrate(conn, MIGRATIONS + [(99, "broken", broken)])
+
+    with pool.transaction() as conn:
+        assert schema_version(conn) == 0
+        assert migrate(conn) == [version for version, _, _ in MIGRATIONS]
+    assert pool.fetchone("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'")[0] == 0
+
+
+def test_hot_queries_never_scan_a_whole_table(pool):
+    with pool.transaction() as conn:
+        migrate(conn)
+        create_catalog_table(conn)
+        create_rollup_tables(conn)
+
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = [row[3] for row in pool.fetchall("EXPLAIN QUERY PLAN " + sql, params)]
+        for step in plan:
+            # "SCAN t" alone reads every row; "SCAN t USING INDEX" walks an index in order and stops at LIMIT
+            assert not (step.startswith("SCAN") and "INDEX" not in step), f"{name}: {plan}"
+        if "ORDER BY" in sql:
+            assert not any("TEMP B-TREE" in step for step in plan), f"{name} sorts: {plan}"
+
+
+def test_real_time_read_is_covered_by_its_index(pool):
+    with pool.transaction() as conn:
+        migrate(conn)
+    sql, params = HOT_QUERIES["real-time consumption"]
+
+    plan = [row[3] for row in pool.fetchall("EXPLAIN QUERY PLAN " + sql, params)]
+
+    assert plan == ["SCAN real_time_consumption USING COVERING INDEX idx_real_time_consumption_time"]
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import pytest
+
+from AI_feeds.model_registry import ModelRegistry
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, path):
+        with self.lock:
+            self.calls += 1
+        with open(path) as f:
+            return f.read()
+
+
+def write_artifacts(tmp_path, content="v1"):
+    paths = []
+    for name in ["model.h5", "scaler.joblib", "encoder.joblib"]:
+        path = tmp_path / name
+        path.write_text(f"{name}:{content}")
+        paths.append(str(path))
+    return paths
+
+
+def make_registry(paths, loader):
+    return ModelRegistry(*paths, check_interval=0, model_loader=loader, artifact_loader=loader)
+
+
+def test_artifacts_are_loaded_once(tmp_path):
+    loader = CountingLoader()
+    registry = make_registry(write_artifacts(tmp_path), loader)
+
+    first = registry.get()
+    second = registry.get()
+
+    assert first is second
+    assert loader.calls == 3
+    assert registry.stats()["version"] == 1
+    assert registry.stats()["load_time_s"] is not None
+
+
+def test_changed_files_are_hot_swapped(tmp_path):
+    loader = CountingLoader()
+    paths = write_artifacts(tmp_path)
+    registry = make_registry(paths, loader)
+    old = registry.get()
+
+    write_artifacts(tmp_path, "v2")
+    stat = os.stat(paths[0])
+    os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    new = registry.get()
+
+    assert new is not old
+    assert new.version == 2
+    assert new.model.endswith("v2")
+    assert new.scaler.endswith("v2")
+    assert old.model.endswith("v1")
+
+
+def test_failed_reload_keeps_serving_previous_version(tmp_path):
+    paths = write_artifacts(tmp_path)
+    loader = CountingLoader()
+    registry = make_registry(paths, loader)
+    old = registry.get()
+
+    def broken_loader(path):
+        raise ValueError("truncated file")
+
+    registry._model_loader = broken_loader
+    stat = os.stat(paths[0])
+    os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert registry.get() is old
+    assert registry.stats()["reload_failures"] == 1
+
+
+def test_missing_artifacts_raise(tmp_path):
+    registry = make_registry([str(tmp_path / "missing")] * 3, CountingLoader())
+    with pytest.raises(FileNotFoundError):
+        registry.get()
+
+
+def test_concurrent_requests_share_one_load(tmp_path):
+    loader = CountingLoader()
+    registry = make_registry(write_artifacts(tmp_path), loader)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(registry.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 3
+    assert len({id(bundle) for bundle in results}) == 1
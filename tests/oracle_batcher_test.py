@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+from executors import ExecutorSaturatedError
+from oracle_batcher import SubmissionBatcher
+from oracle_client import NOT_SENT, OracleError, OracleTimeoutError
+
+
+class FakeClient:
+    """Answers submitBatch from a script of per-round outcomes"""
+
+    def __init__(self, rounds=None):
+        self.rounds = list(rounds or [])
+        self.batches = []
+
+    def request(self, method, params=None, timeout=None):
+        assert method == "submitBatch"
+        submissions = params["submissions"]
+        self.batches.append([item["ipfsHash"] for item in submissions])
+        outcome = self.rounds.pop(0) if self.rounds else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        results = []
+        for index, item in enumerate(submissions):
+            error = outcome(index, item) if outcome else None
+            if error:
+                results.append({"ok": False, "error": error})
+            else:
+                results.append({"ok": True, "result": {"txHash": f"0x{item['ipfsHash']}", "nonce": index}})
+        return {"results": results}
+
+
+def make_batcher(client, **kwargs):
+    async def run_blocking(func, *args):
+        return func(*args)
+    return SubmissionBatcher(client_factory=lambda: client, run_blocking=run_blocking, **kwargs)
+
+
+def test_submissions_within_window_share_one_round():
+    client = FakeClient()
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=50, max_batch=10)
+        return await asyncio.gather(*(batcher.submit(f"p{i}", f"Qm{i}", 80) for i in range(3)))
+
+    results = asyncio.run(scenario())
+
+    assert client.batches == [["Qm0", "Qm1", "Qm2"]]
+    assert [result["predictionId"] for result in results] == ["p0", "p1", "p2"]
+    assert [result["txHash"] for result in results] == ["0xQm0", "0xQm1", "0xQm2"]
+
+
+def test_full_batch_is_sent_without_waiting_for_window():
+    client = FakeClient()
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=10000, max_batch=2)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(f"p{i}", f"Qm{i}", 80) for i in range(4))), timeout=2
+        )
+
+    results = asyncio.run(scenario())
+
+    assert client.batches == [["Qm0", "Qm1"], ["Qm2", "Qm3"]]
+    assert len(results) == 4
+
+
+def test_retryable_failures_are_resubmitted():
+    nonce_error = {"message": "nonce too low", "code": "NONCE", "retryable": True}
+    client = FakeClient(rounds=[lambda index, item: nonce_error if item["ipfsHash"] == "Qm1" else None])
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=10, max_batch=10, max_retries=2)
+        results = await asyncio.gather(*(batcher.submit(f"p{i}", f"Qm{i}", 80) for i in range(3)))
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert client.batches == [["Qm0", "Qm1", "Qm2"], ["Qm1"]]
+    assert results[1]["predictionId"] == "p1"
+    assert stats["retries"] == 1 and stats["submitted"] == 3 and stats["failures"] == 0
+
+
+def test_gives_up_after_max_retries_and_on_permanent_errors():
+    network_error = {"message": "connection refused", "code": "NETWORK", "retryable": True}
+    invalid = {"message": "bad score", "code": "INVALID_PARAMS", "retryable": False}
+    client = FakeClient(rounds=[
+        lambda index, item: network_error if item["ipfsHash"] == "QmA" else invalid,
+        lambda index, item: network_error
+    ])
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=10, max_retries=1)
+        return await asyncio.gather(batcher.submit("a", "QmA", 80), batcher.submit("b", "QmB", 80),
+                                    return_exceptions=True)
+
+    network_failure, invalid_failure = asyncio.run(scenario())
+
+    assert isinstance(network_failure, OracleError) and network_failure.code == "NETWORK"
+    assert isinstance(invalid_failure, OracleError) and invalid_failure.code == "INVALID_PARAMS"
+    assert client.batches == [["QmA", "QmB"], ["QmA"]]
+
+
+def test_unsent_round_is_retried_but_a_possibly_sent_one_is_not():
+    client = FakeClient(rounds=[OracleError("Oracle worker could not start", NOT_SENT),
+                                OracleError("Oracle worker exited with code 1"),
+                                OracleError("Oracle worker could not start", NOT_SENT),
+                                OracleTimeoutError("Oracle submitBatch timed out")])
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=10, max_retries=2)
+        return await asyncio.gather(batcher.submit("a", "QmA", 80), return_exceptions=True)
+
+    (exited,) = asyncio.run(scenario())
+    assert isinstance(exited, OracleError) and "exited" in str(exited)
+    assert client.batches == [["QmA"], ["QmA"]]
+
+    (timed_out,) = asyncio.run(scenario())
+    assert isinstance(timed_out, OracleTimeoutError)
+    assert client.batches == [["QmA"], ["QmA"], ["QmA"], ["QmA"]]
+
+
+def test_round_rejected_by_a_saturated_pool_is_retried():
+    client = FakeClient()
+    rejections = [ExecutorSaturatedError("io pool has 64 waiting tasks")]
+
+    async def run_blocking(func, *args):
+        if rejections:
+            raise rejections.pop()
+        return func(*args)
+
+    async def scenario():
+        batcher = SubmissionBatcher(client_factory=lambda: client, run_blocking=run_blocking,
+                                    window_ms=10, max_retries=1)
+        return await batcher.submit("p", "QmP", 80), batcher.stats()
+
+    result, stats = asyncio.run(scenario())
+
+    assert result["txHash"] == "0xQmP"
+    assert client.batches == [["QmP"]]
+    assert stats["retries"] == 1 and stats["failures"] == 0
+
+
+def test_unconfirmed_broadcast_is_not_resubmitted():
+    unconfirmed = {"message": "Transaction 0xabc may have been sent", "code": "UNCONFIRMED", "retryable": False}
+    client = FakeClient(rounds=[lambda index, item: unconfirmed])
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=10, max_retries=2)
+        return await asyncio.gather(batcher.submit("a", "QmA", 80), return_exceptions=True)
+
+    (failure,) = asyncio.run(scenario())
+
+    assert isinstance(failure, OracleError) and failure.code == "UNCONFIRMED"
+    assert client.batches == [["QmA"]]
+
+
+def test_close_flushes_pending_submissions():
+    client = FakeClient()
+
+    async def scenario():
+        batcher = make_batcher(client, window_ms=10000)
+        pending = asyncio.ensure_future(batcher.submit("p", "QmA", 80))
+        await asyncio.sleep(0)
+        await batcher.close()
+        return await pending
+
+    assert asyncio.run(scenario())["predictionId"] == "p"
+    assert client.batches == [["QmA"]]
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from oracle_batcher import SubmissionBatcher
+from oracle_client import OracleError, OracleWorkerClient
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Well-known development key (Hardhat account #0), never funded on a real network
+TEST_PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+TEST_ADDRESS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+CONTRACT_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("node") is None or not os.path.isdir(os.path.join(REPO_ROOT, "node_modules", "ethers")),
+    reason="Node.js with ethers is required for the oracle worker"
+)
+
+
+class StandInNode:
+    """Minimal JSON-RPC node that records raw transactions"""
+
+    def __init__(self, start_nonce=5):
+        self.start_nonce = start_nonce
+        self.raw_transactions = []
+        self.calls = []
+        self.reject_next_send = None
+        # (seconds, accepted): hold the next send's reply, having accepted the transaction or not
+        self.stall_next_send = None
+        self.accepted_while_stalled = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                requests = body if isinstance(body, list) else [body]
+                responses = [node.handle(request) for request in requests]
+                payload = json.dumps(responses if isinstance(body, list) else responses[0]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handle(self, request):
+        method = request["method"]
+        self.calls.append(method)
+        result = None
+        if method == "eth_chainId":
+            result = hex(97)
+        elif method == "net_version":
+            result = "97"
+        elif method == "eth_blockNumber":
+            result = hex(1000)
+        elif method == "eth_getTransactionCount":
+            result = hex(self.start_nonce + len(self.raw_transactions))
+        elif method == "eth_gasPrice":
+            result = hex(10 ** 10)
+        elif method == "eth_getTransactionByHash":
+            # The stand-in can't hash raw transactions: it knows every hash once a stalled send was accepted
+            result = {"hash": request["params"][0]} if self.accepted_while_stalled else None
+        elif method == "eth_sendRawTransaction":
+            if self.stall_next_send:
+                (seconds, accepted), self.stall_next_send = self.stall_next_send, None
+                if accepted:
+                    self.raw_transactions.append(request["params"][0])
+                    self.accepted_while_stalled.append(request["params"][0])
+                time.sleep(seconds)
+                return {"jsonrpc": "2.0", "id": request["id"], "result": "0x" + "00" * 32}
+            if self.reject_next_send:
+                message, self.reject_next_send = self.reject_next_send, None
+                return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": message}}
+            self.raw_transactions.append(request["params"][0])
+            result = "0x" + "00" * 32
+        else:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32601, "message": "not supported"}}
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def node():
+    stand_in = StandInNode()
+    yield stand_in
+    stand_in.close()
+
+
+def make_client(node, private_key=TEST_PRIVATE_KEY, **extra_env):
+    env = {
+        "SMART_CONTRACT_ADDRESS": CONTRACT_ADDRESS,
+        "ORACLE_PRIVATE_KEY": private_key,
+        "ORACLE_ADDRESS": TEST_ADDRESS,
+        "ORACLE_RPC_URLS": node.url,
+        "ORACLE_CHAIN_ID": "97",
+        **extra_env
+    }
+    return OracleWorkerClient(script="oracle_worker.js", cwd=REPO_ROOT, env=env, startup_timeout=30)
+
+
+def test_concurrent_submissions_get_sequential_nonces(node):
+    client = make_client(node)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda i: client.submit(f"QmHash{i}", 80 + i), range(4)))
+        status = client.status()
+    finally:
+        client.close()
+
+    assert sorted(result["nonce"] for result in results) == [5, 6, 7, 8]
+    assert len({result["txHash"] for result in results}) == 4
+    assert all(result["txHash"].startswith("0x") and len(result["txHash"]) == 66 for result in results)
+    assert len(node.raw_transactions) == 4
+    # The worker connected and synced the nonce once, not once per submission
+    assert node.calls.count("eth_getTransactionCount") == 1
+    assert status["address"] == TEST_ADDRESS and status["nextNonce"] == 9 and status["submitted"] == 4
+
+
+def test_nonce_error_resyncs_and_retries(node):
+    client = make_client(node)
+    try:
+        client.submit("QmFirst", 90)
+        node.start_nonce += 3  # transactions sent by someone else
+        node.reject_next_send = "nonce too low"
+        result = client.submit("QmSecond", 91)
+    finally:
+        client.close()
+
+    assert result["nonce"] == 9
+    assert len(node.raw_transactions) == 2
+
+
+def test_invalid_submission_returns_structured_error(node):
+    client = make_client(node)
+    try:
+        with pytest.raises(OracleError) as error:
+            client.submit("QmHash", 250)
+        assert error.value.code == "INVALID_PARAMS"
+        # The worker keeps serving after an error
+        assert client.request("ping") == {"pong": True}
+    finally:
+        client.close()
+
+
+def test_simulates_without_private_key(node):
+    client = make_client(node, private_key="")
+    try:
+        result = client.submit("QmHash", 80)
+    finally:
+        client.close()
+
+    assert result["simulated"] is True and result["txHash"] is None
+    assert node.raw_transactions == []
+
+
+def test_worker_is_restarted_after_exit(node):
+    client = make_client(node)
+    try:
+        client.submit("QmFirst", 80)
+        client._process.kill()
+        client._process.wait()
+        assert client.submit("QmSecond", 80)["nonce"] == 6
+    finally:
+        client.close()
+
+
+def test_batch_gets_contiguous_nonces_and_per_item_results(node):
+    client = make_client(node)
+    try:
+        response = client.request("submitBatch", {"submissions": [
+            {"ipfsHash": "QmA", "confidenceScore": 80},
+            {"ipfsHash": "QmBad", "confidenceScore": 300},
+            {"ipfsHash": "QmB", "confidenceScore": 81},
+            {"ipfsHash": "QmC", "confidenceScore": 82}
+        ]})
+        status = client.status()
+    finally:
+        client.close()
+
+    results = response["results"]
+    assert [result["ok"] for result in results] == [True, False, True, True]
+    assert results[1]["error"]["code"] == "INVALID_PARAMS" and results[1]["error"]["retryable"] is False
+    assert [results[i]["result"]["nonce"] for i in (0, 2, 3)] == [5, 6, 7]
+    assert len(node.raw_transactions) == 3
+    assert node.calls.count("eth_gasPrice") == 1
+    assert status["nextNonce"] == 8 and status["submitted"] == 3 and status["failed"] == 1
+
+
+def test_batcher_sends_concurrent_submissions_in_one_round(node):
+    client = make_client(node)
+
+    async def scenario():
+        batcher = SubmissionBatcher(client_factory=lambda: client, window_ms=100, max_batch=10,
+                                    run_blocking=lambda func, *args: asyncio.to_thread(func, *args))
+        results = await asyncio.gather(*(batcher.submit(f"pred-{i}", f"QmHash{i}", 80 + i) for i in range(4)))
+        return results, batcher.stats()
+
+    try:
+        results, stats = asyncio.run(scenario())
+    finally:
+        client.close()
+
+    assert [result["predictionId"] for result in results] == ["pred-0", "pred-1", "pred-2", "pred-3"]
+    assert [result["nonce"] for result in results] == [5, 6, 7, 8]
+    assert stats["batches"] == 1 and stats["submitted"] == 4
+
+
+def test_broadcast_timeout_is_not_signed_again(node):
+    client = make_client(node, ORACLE_BROADCAST_TIMEOUT_MS="300")
+    node.stall_next_send = (1.5, False)
+
+    async def scenario():
+        batcher = SubmissionBatcher(client_factory=lambda: client, window_ms=10, max_retries=2,
+                                    run_blocking=lambda func, *args: asyncio.to_thread(func, *args))
+        return await asyncio.gather(batcher.submit("pred-1", "QmTimeout", 80), return_exceptions=True)
+
+    try:
+        (failure,) = asyncio.run(scenario())
+    finally:
+        client.close()
+
+    assert isinstance(failure, OracleError) and failure.code == "UNCONFIRMED"
+    # One signed transaction, broadcast once: the timed-out item was not re-signed with a new nonce
+    assert node.calls.count("eth_sendRawTransaction") == 1
+    assert "eth_getTransactionByHash" in node.calls
+
+
+def test_timed_out_broadcast_found_by_hash_counts_as_sent(node):
+    client = make_client(node, ORACLE_BROADCAST_TIMEOUT_MS="300")
+    node.stall_next_send = (1.5, True)
+    try:
+        response = client.request("submitBatch", {"submissions": [{"ipfsHash": "QmSlow", "confidenceScore": 80}]})
+    finally:
+        client.close()
+
+    (result,) = response["results"]
+    assert result["ok"] and result["result"]["nonce"] == 5
+    assert node.calls.count("eth_sendRawTransaction") == 1
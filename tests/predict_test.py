@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from AI_feeds import model_registry
+from AI_feeds.predict import predict_boroughs
+from tests.feature_benchmark import legacy_add_engineered_features
+
+HISTORY_CSV = 'AI_feeds/high_quality_water_consumption.csv'
+
+
+def legacy_make_prediction(borough_name, historical_data_path):
+    """Previous implementation: one borough per call, features rebuilt from the full CSV"""
+    bundle = model_registry.get_model_registry().get()
+    model = bundle.model
+    scaler = bundle.scaler
+    borough_encoder = bundle.borough_encoder
+
+    # Load and preprocess historical data
+    df = pd.read_csv(historical_data_path)
+    df['date'] = pd.to_datetime(df['date'])
+
+    # Filter for the specified borough
+    df = df[df['borough'] == borough_name].copy()
+    if len(df) == 0:
+        raise ValueError(f"No data found for borough: {borough_name}")
+
+    # Sort by date
+    df = df.sort_values('date')
+
+    # Add time-based features
+    df['year'] = df['date'].dt.year
+    df['month'] = df['date'].dt.month
+    df['day_of_month'] = df['date'].dt.day
+    df['day_of_week'] = df['date'].dt.dayofweek
+    df['day_of_year'] = df['date'].dt.dayofyear
+    df['week_of_year'] = df['date'].dt.isocalendar().week
+
+    # Encode borough
+    df['borough_encoded'] = borough_encoder.transform([borough_name])[0]
+
+    # Add engineered features
+    df = legacy_add_engineered_features(df)
+
+    # Prepare feature columns in the correct order
+    feature_columns = [
+        'year', 'month', 'day_of_month', 'day_of_week', 'day_of_year', 'week_of_year',
+        'borough_encoded', 'hour', 'day_sin', 'day_cos', 'month_sin', 'month_cos',
+        'week_sin', 'week_cos'
+    ]
+
+    # Add rolling statistics and lag features
+    for window in [7, 14, 30]:
+        feature_columns.extend([
+            f'rolling_mean_{window}d', f'rolling_std_{window}d',
+            f'rolling_max_{window}d', f'rolling_min_{window}d'
+        ])
+
+    for lag in [1, 7, 14]:
+        feature_columns.append(f'consumption_lag_{lag}')
+
+    # Add target variable as the last column
+    feature_columns.append('consumption_(hcf)')
+
+    # Get the last 14 days of data
+    sequence_length = 14
+    last_sequence = df[feature_columns].values[-sequence_length:]
+
+    # Scale the features
+    scaled_sequence = scaler.transform(last_sequence)
+
+    # Remove the target column and reshape for LSTM
+    X_pred = scaled_sequence[:, :-1].reshape(1, sequence_length, len(feature_columns)-1)
+
+    # Make prediction
+    scaled_prediction = model.predict(X_pred, verbose=0)
+
+    # Inverse transform the prediction
+    dummy_array = np.zeros((1, len(feature_columns)))
+    dummy_array[0, -1] = scaled_prediction[0, 0]
+    prediction = scaler.inverse_transform(dummy_array)[0, -1]
+
+    # Get the date for the prediction
+    last_date = df['date'].iloc[-1]
+    next_date = last_date + timedelta(days=1)
+
+    return prediction, next_date
+
+
+class RecordingModel:
+    """Deterministic stand-in for the LSTM that records batch shapes"""
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def predict(self, X, verbose=0):
+        self.batch_shapes.append(X.shape)
+        return (X.mean(axis=(1, 2)) * 0.5 + X[:, -1, 0] * 0.1).reshape(-1, 1)
+
+
+@pytest.fixture
+def recording_model(monkeypatch):
+    model = RecordingModel()
+    registry = model_registry.ModelRegistry(model_loader=lambda path: model)
+    key = (model_registry.DEFAULT_MODEL_PATH, model_registry.DEFAULT_SCALER_PATH,
+           model_registry.DEFAULT_ENCODER_PATH)
+    monkeypatch.setitem(model_registry._registries, key, registry)
+    return model
+
+
+def test_all_boroughs_share_one_forward_pass(recording_model):
+    boroughs = ['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS']
+
+    predictions, dates = predict_boroughs(boroughs, HISTORY_CSV)
+
+    assert recording_model.batch_shapes == [(4, 14, 29)]
+    assert len(predictions) == len(dates) == 4
+
+
+# The columnar feature store keeps features as float32
+@pytest.mark.filterwarnings("ignore::pandas.errors.ChainedAssignmentError")  # the legacy no-op fillna(inplace=True)
+@pytest.mark.parametrize('use_feature_state, rtol', [(True, 1e-9), (False, 1e-6)])
+def test_batched_predictions_match_legacy_per_borough_path(recording_model, use_feature_state, rtol):
+    boroughs = ['BRONX', 'BROOKLYN', 'MANHATTAN', 'QUEENS']
+
+    predictions, dates = predict_boroughs(boroughs, HISTORY_CSV, use_feature_state=use_feature_state)
+
+    expected = [legacy_make_prediction(borough, HISTORY_CSV) for borough in boroughs]
+    np.testing.assert_allclose(predictions, [prediction for prediction, _ in expected], rtol=rtol)
+    assert dates == [date for _, date in expected]
+
+
+def test_unknown_borough_is_rejected(recording_model):
+    with pytest.raises(ValueError):
+        predict_boroughs(['ATLANTIS'], HISTORY_CSV)
@@ -0,0 +1,177 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from prediction_catalog import PredictionCatalog, create_catalog_table, encode_cursor
+from storage import ConnectionPool
+
+
+def write_prediction(outputs_dir, stamp, prediction_id, ipfs_hash=None, confidence=91.5, boroughs=("BRONX", "QUEENS")):
+    data = {
+        "prediction_id": prediction_id,
+        "timestamp": f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]}T{stamp[-6:-4]}:{stamp[-4:-2]}:{stamp[-2:]}Z",
+        "confidence_score": confidence,
+        "predicted_allocation": {borough: {"allocation_hcf": 1} for borough in boroughs},
+        "metadata": {"total_consumption_hcf": 1234.5, "number_of_boroughs": 2},
+    }
+    if ipfs_hash:
+        data["metadata"]["ipfs_hash"] = ipfs_hash
+    path = os.path.join(outputs_dir, f"prediction_{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return path, data
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "catalog.db"))
+    with pool.transaction() as conn:
+        create_catalog_table(conn)
+    outputs_dir = tmp_path / "outputs"
+    outputs_dir.mkdir()
+    yield PredictionCatalog(pool, str(outputs_dir))
+    pool.close()
+
+
+def test_add_and_find_by_id_hash_or_filename(catalog):
+    path, data = write_prediction(catalog.outputs_dir, "20250601_120000", "p-1")
+    catalog.add(path, data)
+    catalog.set_ipfs_hash(path, "QmHash1")
+
+    for key in ("p-1", "QmHash1", "prediction_20250601_120000.json"):
+        entry = catalog.find(key)
+        assert entry["prediction_id"] == "p-1"
+        assert entry["ipfs_hash"] == "QmHash1"
+        assert entry["file_path"] == os.path.abspath(path)
+        assert entry["boroughs"] == ["BRONX", "QUEENS"]
+        assert entry["total_consumption"] == 1234.5 and entry["number_of_boroughs"] == 2
+    assert catalog.find("unknown") is None
+
+
+def test_recent_is_newest_first(catalog):
+    for index, stamp in enumerate(["20250601_100000", "20250601_120000", "20250601_110000"]):
+        catalog.add(write_prediction(catalog.outputs_dir, stamp, f"p-{index}")[0])
+
+    assert [entry["prediction_id"] for entry in catalog.recent(2)] == ["p-1", "p-2"]
+
+
+def test_sync_parses_only_new_files_and_drops_missing(catalog, monkeypatch):
+    old_path, _ = write_prediction(catalog.outputs_dir, "20250601_100000", "p-old", ipfs_hash="QmOld")
+    assert catalog.sync() == (1, 0)
+    assert catalog.find("QmOld")["prediction_id"] == "p-old"
+
+    new_path, _ = write_prediction(catalog.outputs_dir, "20250601_110000", "p-new")
+    with open(os.path.join(catalog.outputs_dir, "error_20250601_110000.json"), "w") as f:
+        f.write("{}")
+    parsed = []
+    original_add = catalog.add
+    monkeypatch.setattr(catalog, "add", lambda path, *args: parsed.append(os.path.basename(path)) or original_add(path, *args))
+
+    assert catalog.sync() == (1, 0)
+    assert parsed == ["prediction_20250601_110000.json"]
+
+    os.remove(old_path)
+    assert catalog.sync() == (0, 1)
+    assert catalog.count() == 1 and catalog.find("p-old") is None
+
+
+def test_unreadable_file_does_not_stop_sync(catalog):
+    with open(os.path.join(catalog.outputs_dir, "prediction_20250601_090000.json"), "w") as f:
+        f.write("not json")
+    write_prediction(catalog.outputs_dir, "20250601_100000", "p-ok")
+
+    assert catalog.sync() == (1, 0)
+    assert catalog.find("p-ok") is not None
+
+
+def query_plan(catalog, sql, params=()):
+    return [row[3] for row in catalog.pool.fetchall("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def test_lookups_use_indexes(catalog):
+    lookup = query_plan(
+        catalog, 'SELECT filename FROM prediction_catalog WHERE prediction_id = ? OR ipfs_hash = ? OR filename = ?',
+        ("a", "b", "c")
+    )
+
+    assert all(step.startswith("SEARCH") for step in lookup if "prediction_catalog" in step)
+    assert len([step for step in lookup if step.startswith("SEARCH")]) == 3
+
+
+def make_year(catalog):
+    """One prediction a day for 2025, alternating boroughs and confidence"""
+    day = datetime(2025, 1, 1)
+    while day.year == 2025:
+        index = day.timetuple().tm_yday
+        write_prediction(catalog.outputs_dir, day.strftime("%Y%m%d_060000"), f"p-{index}",
+                         confidence=60 + index % 40, boroughs=("BRONX",) if index % 2 else ("QUEENS", "BROOKLYN"))
+        day += timedelta(days=1)
+    catalog.sync()
+
+
+def page_through(catalog, **filters):
+    cursor, pages, seen = None, 0, []
+    while True:
+        entries, cursor = catalog.page(50, cursor, **filters)
+        pages += 1
+        seen.extend(entries)
+        if cursor is None:
+            return seen, pages
+
+
+def test_paging_visits_every_prediction_once_newest_first(catalog):
+    make_year(catalog)
+
+    seen, pages = page_through(catalog)
+
+    assert len(seen) == 365 and pages == 8
+    assert len({entry["filename"] for entry in seen}) == 365
+    assert [entry["timestamp"] for entry in seen] == sorted((entry["timestamp"] for entry in seen), reverse=True)
+
+
+def test_filters_combine_with_paging(catalog):
+    make_year(catalog)
+
+    june, _ = page_through(catalog, start="2025-06-01", end="2025-07-01")
+    bronx, _ = page_through(catalog, borough="bronx", min_confidence=90)
+
+    assert len(june) == 30 and all(entry["timestamp"].startswith("2025-06") for entry in june)
+    assert bronx and all(entry["boroughs"] == ["BRONX"] and entry["confidence_score"] >= 90 for entry in bronx)
+    expected = [day for day in range(1, 366) if day % 2 and 60 + day % 40 >= 90]
+    assert len(bronx) == len(expected)
+
+
+def test_new_prediction_does_not_shift_later_pages(catalog):
+    make_year(catalog)
+    first, cursor = catalog.page(10)
+    write_prediction(catalog.outputs_dir, "20260101_060000", "p-new")
+    catalog.sync()
+
+    second, _ = catalog.page(10, cursor)
+
+    assert second[0]["timestamp"] < first[-1]["timestamp"]
+
+
+def test_invalid_cursor_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.page(10, "not-a-cursor")
+    with pytest.raises(ValueError):
+        catalog.page(10, encode_cursor(1, 2))  # well-formed, but not a (timestamp, filename) key
+
+
+def test_pages_are_index_range_reads(catalog):
+    cursor = ("2025-06-01T00:00:00Z", "prediction_20250601_000000.json")
+    plans = {
+        "all": query_plan(catalog, 'SELECT * FROM prediction_catalog AS catalog WHERE (catalog.timestamp, catalog.filename) < (?, ?) '
+                                   'ORDER BY catalog.timestamp DESC, catalog.filename DESC LIMIT 21', cursor),
+        "borough": query_plan(catalog, 'SELECT catalog.* FROM prediction_boroughs AS keys JOIN prediction_catalog AS catalog '
+                                       'ON catalog.filename = keys.filename WHERE keys.borough = ? AND (keys.timestamp, keys.filename) < (?, ?) '
+                                       'ORDER BY keys.timestamp DESC, keys.filename DESC LIMIT 21', ("BRONX", *cursor)),
+    }
+
+    assert plans["all"] == ["SEARCH catalog USING INDEX idx_prediction_catalog_time ((timestamp,filename)<(?,?))"]
+    assert plans["borough"][0].startswith("SEARCH keys USING PRIMARY KEY (borough=? AND (timestamp,filename)<(?,?))")
+    # No separate sort step: the index order is the page order
+    assert not any("TEMP B-TREE" in step for plan in plans.values() for step in plan)
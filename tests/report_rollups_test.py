@@ -0,0 +1,126 @@
+import pytest
+
+from migrations import migrate
+from prediction_catalog import create_catalog_table
+from report_rollups import ReportEngine, clear_rollups, create_rollup_tables
+from storage import ConnectionPool
+
+
+def create_raw_tables(conn):
+    migrate(conn)
+    create_catalog_table(conn)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "reports.db"))
+    with pool.transaction() as conn:
+        create_raw_tables(conn)
+        create_rollup_tables(conn)
+    yield pool
+    pool.close()
+
+
+def activity(pool, activity_type, timestamp=None):
+    if timestamp:
+        pool.execute('INSERT INTO recent_activities (activity_type, title, timestamp) VALUES (?, ?, ?)',
+                     (activity_type, "t", timestamp))
+    else:
+        pool.execute('INSERT INTO recent_activities (activity_type, title) VALUES (?, ?)', (activity_type, "t"))
+
+
+def event(pool, borough, value, days_ago=0, event_type="consumption"):
+    pool.execute(f'''
+        INSERT INTO analytics_events (event_type, borough, consumption_value, timestamp)
+        VALUES (?, ?, ?, datetime('now', '-{days_ago} days'))
+    ''', (event_type, borough, value))
+
+
+def raw_trends(pool):
+    """The query /reports used to run over analytics_events"""
+    rows = pool.fetchall('''
+        SELECT borough, AVG(consumption_value), COUNT(*) FROM analytics_events
+        WHERE event_type = 'consumption' AND timestamp >= date('now', '-30 days')
+        GROUP BY borough
+    ''')
+    return {row[0]: (round(row[1], 2) if row[1] else 0, row[2]) for row in rows}
+
+
+def test_rollups_match_raw_aggregates(pool):
+    engine = ReportEngine(pool)
+    for day in range(40):
+        event(pool, "BRONX", 10 + day, day)
+        event(pool, "QUEENS", 3.5, day)
+        event(pool, "BRONX", 99, day, event_type="quality")
+    event(pool, None, 7)
+    event(pool, "QUEENS", None)
+    for activity_type in ("prediction", "prediction", "approval", "system"):
+        activity(pool, activity_type)
+    activity(pool, "prediction", "2000-01-01 00:00:00")
+
+    trends = {entry["borough"]: (entry["avg_consumption"], entry["data_points"]) for entry in engine.borough_trends()}
+    summary = engine.activity_summary()
+
+    assert trends == raw_trends(pool)
+    assert {entry["type"]: entry["count"] for entry in summary} == {"prediction": 2, "approval": 1, "system": 1}
+    assert engine.utilization(summary) == {
+        "total_activities": 4, "predictions_generated": 2, "approvals_processed": 1, "blockchain_transactions": 0
+    }
+
+
+def test_backfill_covers_rows_written_before_the_rollups(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "legacy.db"))
+    with pool.transaction() as conn:
+        create_raw_tables(conn)
+    event(pool, "BRONX", 4)
+    event(pool, "BRONX", 8)
+    activity(pool, "approval")
+    with pool.transaction() as conn:
+        create_rollup_tables(conn)
+        create_rollup_tables(conn)  # a second startup doesn't backfill again
+    engine = ReportEngine(pool)
+
+    assert engine.borough_trends() == [{"borough": "BRONX", "avg_consumption": 6.0, "data_points": 2}]
+    assert engine.activity_summary()[0]["count"] == 1
+    pool.close()
+
+
+def test_cache_is_invalidated_by_writes(pool):
+    engine = ReportEngine(pool)
+    key = engine.cache_key()
+    engine.store(key, {"report": 1})
+
+    assert engine.cached(engine.cache_key()) == {"report": 1}
+    activity(pool, "prediction")
+    assert engine.cached(engine.cache_key()) is None
+    engine.store(engine.cache_key(), {"report": 2})
+    pool.execute("INSERT INTO prediction_catalog (filename, file_path) VALUES ('prediction_1.json', 'x')")
+    assert engine.cached(engine.cache_key()) is None
+    assert engine.cached(engine.cache_key("other stats")) is None
+    assert engine.hits == 1 and engine.builds == 2
+
+
+def test_clear_rollups_empties_reports(pool):
+    engine = ReportEngine(pool)
+    event(pool, "BRONX", 4)
+    activity(pool, "system")
+    version = engine.version()
+
+    with pool.transaction() as conn:
+        clear_rollups(conn)
+
+    assert engine.borough_trends() == [] and engine.activity_summary() == []
+    assert engine.version() > version
+
+
+def test_report_reads_are_primary_key_range_reads(pool):
+    plans = [
+        [row[3] for row in pool.fetchall("EXPLAIN QUERY PLAN " + sql, params)]
+        for sql, params in (
+            ("SELECT * FROM daily_activity_rollup WHERE day >= date('now', ?)", ("-30 days",)),
+            ("SELECT * FROM daily_event_rollup WHERE event_type = ? AND day >= date('now', ?)", ("consumption", "-30 days")),
+        )
+    ]
+
+    assert plans[0] == ["SEARCH daily_activity_rollup USING PRIMARY KEY (day>?)"]
+    assert plans[1] == ["SEARCH daily_event_rollup USING PRIMARY KEY (event_type=? AND day>?)"]
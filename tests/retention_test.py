@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from migrations import migrate
+from prediction_catalog import create_catalog_table
+from report_rollups import ReportEngine, create_rollup_tables
+from retention import RetentionCompactor
+from storage import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "retention.db"))
+    with pool.transaction() as conn:
+        migrate(conn)
+        create_catalog_table(conn)
+        create_rollup_tables(conn)
+    yield pool
+    pool.close()
+
+
+def insert_days(pool, table, days, per_day=10):
+    """per_day rows for each day offset, an hour past the day mark so none sit on a retention boundary"""
+    rows = {
+        "analytics_events": ('INSERT INTO analytics_events (event_type, borough, consumption_value, timestamp) '
+                             "VALUES ('consumption', 'BRONX', 2.0, datetime('now', ?, '-1 hour'))"),
+        "recent_activities": ('INSERT INTO recent_activities (activity_type, title, timestamp) '
+                              "VALUES ('prediction', 't', datetime('now', ?, '-1 hour'))"),
+        "real_time_consumption": ('INSERT INTO real_time_consumption (borough, consumption, timestamp) '
+                                  "VALUES ('QUEENS', 1.5, datetime('now', ?, '-1 hour'))"),
+    }[table]
+    pool.executemany(rows, [(f"-{day} days", ) for day in days for _ in range(per_day)])
+
+
+def count(pool, table):
+    return pool.fetchone(f'SELECT COUNT(*) FROM {table}')[0]
+
+
+def test_prunes_only_rows_past_retention_in_batches(pool):
+    insert_days(pool, "analytics_events", range(0, 60))
+    insert_days(pool, "recent_activities", range(0, 60))
+    compactor = RetentionCompactor(pool, {"analytics_events": 30, "recent_activities": 0}, batch_size=7, batch_pause_ms=0)
+    writes = pool.writes
+
+    report = compactor.compact()
+
+    assert report["pruned"] == {"analytics_events": 300}
+    assert count(pool, "analytics_events") == 300 and count(pool, "recent_activities") == 600
+    # One transaction per batch, never one DELETE over everything
+    assert pool.writes - writes >= 300 // 7
+    assert compactor.compact()["rows_pruned"] == 0
+
+
+def test_history_survives_in_rollups(pool):
+    insert_days(pool, "analytics_events", range(0, 20))
+    insert_days(pool, "real_time_consumption", range(0, 10), per_day=4)
+    engine = ReportEngine(pool)
+    before = engine.borough_trends()
+    compactor = RetentionCompactor(pool, {"analytics_events": 5, "real_time_consumption": 3}, batch_size=3, batch_pause_ms=0)
+
+    compactor.compact()
+
+    assert engine.borough_trends() == before
+    readings, total, low, high = pool.fetchone(
+        'SELECT SUM(readings), SUM(consumption_sum), MIN(consumption_min), MAX(consumption_max) FROM hourly_consumption_rollup'
+    )
+    assert readings == 7 * 4 and count(pool, "real_time_consumption") == 3 * 4
+    assert total == pytest.approx(readings * 1.5) and low == high == 1.5
+
+
+def test_vacuum_returns_freed_pages(pool):
+    pool.executemany("INSERT INTO recent_activities (activity_type, title, description, timestamp) "
+                     "VALUES ('system', 't', ?, datetime('now', '-100 days'))",
+                     [("x" * 2000,) for _ in range(500)])
+    compactor = RetentionCompactor(pool, {"recent_activities": 30}, batch_size=100, batch_pause_ms=0, vacuum_pages=50)
+    size_before, _ = compactor.database_size()
+
+    report = compactor.compact()
+
+    assert pool.fetchone('PRAGMA auto_vacuum')[0] == 2
+    assert report["rows_pruned"] == 500 and report["pages_freed"] > 0
+    assert report["free_pages"] == 0
+    assert report["database_size_mb"] * 1024 * 1024 < size_before / 2
+
+
+def test_unknown_table_is_rejected(pool):
+    with pytest.raises(ValueError):
+        RetentionCompactor(pool, {"prediction_stats": 30})
+
+
+def test_background_task_reports_each_pass(pool):
+    insert_days(pool, "recent_activities", [100])
+    reports = []
+    compactor = RetentionCompactor(pool, {"recent_activities": 30}, interval_seconds=3600, on_report=reports.append)
+
+    async def scenario():
+        compactor.start()
+        for _ in range(100):
+            if reports:
+                break
+            await asyncio.sleep(0.02)
+        await compactor.close()
+
+    asyncio.run(scenario())
+
+    assert len(reports) == 1 and reports[0]["rows_pruned"] == 10
+    assert compactor.stats()["rows_pruned"] == 10 and compactor.stats()["runs"] == 1
+
+
+def test_batch_selection_is_an_index_range_read(pool):
+    for table in ("analytics_events", "recent_activities", "real_time_consumption"):
+        plan = [row[3] for row in pool.fetchall(
+            f"EXPLAIN QUERY PLAN SELECT id FROM {table} WHERE timestamp < datetime('now', ?) ORDER BY timestamp LIMIT ?",
+            ("-30 days", 500)
+        )]
+        assert len(plan) == 1 and plan[0].startswith(f"SEARCH {table} USING") and "(timestamp<?)" in plan[0]
+
+
+def test_async_report_hook_is_awaited(pool):
+    insert_days(pool, "recent_activities", [100])
+    reports = []
+
+    async def on_report(report):
+        await asyncio.sleep(0)
+        reports.append(report)
+
+    compactor = RetentionCompactor(pool, {"recent_activities": 30}, interval_seconds=3600, on_report=on_report)
+
+    async def scenario():
+        compactor.start()
+        for _ in range(100):
+            if reports:
+                break
+            await asyncio.sleep(0.02)
+        await compactor.close()
+
+    asyncio.run(scenario())
+
+    assert len(reports) == 1 and reports[0]["rows_pruned"] == 10
@@ -0,0 +1,80 @@
+import numpy as np
+
+from AI_feeds.sequences import build_window_index, create_sequences, gather_batch, load_window_index
+
+
+def legacy_create_sequences(data, seq_length):
+    X, y = [], []
+    for i in range(len(data) - seq_length):
+        X.append(data[i:(i + seq_length), :-1])
+        y.append(data[i + seq_length, -1])
+    return np.array(X), np.array(y)
+
+
+def test_views_match_copied_sequences():
+    data = np.random.default_rng(0).random((200, 6)).astype(np.float32)
+
+    X, y = create_sequences(data, 14)
+    expected_X, expected_y = legacy_create_sequences(data, 14)
+
+    assert X.shape == (186, 14, 5)
+    np.testing.assert_array_equal(X, expected_X)
+    np.testing.assert_array_equal(y, expected_y)
+
+
+def test_sequences_do_not_copy_the_data():
+    data = np.arange(300, dtype=np.float32).reshape(100, 3)
+
+    X, y = create_sequences(data, 14)
+
+    assert np.shares_memory(X, data)
+    assert np.shares_memory(y, data)
+
+
+def test_short_data_yields_no_sequences():
+    X, y = create_sequences(np.zeros((10, 4)), 14)
+    assert X.shape == (0, 14, 3)
+    assert y.shape == (0,)
+
+
+def test_gather_batch_copies_only_requested_rows():
+    data = np.arange(300, dtype=np.float64).reshape(100, 3)
+    X, y = create_sequences(data, 14)
+
+    X_batch, y_batch = gather_batch(X, y, np.array([5, 0]))
+
+    assert X_batch.dtype == np.float32 and X_batch.shape == (2, 14, 2)
+    np.testing.assert_array_equal(X_batch[0], data[5:19, :-1])
+    assert y_batch.tolist() == [data[19, -1], data[14, -1]]
+
+
+def interleaved_boroughs(n_days=40, n_boroughs=3):
+    dates = np.repeat(np.datetime64('2024-01-01') + np.arange(n_days), n_boroughs)
+    groups = np.tile(np.arange(n_boroughs), n_days)
+    order = np.lexsort((dates, groups))
+    return groups[order], dates[order]
+
+
+def test_window_index_keeps_windows_inside_one_borough():
+    groups, dates = interleaved_boroughs()
+
+    index = build_window_index(groups, dates, 14)
+
+    assert len(index) == 3 * (40 - 14)
+    assert np.all(groups[index] == groups[index + 14])
+    target_dates = dates[index + 14]
+    assert np.all(target_dates[1:] >= target_dates[:-1])
+
+
+def test_window_index_is_cached_and_rebuilt_when_stale(tmp_path):
+    path = str(tmp_path / 'window_index.npy')
+    groups, dates = interleaved_boroughs()
+
+    index = load_window_index(path, groups, dates, 14)
+    np.save(path, index[::-1])
+    # A reversed index is out of date order, so it is rebuilt
+    np.testing.assert_array_equal(load_window_index(path, groups, dates, 14), index)
+
+    np.save(path, index)
+    more_groups, more_dates = interleaved_boroughs(n_days=50)
+    assert len(load_window_index(path, more_groups, more_dates, 14)) == 3 * (50 - 14)
@@ -0,0 +1,358 @@
+import asyncio
+import copy
+import json
+
+from sse_hub import HEARTBEAT_FRAME, BroadcastHub, diff, encode_event
+
+
+def parse(frame):
+    """(id, payload) of an encoded SSE frame"""
+    event_id = None
+    for line in frame.decode().strip().split("\n"):
+        field, _, value = line.partition(": ")
+        if field == "id":
+            event_id = value
+        elif field == "data":
+            payload = json.loads(value)
+    return event_id, payload
+
+
+def apply_patch(doc, ops):
+    """Reference JSON-patch application (mirrors the frontend's applyPatch)"""
+    for op in ops:
+        tokens = [token.replace("~1", "/").replace("~0", "~") for token in op["path"].split("/")[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op["op"] == "add":
+                parent.insert(index, op["value"])
+            elif op["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = op["value"]
+        elif op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = op["value"]
+    return doc
+
+
+def make_hub(state, calls=None, **kwargs):
+    async def get_state(parts):
+        if calls is not None:
+            calls.append(tuple(parts))
+        return {part: copy.deepcopy(state[part]) for part in parts}
+    return BroadcastHub(get_state, **kwargs)
+
+
+def drain(queue):
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+def initial_state():
+    return {
+        "stats": {"total_predictions": 0, "approved_predictions": 0},
+        "analytics": {
+            "actual_consumption": {"borough_totals": {"BRONX": 0, "QUEENS": 0}},
+            "conservation": [{"name": "leak detection", "savings": 12}] * 20,
+            "real_time_consumption": [{"n": i} for i in range(5)],
+        },
+        "activities": [{"id": 1}],
+    }
+
+
+def test_encode_event_is_compact_sse_frame():
+    assert encode_event({"type": "heartbeat", "n": [1, 2]}) == b'data: {"type":"heartbeat","n":[1,2]}\n\n'
+    assert encode_event({"a": 1}, "e-3") == b'id: e-3\ndata: {"a":1}\n\n'
+
+
+def test_diff_only_touches_changed_values():
+    old = initial_state()["analytics"]
+    new = copy.deepcopy(old)
+    new["actual_consumption"]["borough_totals"]["BRONX"] = 5.5
+    new["last_updated"] = "now"
+
+    ops = diff(old, new)
+
+    assert ops == [
+        {"op": "replace", "path": "/actual_consumption/borough_totals/BRONX", "value": 5.5},
+        {"op": "add", "path": "/last_updated", "value": "now"},
+    ]
+
+
+def test_diff_rolling_window_becomes_remove_and_append():
+    old = {"rows": [{"n": i} for i in range(5)]}
+    new = {"rows": [{"n": i} for i in range(2, 7)]}
+
+    ops = diff(old, new)
+
+    assert ops == [
+        {"op": "remove", "path": "/rows/0"},
+        {"op": "remove", "path": "/rows/0"},
+        {"op": "add", "path": "/rows/-", "value": {"n": 5}},
+        {"op": "add", "path": "/rows/-", "value": {"n": 6}},
+    ]
+    assert apply_patch(copy.deepcopy(old), ops) == new
+
+
+def test_diff_newest_first_feed_becomes_insert_and_trim():
+    old = {"feed": [{"id": i} for i in (3, 2, 1)]}
+    new = {"feed": [{"id": i} for i in (5, 4, 3)]}
+
+    ops = diff(old, new)
+
+    assert ops == [
+        {"op": "remove", "path": "/feed/2"},
+        {"op": "remove", "path": "/feed/1"},
+        {"op": "add", "path": "/feed/0", "value": {"id": 5}},
+        {"op": "add", "path": "/feed/1", "value": {"id": 4}},
+    ]
+    assert apply_patch(copy.deepcopy(old), ops) == new
+
+
+def test_diff_round_trips_arbitrary_changes():
+    cases = [
+        ({"a": [1, 2, 3], "b": {"x/y": 1, "t~": 2}, "c": "gone"}, {"a": [3, 4], "b": {"x/y": 2, "t~": 2}, "d": None}),
+        ({"a": []}, {"a": [1, 2]}),
+        ({"a": [1, 2]}, {"a": []}),
+        ({"a": [[1, 2], [3]]}, {"a": [[1, 5], [3, 4]]}),
+        ({"a": [1, 2, 3]}, {"a": [0, 1, 2, 3, 4]}),
+    ]
+    for old, new in cases:
+        assert apply_patch(copy.deepcopy(old), diff(old, new)) == new
+
+
+def test_client_rebuilds_state_from_snapshot_and_patches():
+    state = initial_state()
+    calls = []
+    hub = make_hub(state, calls, coalesce_ms=10)
+
+    async def scenario():
+        queue, frames = await hub.connect()
+        state["stats"]["total_predictions"] = 1
+        hub.publish("stats")
+        state["analytics"]["real_time_consumption"] = state["analytics"]["real_time_consumption"][1:] + [{"n": 5}]
+        hub.publish("analytics")
+        await asyncio.sleep(0.05)
+        state["activities"].insert(0, {"id": 2})
+        hub.publish("activities")
+        await asyncio.sleep(0.05)
+        return frames + drain(queue)
+
+    frames = asyncio.run(scenario())
+
+    event_id, snapshot = parse(frames[0])
+    assert snapshot["type"] == "snapshot" and event_id == hub.event_id(1)
+    client = snapshot["state"]
+    version = snapshot["version"]
+    for frame in frames[1:]:
+        event_id, patch = parse(frame)
+        assert patch["type"] == "patch" and patch["base"] == version
+        assert event_id == hub.event_id(patch["version"])
+        apply_patch(client, patch["ops"])
+        version = patch["version"]
+    assert client == state
+    # Two publishes within the window share one patch; unchanged parts are not re-read
+    assert len(frames) == 3
+    assert calls == [("stats", "analytics", "activities"), ("stats", "analytics"), ("activities",)]
+
+
+def test_patch_is_much_smaller_than_full_state():
+    state = initial_state()
+    hub = make_hub(state, coalesce_ms=0)
+
+    async def scenario():
+        queue, frames = await hub.connect()
+        state["analytics"]["actual_consumption"]["borough_totals"]["QUEENS"] = 42
+        hub.publish("analytics")
+        await asyncio.sleep(0.02)
+        return frames[0], drain(queue)
+
+    snapshot, patches = asyncio.run(scenario())
+
+    assert len(patches) == 1
+    assert parse(patches[0])[1]["ops"] == [
+        {"op": "replace", "path": "/analytics/actual_consumption/borough_totals/QUEENS", "value": 42}
+    ]
+    assert len(patches[0]) * 3 < len(snapshot)
+
+
+def test_unchanged_publish_sends_nothing():
+    hub = make_hub(initial_state(), coalesce_ms=0)
+
+    async def scenario():
+        queue, _ = await hub.connect()
+        hub.publish("stats", "analytics")
+        await asyncio.sleep(0.02)
+        return drain(queue)
+
+    assert asyncio.run(scenario()) == []
+    assert hub.version == 1
+
+
+def test_resume_replays_missed_patches_only():
+    state = initial_state()
+    hub = make_hub(state, coalesce_ms=0)
+
+    async def scenario():
+        await hub.flush()
+        resume_from = hub.event_id()
+        for total in (1, 2):
+            state["stats"]["total_predictions"] = total
+            hub.publish("stats")
+            await hub.flush()
+        _, frames = await hub.connect(resume_from)
+        _, up_to_date = await hub.connect(hub.event_id())
+        return frames, up_to_date
+
+    frames, up_to_date = asyncio.run(scenario())
+
+    assert [parse(frame)[1]["type"] for frame in frames] == ["patch", "patch"]
+    assert [parse(frame)[1]["version"] for frame in frames] == [2, 3]
+    assert up_to_date == []
+    assert hub.resumes == 2 and hub.snapshots_sent == 0
+
+
+def test_resume_falls_back_to_snapshot():
+    state = initial_state()
+    hub = make_hub(state, coalesce_ms=0, history=1)
+
+    async def scenario():
+        await hub.flush()
+        resume_from = hub.event_id()
+        for total in (1, 2):
+            state["stats"]["total_predictions"] = total
+            hub.publish("stats")
+            await hub.flush()
+        trimmed = (await hub.connect(resume_from))[1]
+        other_process = (await hub.connect("0000-3"))[1]
+        garbage = (await hub.connect("nonsense"))[1]
+        return trimmed, other_process, garbage
+
+    for frames in asyncio.run(scenario()):
+        assert len(frames) == 1 and parse(frames[0])[1]["type"] == "snapshot"
+    assert hub.encodes == 3  # two patches and one snapshot shared by all three clients
+
+
+def test_event_is_encoded_once_for_all_subscribers():
+    hub = make_hub(initial_state())
+
+    async def scenario():
+        queues = [hub.subscribe() for _ in range(5)]
+        hub.send({"type": "job_update", "job": {"id": "j1"}})
+        return [queue.get_nowait() for queue in queues]
+
+    frames = asyncio.run(scenario())
+
+    assert hub.encodes == 1
+    assert all(frame is frames[0] for frame in frames)
+    assert parse(frames[0]) == (None, {"type": "job_update", "job": {"id": "j1"}})
+
+
+def test_full_queue_drops_oldest_event_first():
+    hub = make_hub(initial_state(), max_queue=3)
+
+    async def scenario():
+        subscriber = hub.subscribe()
+        for index in range(5):
+            hub.send({"type": "job_update", "n": index})
+        return drain(subscriber)
+
+    frames = asyncio.run(scenario())
+
+    assert [parse(frame)[1]["n"] for frame in frames] == [2, 3, 4]
+    assert hub.dropped == 2 and hub.evictions == 0
+
+
+def test_full_queue_of_patches_coalesces_to_snapshot():
+    state = initial_state()
+    hub = make_hub(state, coalesce_ms=0, max_queue=3, max_overflows=10)
+
+    async def scenario():
+        subscriber, frames = await hub.connect()
+        for total in range(1, 6):
+            state["stats"]["total_predictions"] = total
+            hub.publish("stats")
+            await hub.flush()
+        return frames, drain(subscriber)
+
+    frames, queued = asyncio.run(scenario())
+
+    # The client can still rebuild the exact state from what it receives
+    client = parse(frames[0])[1]["state"]
+    version = 1
+    for frame in queued:
+        event = parse(frame)[1]
+        if event["type"] == "snapshot":
+            client, version = event["state"], event["version"]
+        else:
+            assert event["base"] == version
+            apply_patch(client, event["ops"])
+            version = event["version"]
+    assert client == state and version == hub.version
+    assert len(queued) <= 3 and hub.resyncs >= 1
+
+
+def test_client_that_stops_reading_is_evicted():
+    hub = make_hub(initial_state(), max_queue=2, max_overflows=2)
+
+    async def scenario():
+        stalled = hub.subscribe()
+        reading = hub.subscribe()
+        for index in range(20):
+            hub.send({"type": "heartbeat", "n": index})
+            reading.get_nowait()
+        return stalled, await stalled.get(timeout=1)
+
+    stalled, frame = asyncio.run(scenario())
+
+    assert frame is None and stalled.evicted and stalled.qsize() == 0
+    assert stalled not in hub.subscribers and len(hub.subscribers) == 1
+    assert hub.evictions == 1
+    assert hub.stats()["max_queue_depth"] == 0
+
+
+def test_reading_resets_overflow_count():
+    hub = make_hub(initial_state(), max_queue=2, max_overflows=1)
+
+    async def scenario():
+        subscriber = hub.subscribe()
+        for index in range(20):
+            hub.send({"type": "heartbeat", "n": index})
+            hub.send({"type": "heartbeat", "n": index})
+            hub.send({"type": "heartbeat", "n": index})
+            drain(subscriber)
+        return subscriber
+
+    subscriber = asyncio.run(scenario())
+
+    assert not subscriber.evicted and hub.evictions == 0
+
+
+def test_heartbeat_is_one_shared_frame_for_idle_subscribers():
+    hub = make_hub(initial_state(), heartbeat_seconds=0.01)
+
+    async def scenario():
+        idle = [hub.subscribe() for _ in range(3)]
+        busy = hub.subscribe()
+        busy.put(b"data: {}\n\n", False)
+        hub.heartbeat()
+        frames = [subscriber.get_nowait() for subscriber in idle]
+        busy_depth = busy.qsize()
+        drain(busy)
+        hub.start()
+        frame = await asyncio.wait_for(busy.get(), timeout=1)
+        await hub.close()
+        return frames, busy_depth, frame
+
+    frames, busy_depth, frame = asyncio.run(scenario())
+
+    assert all(frame is HEARTBEAT_FRAME for frame in frames)
+    assert HEARTBEAT_FRAME.startswith(b":")
+    # A client with data already waiting doesn't need a heartbeat
+    assert busy_depth == 1
+    assert frame is HEARTBEAT_FRAME
+    assert hub.encodes == 0
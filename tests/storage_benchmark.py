@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+SQLite Storage Benchmark
+
+Measures writes/sec and write latency for the activity-feed insert under
+concurrent request threads, comparing the previous pattern (a new
+rollback-journal connection per call) against the pooled WAL connections in
+storage.py. Readers run alongside the writers, like dashboard polling.
+
+Usage: python -m tests.storage_benchmark [threads] [writes_per_thread]   (default: 8 200)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from storage import ConnectionPool
+
+INSERT_ACTIVITY = '''
+    INSERT INTO recent_activities (activity_type, title, description, metadata, severity)
+    VALUES (?, ?, ?, ?, ?)
+'''
+READ_ACTIVITIES = 'SELECT activity_type, title, timestamp FROM recent_activities ORDER BY id DESC LIMIT 20'
+
+
+def create_table(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE recent_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            activity_type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            metadata JSON,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id TEXT DEFAULT 'system',
+            severity TEXT DEFAULT 'info'
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def activity_row(i):
+    return ("prediction", "New prediction generated", f"Prediction {i}", json.dumps({"prediction_id": i}), "success")
+
+
+def legacy_write(db_path, i):
+    """Previous pattern: connect, insert, commit and close on every call"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(INSERT_ACTIVITY, activity_row(i))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(READ_ACTIVITIES).fetchall()
+    conn.close()
+
+
+def run_load(write, read, threads, writes_per_thread):
+    latencies = []
+    latencies_lock = threading.Lock()
+    stop_reading = threading.Event()
+
+    def writer(worker):
+        own = []
+        for i in range(writes_per_thread):
+            started = time.perf_counter()
+            write(worker * writes_per_thread + i)
+            own.append(time.perf_counter() - started)
+        with latencies_lock:
+            latencies.extend(own)
+
+    def reader():
+        while not stop_reading.is_set():
+            read()
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    writers = [threading.Thread(target=writer, args=(worker,)) for worker in range(threads)]
+    for thread in readers:
+        thread.start()
+    start_time = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    stop_reading.set()
+    for thread in readers:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "writes_per_sec": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+def report(label, result):
+    print(f"{label} {result['writes_per_sec']:8.0f} writes/sec   p50 {result['p50_ms']:6.2f} ms   "
+          f"p99 {result['p99_ms']:7.2f} ms   max {result['max_ms']:7.2f} ms")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print(f"📊 Benchmarking {threads} writer threads x {writes_per_thread} inserts, 2 reader threads")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_db = os.path.join(tmp_dir, "legacy.db")
+        create_table(legacy_db)
+        legacy = run_load(lambda i: legacy_write(legacy_db, i), lambda: legacy_read(legacy_db),
+                          threads, writes_per_thread)
+        report("🐢 Connection per call:", legacy)
+
+        pooled_db = os.path.join(tmp_dir, "pooled.db")
+        create_table(pooled_db)
+        pool = ConnectionPool(pooled_db, size=4)
+        pooled = run_load(lambda i: pool.execute(INSERT_ACTIVITY, activity_row(i)),
+                          lambda: pool.fetchall(READ_ACTIVITIES), threads, writes_per_thread)
+        pool.close()
+        report("⚡ WAL connection pool:", pooled)
+
+    print(f"🚀 Throughput: {pooled['writes_per_sec'] / legacy['writes_per_sec']:.1f}x, "
+          f"p99 latency: {legacy['p99_ms'] / pooled['p99_ms']:.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from storage import ConnectionPool, StateVersion, WriteBehindBuffer
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "test.db"), size=2)
+    pool.execute('CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL)')
+    yield pool
+    pool.close()
+
+
+def test_connections_use_wal_and_busy_timeout(pool):
+    assert pool.fetchone('PRAGMA journal_mode')[0] == 'wal'
+    assert pool.fetchone('PRAGMA busy_timeout')[0] == 5000
+
+
+def test_connections_are_reused(pool):
+    for i in range(20):
+        pool.execute('INSERT INTO items (name) VALUES (?)', (f"item-{i}",))
+        pool.fetchall('SELECT * FROM items')
+
+    stats = pool.stats()
+    assert pool.fetchone('SELECT COUNT(*) FROM items')[0] == 20
+    assert stats["open"] == 1 and stats["writes"] == 21
+
+
+def test_transaction_rolls_back_on_error(pool):
+    with pytest.raises(ValueError):
+        with pool.transaction() as conn:
+            conn.execute('INSERT INTO items (name) VALUES (?)', ("lost",))
+            raise ValueError("boom")
+
+    assert pool.fetchone('SELECT COUNT(*) FROM items')[0] == 0
+    # The connection went back to the pool usable
+    pool.execute('INSERT INTO items (name) VALUES (?)', ("kept",))
+    assert pool.fetchall('SELECT name FROM items') == [("kept",)]
+
+
+def test_concurrent_writers_and_readers_do_not_fail(pool):
+    errors = []
+
+    def writer(worker):
+        try:
+            for i in range(50):
+                pool.execute('INSERT INTO items (name) VALUES (?)', (f"{worker}-{i}",))
+                pool.fetchone('SELECT COUNT(*) FROM items')
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert pool.fetchone('SELECT COUNT(*) FROM items')[0] == 300
+    assert pool.stats()["open"] <= 2
+
+
+def test_readers_see_committed_writes_from_other_connections(tmp_path, pool):
+    other = sqlite3.connect(pool.db_path)
+    other.execute('INSERT INTO items (name) VALUES (?)', ("external",))
+    other.commit()
+    other.close()
+
+    assert pool.fetchall('SELECT name FROM items') == [("external",)]
+
+
+def test_async_facade_runs_off_the_event_loop(pool):
+    async def scenario():
+        loop_thread = threading.get_ident()
+        await asyncio.gather(*(pool.execute_async('INSERT INTO items (name) VALUES (?)', (f"a{i}",))
+                               for i in range(10)))
+        ran_on = await pool.run(threading.get_ident)
+        return loop_thread, ran_on, await pool.fetchone_async('SELECT COUNT(*) FROM items')
+
+    loop_thread, ran_on, count = asyncio.run(scenario())
+    assert ran_on != loop_thread
+    assert count[0] == 10
+
+
+def test_write_behind_commits_buffered_rows_in_one_transaction(pool):
+    buffer = WriteBehindBuffer(pool, interval_ms=10000, max_rows=100)
+    for i in range(5):
+        buffer.add('INSERT INTO items (name) VALUES (?)', (f"row-{i}",))
+    writes_before = pool.stats()["writes"]
+
+    assert pool.fetchone('SELECT COUNT(*) FROM items')[0] == 0
+    assert buffer.flush() == 5
+    assert pool.stats()["writes"] == writes_before + 1
+    assert [row[0] for row in pool.fetchall('SELECT name FROM items ORDER BY id')] == [f"row-{i}" for i in range(5)]
+    assert buffer.stats()["flushed"] == 5 and buffer.stats()["pending"] == 0
+
+
+def test_write_behind_keeps_only_latest_replacement(pool):
+    pool.execute('CREATE TABLE state (value INTEGER)')
+    buffer = WriteBehindBuffer(pool, interval_ms=10000)
+    for value in range(3):
+        buffer.replace("state", [('DELETE FROM state', ()), ('INSERT INTO state (value) VALUES (?)', (value,))])
+    buffer.flush()
+
+    assert pool.fetchall('SELECT value FROM state') == [(2,)]
+    assert buffer.stats()["coalesced"] == 2
+
+
+def test_write_behind_flushes_on_interval_and_row_limit(pool):
+    buffer = WriteBehindBuffer(pool, interval_ms=50, max_rows=3)
+    buffer.start()
+    try:
+        buffer.add('INSERT INTO items (name) VALUES (?)', ("timed",))
+        deadline = time.time() + 2
+        while pool.fetchone('SELECT COUNT(*) FROM items')[0] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert pool.fetchone('SELECT COUNT(*) FROM items')[0] == 1
+
+        buffer.interval = 10
+        time.sleep(0.1)  # let the thread start its long wait
+        for i in range(3):
+            buffer.add('INSERT INTO items (name) VALUES (?)', (f"burst-{i}",))
+        deadline = time.time() + 2
+        while pool.fetchone('SELECT COUNT(*) FROM items')[0] < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        assert pool.fetchone('SELECT COUNT(*) FROM items')[0] == 4
+    finally:
+        buffer.close()
+
+
+def test_write_behind_retries_failed_flush_and_drops_oldest_over_limit(pool):
+    buffer = WriteBehindBuffer(pool, interval_ms=10000, max_buffered=3)
+    buffer.add('INSERT INTO missing_table (name) VALUES (?)', ("x",))
+    assert buffer.flush() == 0
+    assert buffer.stats()["failed_flushes"] == 1 and buffer.pending() == 1
+
+    for i in range(3):
+        buffer.add('INSERT INTO items (name) VALUES (?)', (f"row-{i}",))
+    stats = buffer.stats()
+    assert stats["dropped"] == 1 and stats["pending"] == 3
+    assert buffer.flush() == 3
+
+
+def test_write_behind_bad_statement_does_not_block_good_ones(pool):
+    buffer = WriteBehindBuffer(pool, interval_ms=10000, max_attempts=2)
+    buffer.add('INSERT INTO items (name) VALUES (?)', ("before",))
+    buffer.add('INSERT INTO missing_table (name) VALUES (?)', ("bad",))
+    buffer.replace("state", [('INSERT INTO items (name) VALUES (?)', ("state",))])
+    buffer.replace("broken", [('INSERT INTO items (name) VALUES (?)', ("half",)),
+                              ('INSERT INTO missing_table (name) VALUES (?)', ("bad",))])
+    buffer.add('INSERT INTO items (name) VALUES (?)', ("after",))
+
+    assert buffer.flush() == 3
+    assert sorted(row[0] for row in pool.fetchall('SELECT name FROM items')) == ["after", "before", "state"]
+    assert buffer.pending() == 2
+
+    buffer.add('INSERT INTO items (name) VALUES (?)', ("next",))
+    assert buffer.flush() == 1
+    stats = buffer.stats()
+    assert stats["discarded"] == 2 and stats["pending"] == 0
+    # The failed group was rolled back as a whole
+    assert pool.fetchone("SELECT COUNT(*) FROM items WHERE name = 'half'")[0] == 0
+
+
+def test_write_behind_keeps_writes_while_database_is_unreachable(pool):
+    buffer = WriteBehindBuffer(pool, interval_ms=10000, max_attempts=1)
+    buffer.add('INSERT INTO items (name) VALUES (?)', ("kept",))
+    pool.close()
+
+    assert buffer.flush() == 0 and buffer.flush() == 0
+    assert buffer.pending() == 1 and buffer.stats()["discarded"] == 0
+
+
+def test_write_behind_close_flushes_pending_rows(tmp_path):
+    db_path = str(tmp_path / "close.db")
+    pool = ConnectionPool(db_path)
+    pool.execute('CREATE TABLE items (name TEXT)')
+    buffer = WriteBehindBuffer(pool, interval_ms=10000)
+    buffer.start()
+    buffer.add('INSERT INTO items (name) VALUES (?)', ("last",))
+    buffer.close()
+    pool.close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT name FROM items').fetchall() == [("last",)]
+    conn.close()
+
+
+def test_state_version_detects_changes_from_other_processes_only(pool):
+    pool.execute('CREATE TABLE unrelated (x INTEGER)')
+    with pool.transaction() as conn:
+        StateVersion.create_table(conn)
+    buffer = WriteBehindBuffer(pool, interval_ms=10000)
+    local = StateVersion(pool, buffer, check_interval_ms=0)
+    other = StateVersion(ConnectionPool(pool.db_path), WriteBehindBuffer(pool, interval_ms=10000), check_interval_ms=0)
+    assert local.changed_elsewhere() is False  # first check only records where other writers stand
+
+    local.bump()
+    buffer.flush()
+    pool.execute('INSERT INTO unrelated (x) VALUES (1)')  # unrelated commit
+    assert local.changed_elsewhere() is False
+
+    other.bump()
+    other.write_buffer.flush()
+    assert local.changed_elsewhere() is True
+    assert local.changed_elsewhere() is False
+
+    assert local.etag("stats") == f'"stats-{local.epoch}-1"'
+    assert local.bump(persist=False) == 2 and local.stats()["external_changes"] == 1
+    local.close()
+    other.close()
+
+
+def test_etags_are_never_shared_between_instances(pool):
+    with pool.transaction() as conn:
+        StateVersion.create_table(conn)
+    # Same version count, e.g. two worker processes or one process before and after a restart
+    first, second = (StateVersion(pool, WriteBehindBuffer(pool, interval_ms=10000)) for _ in range(2))
+    first.bump()
+    second.bump()
+
+    assert first.version == second.version
+    assert first.etag("stats") != second.etag("stats")
+    tags = {instance.etag(resource) for instance in (first, second) for resource in ("stats", "analytics")}
+    assert len(tags) == 4